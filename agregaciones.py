@@ -0,0 +1,489 @@
+import base64
+import pandas as pd
+import numpy as np
+from typing import Dict, List, Any
+
+
+# ============================================================================
+# CONFIGURACIÓN DE DIMENSIONES Y MEDIDAS
+# ============================================================================
+
+# Dimensiones del cubo. Las que no estén en el DataFrame se ignoran,
+# así que añadir una dimensión nueva no obliga a tocar el resto del código.
+DIMENSIONES_COHORTE = {
+    'rango_edad': {
+        'columna': 'EDAD',
+        'cortes': [0, 10, 15, 20],
+        'etiquetas': ['0-10 años', '11-15 años', '16-19 años']
+    },
+    'sexo': {'columna': 'SEXO'},
+    'region': {'columna': 'Comunidad Autónoma'},
+    'categoria': {'columna': 'Categoría'},
+    'servicio': {'columna': 'Servicio'}
+}
+
+# Medidas numéricas agregadas en cada celda (nombre -> columna)
+MEDIDAS_COHORTE = {
+    'edad': 'EDAD',
+    'coste': 'Coste APR'
+}
+
+# Columnas numéricas sobre las que se acumulan correlaciones
+COLUMNAS_CORRELACION = ['EDAD', 'Esquizofrenia']
+
+# Tipo de numpy -> typed array de JavaScript (para el cubo compacto)
+TIPOS_JS = {
+    'int8': 'Int8Array', 'int16': 'Int16Array', 'int32': 'Int32Array',
+    'uint8': 'Uint8Array', 'uint16': 'Uint16Array', 'uint32': 'Uint32Array',
+    'float32': 'Float32Array', 'float64': 'Float64Array'
+}
+
+
+def array_compacto(valores: np.ndarray, tipo: str = None) -> Dict[str, str]:
+    """
+    Array numérico como typed array de JavaScript en base64 (little-endian).
+
+    Los enteros usan el tipo más pequeño que contiene su rango, así los
+    códigos de dimensión suelen ocupar un byte por celda.
+    """
+    valores = np.asarray(valores)
+    if tipo is None:
+        tipo = 'float64'
+        if np.issubdtype(valores.dtype, np.integer):
+            minimo = int(valores.min()) if len(valores) else 0
+            maximo = int(valores.max()) if len(valores) else 0
+            candidatos = ('uint8', 'uint16', 'uint32') if minimo >= 0 else ('int8', 'int16', 'int32')
+            tipo = next((t for t in candidatos
+                         if np.iinfo(t).min <= minimo and maximo <= np.iinfo(t).max), 'float64')
+    datos = np.ascontiguousarray(valores, dtype=np.dtype(tipo).newbyteorder('<'))
+    return {'tipo': TIPOS_JS[tipo], 'datos': base64.b64encode(datos.tobytes()).decode('ascii')}
+
+
+class CuboAgregacion:
+    """
+    Cubo de agregación disperso sobre varias dimensiones.
+
+    Solo guarda las celdas con datos. Cada celda tiene el número de filas y,
+    por cada medida, n, media, M2 (suma de desviaciones al cuadrado), mínimo
+    y máximo. Con esos estadísticos los cubos se pueden combinar (algoritmo
+    de Chan) y reagrupar a cualquier marginal sin volver a leer las filas.
+
+    Los valores nulos de una dimensión se codifican como -1 y no aparecen
+    en las tablas, pero sí cuentan en los marginales del resto.
+    """
+
+    def __init__(self, dimensiones: List[str], etiquetas: Dict[str, list],
+                 codigos: np.ndarray, conteo: np.ndarray,
+                 medidas: Dict[str, Dict[str, np.ndarray]]):
+        self.dimensiones = list(dimensiones)
+        self.etiquetas = {dim: list(etiquetas[dim]) for dim in self.dimensiones}
+        self.codigos = codigos.reshape(len(conteo), len(self.dimensiones))
+        self.conteo = conteo
+        self.medidas = medidas
+
+    # ------------------------------------------------------------------
+    # Reagrupación
+    # ------------------------------------------------------------------
+
+    def _clave(self, codigos: np.ndarray, dimensiones: List[str]) -> np.ndarray:
+        """Convierte los códigos de varias dimensiones en una clave entera."""
+        if not dimensiones:
+            return np.zeros(len(codigos), dtype=np.int64)
+        forma = [len(self.etiquetas[dim]) + 1 for dim in dimensiones]
+        # El hueco extra de cada dimensión es para los nulos (-1)
+        ajustados = np.where(codigos < 0, np.array(forma) - 1, codigos)
+        return np.ravel_multi_index(ajustados.T, forma).astype(np.int64)
+
+    def _reagrupar(self, grupos: np.ndarray, n_grupos: int) -> tuple:
+        """Combina las celdas que comparten grupo en una sola pasada."""
+        conteo = np.bincount(grupos, weights=self.conteo, minlength=n_grupos).astype(np.int64)
+        medidas = {}
+        for nombre, est in self.medidas.items():
+            n = np.bincount(grupos, weights=est['n'], minlength=n_grupos)
+            suma = np.bincount(grupos, weights=est['n'] * est['media'], minlength=n_grupos)
+            media = np.divide(suma, n, out=np.zeros(n_grupos), where=n > 0)
+            desv = est['media'] - media[grupos]
+            m2 = np.bincount(
+                grupos, weights=est['m2'] + est['n'] * desv * desv, minlength=n_grupos
+            )
+            minimo = np.full(n_grupos, np.nan)
+            maximo = np.full(n_grupos, np.nan)
+            np.fmin.at(minimo, grupos, est['min'])
+            np.fmax.at(maximo, grupos, est['max'])
+            medidas[nombre] = {
+                'n': n.astype(np.int64),
+                'media': media,
+                'm2': m2,
+                'min': minimo,
+                'max': maximo
+            }
+        return conteo, medidas
+
+    def marginal(self, *dimensiones: str) -> 'CuboAgregacion':
+        """
+        Devuelve el cubo agregado sobre un subconjunto de dimensiones.
+
+        Sin argumentos devuelve el total global (una sola celda).
+        """
+        dims = [dim for dim in dimensiones if dim in self.dimensiones]
+        indices = [self.dimensiones.index(dim) for dim in dims]
+        codigos = self.codigos[:, indices]
+
+        grupos, unicos = pd.factorize(self._clave(codigos, dims))
+        n_grupos = len(unicos)
+
+        # Códigos representativos de cada grupo
+        codigos_grupo = np.empty((n_grupos, len(dims)), dtype=np.int64)
+        codigos_grupo[grupos] = codigos
+
+        conteo, medidas = self._reagrupar(grupos, n_grupos)
+        etiquetas = {dim: self.etiquetas[dim] for dim in dims}
+        return CuboAgregacion(dims, etiquetas, codigos_grupo, conteo, medidas)
+
+    def marginales(self) -> Dict[str, 'CuboAgregacion']:
+        """Marginales de una dimensión."""
+        return {dim: self.marginal(dim) for dim in self.dimensiones}
+
+    def cruces(self) -> Dict[tuple, 'CuboAgregacion']:
+        """Tablas cruzadas de todos los pares de dimensiones."""
+        return {
+            (a, b): self.marginal(a, b)
+            for i, a in enumerate(self.dimensiones)
+            for b in self.dimensiones[i + 1:]
+        }
+
+    def combinar(self, otro: 'CuboAgregacion') -> 'CuboAgregacion':
+        """
+        Combina dos cubos con las mismas dimensiones y medidas.
+
+        Las etiquetas se alinean por valor, así que los lotes pueden traer
+        categorías distintas.
+        """
+        if otro.dimensiones != self.dimensiones:
+            raise ValueError("Los cubos deben tener las mismas dimensiones")
+
+        etiquetas = {}
+        codigos_otro = otro.codigos.copy()
+        for i, dim in enumerate(self.dimensiones):
+            union = list(self.etiquetas[dim])
+            posiciones = {etiqueta: j for j, etiqueta in enumerate(union)}
+            for etiqueta in otro.etiquetas[dim]:
+                if etiqueta not in posiciones:
+                    posiciones[etiqueta] = len(union)
+                    union.append(etiqueta)
+            mapa = np.array(
+                [posiciones[etiqueta] for etiqueta in otro.etiquetas[dim]] + [-1],
+                dtype=np.int64
+            )
+            # -1 indexa el último elemento del mapa, que es de nuevo -1
+            codigos_otro[:, i] = mapa[codigos_otro[:, i]]
+            etiquetas[dim] = union
+
+        medidas = {}
+        for nombre in self.medidas:
+            medidas[nombre] = {
+                clave: np.concatenate([self.medidas[nombre][clave], otro.medidas[nombre][clave]])
+                for clave in ('n', 'media', 'm2', 'min', 'max')
+            }
+        unido = CuboAgregacion(
+            self.dimensiones,
+            etiquetas,
+            np.concatenate([self.codigos, codigos_otro]),
+            np.concatenate([self.conteo, otro.conteo]),
+            medidas
+        )
+        return unido.marginal(*self.dimensiones)
+
+    # ------------------------------------------------------------------
+    # Lectura de resultados
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _describir(est: Dict[str, np.ndarray], i: int) -> Dict[str, Any]:
+        """Estadísticos legibles de una medida en una celda."""
+        n = int(est['n'][i])
+        return {
+            'n': n,
+            'media': float(est['media'][i]) if n > 0 else float('nan'),
+            'std': float(np.sqrt(est['m2'][i] / (n - 1))) if n > 1 else float('nan'),
+            'min': float(est['min'][i]),
+            'max': float(est['max'][i])
+        }
+
+    def _fila(self, i: int) -> Dict[str, Any]:
+        """Etiquetas, conteo y estadísticos de una celda."""
+        fila = {
+            dim: self.etiquetas[dim][self.codigos[i, j]]
+            for j, dim in enumerate(self.dimensiones)
+        }
+        fila['conteo'] = int(self.conteo[i])
+        for nombre, est in self.medidas.items():
+            fila[nombre] = self._describir(est, i)
+        return fila
+
+    def total(self) -> Dict[str, Any]:
+        """Conteo y estadísticos globales de cada medida."""
+        cubo = self.marginal()
+        if len(cubo.conteo) == 0:
+            vacio = {'n': 0, 'media': float('nan'), 'std': float('nan'),
+                     'min': float('nan'), 'max': float('nan')}
+            return {'conteo': 0, **{nombre: dict(vacio) for nombre in self.medidas}}
+        return cubo._fila(0)
+
+    def tabla(self, *dimensiones: str) -> List[Dict[str, Any]]:
+        """
+        Filas del marginal pedido, en el orden de las etiquetas.
+
+        Cada fila trae la etiqueta de cada dimensión, el conteo y los
+        estadísticos por medida. Las celdas con algún nulo se omiten.
+        """
+        cubo = self.marginal(*dimensiones)
+        validas = np.all(cubo.codigos >= 0, axis=1) & (cubo.conteo > 0)
+        indices = np.flatnonzero(validas)
+        if cubo.dimensiones:
+            orden = np.lexsort(cubo.codigos[indices].T[::-1])
+            indices = indices[orden]
+
+        return [cubo._fila(i) for i in indices]
+
+    def resumen(self) -> Dict[str, Any]:
+        """Total, marginales y cruces en formato serializable a JSON."""
+        return {
+            'dimensiones': self.dimensiones,
+            'total': self.total(),
+            'marginales': {dim: self.tabla(dim) for dim in self.dimensiones},
+            'cruces': {
+                f'{a}__{b}': self.tabla(a, b)
+                for a, b in self.cruces()
+            }
+        }
+
+    # ------------------------------------------------------------------
+    # Persistencia
+    # ------------------------------------------------------------------
+
+    def a_dict(self) -> Dict[str, Any]:
+        """Serializa las celdas del cubo (listas de Python, apto para JSON)."""
+        return {
+            'dimensiones': self.dimensiones,
+            'etiquetas': self.etiquetas,
+            'codigos': self.codigos.tolist(),
+            'conteo': self.conteo.tolist(),
+            'medidas': {
+                nombre: {clave: valores.tolist() for clave, valores in est.items()}
+                for nombre, est in self.medidas.items()
+            }
+        }
+
+    def a_compacto(self, medidas: List[str] = None, factor: float = 1.0) -> Dict[str, Any]:
+        """
+        Celdas del cubo codificadas para el navegador (filtro cruzado del dashboard).
+
+        Cada dimensión va como un typed array de códigos (-1 = nulo) con su
+        diccionario de etiquetas; el conteo y, por medida, n, suma, mínimo y
+        máximo van como typed arrays en base64. Con eso el navegador puede
+        reagrupar y filtrar cualquier combinación sin volver al servidor.
+
+        Args:
+            medidas: (Opcional) Medidas a incluir (default: todas)
+            factor: Factor de expansión de los conteos (vistas previas muestreadas)
+        """
+        medidas = [nombre for nombre in (medidas or self.medidas) if nombre in self.medidas]
+        compacto = {
+            'celdas': int(len(self.conteo)),
+            'factor': factor,
+            'dimensiones': self.dimensiones,
+            'etiquetas': {dim: [str(etiqueta) for etiqueta in self.etiquetas[dim]] for dim in self.dimensiones},
+            'codigos': {dim: array_compacto(self.codigos[:, j]) for j, dim in enumerate(self.dimensiones)},
+            'conteo': array_compacto(self.conteo),
+            'medidas': {}
+        }
+        for nombre in medidas:
+            est = self.medidas[nombre]
+            compacto['medidas'][nombre] = {
+                'n': array_compacto(est['n']),
+                'suma': array_compacto(est['n'] * np.nan_to_num(est['media']), 'float64'),
+                # Las celdas sin valores no deben contar en mínimos y máximos
+                'min': array_compacto(np.where(np.isnan(est['min']), np.inf, est['min']), 'float32'),
+                'max': array_compacto(np.where(np.isnan(est['max']), -np.inf, est['max']), 'float32')
+            }
+        return compacto
+
+    @classmethod
+    def desde_dict(cls, datos: Dict[str, Any]) -> 'CuboAgregacion':
+        """Reconstruye un cubo serializado con a_dict()."""
+        return cls(
+            datos['dimensiones'],
+            datos['etiquetas'],
+            np.array(datos['codigos'], dtype=np.int64),
+            np.array(datos['conteo'], dtype=np.int64),
+            {
+                nombre: {
+                    clave: np.array(valores, dtype=np.int64 if clave == 'n' else float)
+                    for clave, valores in est.items()
+                }
+                for nombre, est in datos['medidas'].items()
+            }
+        )
+
+
+class AcumuladorCorrelacion:
+    """
+    Acumulador combinable de medias y co-momentos entre columnas numéricas.
+
+    Permite obtener la matriz de correlación de Pearson sin conservar las
+    filas: se actualiza por lotes y se combina con la fórmula de Chan.
+    Solo se usan las filas con todas las columnas informadas.
+    """
+
+    def __init__(self, columnas: List[str], n: int = 0,
+                 medias: np.ndarray = None, comomentos: np.ndarray = None):
+        k = len(columnas)
+        self.columnas = list(columnas)
+        self.n = int(n)
+        self.medias = np.zeros(k) if medias is None else np.asarray(medias, dtype=float)
+        self.comomentos = (
+            np.zeros((k, k)) if comomentos is None
+            else np.asarray(comomentos, dtype=float).reshape(k, k)
+        )
+
+    @classmethod
+    def desde_df(cls, df: pd.DataFrame, columnas: List[str],
+                 columna_conteo: str = None) -> 'AcumuladorCorrelacion':
+        """
+        Construye el acumulador a partir de un DataFrame (o un lote).
+
+        Con columna_conteo cada fila cuenta tantas veces como indique esa
+        columna (filas ya agregadas de una tabla resumen).
+        """
+        columnas = [col for col in columnas if col in df.columns]
+        valores = df[columnas].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+        pesos = (
+            np.ones(len(df)) if columna_conteo is None
+            else df[columna_conteo].to_numpy(dtype=float)
+        )
+        validos = ~np.isnan(valores).any(axis=1)
+        valores, pesos = valores[validos], pesos[validos]
+        n = int(pesos.sum())
+        if n == 0:
+            return cls(columnas)
+        medias = pesos @ valores / n
+        centrados = valores - medias
+        return cls(columnas, n, medias, centrados.T @ (centrados * pesos[:, None]))
+
+    def combinar(self, otro: 'AcumuladorCorrelacion') -> 'AcumuladorCorrelacion':
+        """Combina dos acumuladores de las mismas columnas."""
+        if otro.n == 0:
+            return self
+        if self.n == 0:
+            return otro
+        if otro.columnas != self.columnas:
+            raise ValueError("Los acumuladores deben tener las mismas columnas")
+        n = self.n + otro.n
+        delta = otro.medias - self.medias
+        medias = self.medias + delta * otro.n / n
+        comomentos = (
+            self.comomentos + otro.comomentos
+            + np.outer(delta, delta) * self.n * otro.n / n
+        )
+        return AcumuladorCorrelacion(self.columnas, n, medias, comomentos)
+
+    def correlacion(self, a: str, b: str) -> float:
+        """Correlación de Pearson entre dos columnas (NaN si no es calculable)."""
+        if a not in self.columnas or b not in self.columnas or self.n < 2:
+            return float('nan')
+        i, j = self.columnas.index(a), self.columnas.index(b)
+        denominador = np.sqrt(self.comomentos[i, i] * self.comomentos[j, j])
+        if denominador == 0:
+            return float('nan')
+        return float(self.comomentos[i, j] / denominador)
+
+    def a_dict(self) -> Dict[str, Any]:
+        """Serializa el acumulador (apto para JSON)."""
+        return {
+            'columnas': self.columnas,
+            'n': self.n,
+            'medias': self.medias.tolist(),
+            'comomentos': self.comomentos.tolist()
+        }
+
+    @classmethod
+    def desde_dict(cls, datos: Dict[str, Any]) -> 'AcumuladorCorrelacion':
+        """Reconstruye un acumulador serializado con a_dict()."""
+        return cls(datos['columnas'], datos['n'], datos['medias'], datos['comomentos'])
+
+
+def _codificar(serie: pd.Series, config: Dict[str, Any]) -> tuple:
+    """Devuelve (códigos, etiquetas) de una dimensión. Nulos -> -1."""
+    if 'cortes' in config:
+        codigos = pd.cut(
+            serie,
+            bins=config['cortes'],
+            labels=False,
+            include_lowest=True
+        )
+        codigos = np.asarray(codigos.fillna(-1), dtype=np.int64)
+        return codigos, list(config['etiquetas'])
+
+    codigos, unicos = pd.factorize(serie, sort=True)
+    return codigos.astype(np.int64), np.asarray(unicos).tolist()
+
+
+def construir_cubo(df: pd.DataFrame,
+                   dimensiones: Dict[str, Dict[str, Any]] = None,
+                   medidas: Dict[str, str] = None,
+                   columna_conteo: str = None) -> CuboAgregacion:
+    """
+    Construye el cubo de agregación en una sola pasada sobre el DataFrame.
+
+    Cada fila se codifica una vez por dimensión y se agrupa con una clave
+    entera, de modo que el coste depende del número de filas y no del
+    número de grupos ni de dimensiones.
+
+    Args:
+        df: DataFrame con los datos de la cohorte
+        dimensiones: Configuración de dimensiones (default: DIMENSIONES_COHORTE)
+        medidas: Medidas numéricas a agregar (default: MEDIDAS_COHORTE)
+        columna_conteo: (Opcional) Columna con el número de episodios de cada
+            fila, para filas ya agregadas. Las medidas deben ser constantes
+            dentro de cada fila (p.ej. EDAD cuando forma parte del grano).
+    """
+    dimensiones = DIMENSIONES_COHORTE if dimensiones is None else dimensiones
+    medidas = MEDIDAS_COHORTE if medidas is None else medidas
+
+    dims = [dim for dim, config in dimensiones.items() if config['columna'] in df.columns]
+    etiquetas = {}
+    columnas_codigos = []
+    for dim in dims:
+        codigos, etiquetas[dim] = _codificar(df[dimensiones[dim]['columna']], dimensiones[dim])
+        columnas_codigos.append(codigos)
+
+    n_filas = len(df)
+    conteo = (
+        np.ones(n_filas, dtype=np.int64) if columna_conteo is None
+        else df[columna_conteo].to_numpy(dtype=np.int64)
+    )
+    codigos = (
+        np.column_stack(columnas_codigos) if columnas_codigos
+        else np.zeros((n_filas, 0), dtype=np.int64)
+    )
+
+    # Cada fila es una celda (de conteo 1 salvo filas agregadas); la reagrupación hace el resto
+    medidas_filas = {}
+    for nombre, columna in medidas.items():
+        if columna not in df.columns:
+            continue
+        valores = pd.to_numeric(df[columna], errors='coerce').to_numpy(dtype=float)
+        validos = ~np.isnan(valores)
+        medidas_filas[nombre] = {
+            'n': np.where(validos, conteo, 0),
+            'media': np.where(validos, valores, 0.0),
+            'm2': np.zeros(n_filas),
+            'min': valores,
+            'max': valores
+        }
+
+    filas = CuboAgregacion(
+        dims, etiquetas, codigos, conteo, medidas_filas
+    )
+    return filas.marginal(*dims)
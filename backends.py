@@ -0,0 +1,252 @@
+import re
+import sqlite3
+import pandas as pd
+from pathlib import Path
+from typing import Dict, Any, Iterator
+
+# oracledb solo hace falta para el backend de Oracle
+# pip install oracledb
+try:
+    import oracledb
+except ImportError:
+    oracledb = None
+
+# duckdb es opcional: sin él el backend local usa sqlite
+# pip install duckdb
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+
+# Nombres del extracto SaludMental -> nombres de la tabla de Oracle
+COLUMNAS_EXTRACTO = {'Edad': 'EDAD', 'Sexo': 'SEXO'}
+
+# Columnas de fecha que se convierten al leer extractos con pandas
+COLUMNAS_FECHA_EXTRACTO = ['Fecha de Ingreso', 'Fecha de Fin Contacto']
+
+
+# ============================================================================
+# INTERFAZ
+# ============================================================================
+
+class BackendDatos:
+    """
+    Motor de datos del analizador.
+
+    Cubre lo que el pipeline necesita de la base de datos: abrir la
+    conexión, leer la cohorte, leerla por lotes y empujar agregaciones al
+    motor. Las consultas se escriben una sola vez con binds de Oracle
+    (:nombre); cada backend aporta solo lo que cambia de dialecto (binds,
+    muestreo y truncado a mes).
+    """
+
+    nombre = 'base'
+
+    def conectar(self):
+        """Abre y devuelve una conexión DB-API."""
+        raise NotImplementedError
+
+    def traducir(self, sql: str) -> str:
+        """Adapta los binds :nombre al estilo del motor."""
+        return sql
+
+    def origen(self, tabla: str, muestra: Dict[str, Any] = None) -> str:
+        """Expresión del FROM, con la cláusula de muestreo si se pide."""
+        if muestra is not None:
+            raise ValueError(f"El backend {self.nombre} no soporta muestreo")
+        return tabla
+
+    def expresion_mes(self, columna: str) -> str:
+        """Expresión SQL que trunca una fecha al primer día del mes."""
+        raise NotImplementedError
+
+    def leer(self, conexion, sql: str, parametros: Dict[str, Any] = None) -> pd.DataFrame:
+        """Ejecuta una consulta y devuelve todas las filas en un DataFrame."""
+        cursor = conexion.cursor()
+        try:
+            cursor.execute(self.traducir(sql), parametros or {})
+            columnas = [descripcion[0] for descripcion in cursor.description]
+            return pd.DataFrame.from_records(cursor.fetchall(), columns=columnas)
+        finally:
+            cursor.close()
+
+    def leer_por_lotes(self, conexion, sql: str, parametros: Dict[str, Any] = None,
+                       tamano_lote: int = 50000) -> Iterator[pd.DataFrame]:
+        """
+        Ejecuta una consulta y devuelve las filas en DataFrames de tamano_lote (fetchmany).
+
+        Sin filas devuelve un único DataFrame vacío con las columnas.
+        """
+        cursor = conexion.cursor()
+        try:
+            if hasattr(cursor, 'arraysize'):
+                cursor.arraysize = tamano_lote
+            cursor.execute(self.traducir(sql), parametros or {})
+            columnas = [descripcion[0] for descripcion in cursor.description]
+            lotes = 0
+            while True:
+                filas = cursor.fetchmany(tamano_lote)
+                if not filas and lotes > 0:
+                    break
+                lotes += 1
+                yield pd.DataFrame.from_records(filas, columns=columnas)
+                if not filas:
+                    break
+        finally:
+            cursor.close()
+
+    def cerrar(self, conexion):
+        """Cierra la conexión."""
+        conexion.close()
+
+
+# ============================================================================
+# ORACLE
+# ============================================================================
+
+class BackendOracle(BackendDatos):
+    """Oracle Database (Autonomous) con wallet, vía oracledb."""
+
+    nombre = 'oracle'
+
+    def __init__(self, db_config: Dict[str, str]):
+        """
+        Args:
+            db_config: Configuración de conexión (user, password, dsn, wallet...)
+        """
+        self.db_config = db_config
+
+    def conectar(self):
+        if oracledb is None:
+            raise ImportError("El backend de Oracle necesita oracledb (pip install oracledb)")
+        return oracledb.connect(
+            user=self.db_config['user'],
+            password=self.db_config['password'],
+            dsn=self.db_config['dsn'],
+            config_dir=self.db_config['config_dir'],
+            wallet_location=self.db_config['wallet_location'],
+            wallet_password=self.db_config['wallet_password']
+        )
+
+    def origen(self, tabla: str, muestra: Dict[str, Any] = None) -> str:
+        if muestra is None:
+            return tabla
+        origen = f"{tabla} SAMPLE{' BLOCK' if muestra['bloques'] else ''} ({muestra['porcentaje']})"
+        if muestra['semilla'] is not None:
+            origen += f" SEED ({muestra['semilla']})"
+        return origen
+
+    def expresion_mes(self, columna: str) -> str:
+        return f"TRUNC({columna}, 'MM')"
+
+    def leer(self, conexion, sql: str, parametros: Dict[str, Any] = None) -> pd.DataFrame:
+        return pd.read_sql(sql, conexion, params=parametros)
+
+
+# ============================================================================
+# LOCAL (DUCKDB / SQLITE)
+# ============================================================================
+
+class BackendLocal(BackendDatos):
+    """
+    Motor en proceso sobre los extractos de SaludMental.
+
+    Lee el XLS original, los CSV de analisis.py (eda_outputs/) o Parquet y
+    los expone como una tabla con los mismos nombres que en Oracle, así que
+    el analizador ejecuta exactamente las mismas consultas sin red ni
+    wallet. Con DuckDB los CSV y Parquet se consultan directamente desde el
+    archivo; con sqlite se cargan en memoria.
+    """
+
+    def __init__(self, rutas, tabla: str = "SALUDMENTAL", motor: str = None,
+                 renombrar: Dict[str, str] = None):
+        """
+        Args:
+            rutas: Ruta o lista de rutas (.xls/.xlsx, .csv, .parquet) que forman la tabla
+            tabla: Nombre de la tabla expuesta (default: SALUDMENTAL)
+            motor: 'duckdb' o 'sqlite' (default: duckdb si está instalado)
+            renombrar: Columnas del extracto a renombrar (default: COLUMNAS_EXTRACTO)
+        """
+        self.rutas = [Path(ruta) for ruta in ([rutas] if isinstance(rutas, (str, Path)) else rutas)]
+        self.tabla = tabla
+        self.motor = motor or ('duckdb' if duckdb is not None else 'sqlite')
+        self.nombre = self.motor
+        self.renombrar = COLUMNAS_EXTRACTO if renombrar is None else renombrar
+        if self.motor == 'duckdb' and duckdb is None:
+            raise ImportError("El motor duckdb necesita el paquete duckdb (pip install duckdb)")
+
+    def _leer_extracto(self, ruta: Path) -> pd.DataFrame:
+        """Lee un extracto con pandas (XLS siempre; CSV/Parquet con sqlite)."""
+        if ruta.suffix.lower() in ('.xls', '.xlsx'):
+            df = pd.read_excel(ruta, engine='xlrd' if ruta.suffix.lower() == '.xls' else None)
+        elif ruta.suffix.lower() == '.parquet':
+            df = pd.read_parquet(ruta)
+        else:
+            df = pd.read_csv(ruta, low_memory=False)
+        for columna in COLUMNAS_FECHA_EXTRACTO:
+            if columna in df.columns and not pd.api.types.is_datetime64_any_dtype(df[columna]):
+                df[columna] = pd.to_datetime(df[columna], errors='coerce', dayfirst=True)
+        return df.rename(columns=self.renombrar)
+
+    def conectar(self):
+        if self.motor == 'duckdb':
+            return self._conectar_duckdb()
+        return self._conectar_sqlite()
+
+    def _conectar_duckdb(self):
+        conexion = duckdb.connect()
+        lecturas = []
+        for i, ruta in enumerate(self.rutas):
+            literal = str(ruta).replace("'", "''")
+            if ruta.suffix.lower() == '.parquet':
+                lecturas.append(f"SELECT * FROM read_parquet('{literal}')")
+            elif ruta.suffix.lower() == '.csv':
+                lecturas.append(f"SELECT * FROM read_csv_auto('{literal}', header = true)")
+            else:
+                conexion.register(f'extracto_{i}', self._leer_extracto(ruta))
+                lecturas.append(f"SELECT * FROM extracto_{i}")
+        conexion.execute(
+            f"CREATE VIEW {self.tabla}_ORIGEN AS " + ' UNION ALL BY NAME '.join(lecturas)
+        )
+
+        columnas = [d[0] for d in conexion.execute(f"SELECT * FROM {self.tabla}_ORIGEN LIMIT 0").description]
+        renombres = [
+            f'"{origen}" AS {destino}' for origen, destino in self.renombrar.items()
+            if origen in columnas
+        ]
+        proyeccion = f"* RENAME ({', '.join(renombres)})" if renombres else '*'
+        conexion.execute(f"CREATE VIEW {self.tabla} AS SELECT {proyeccion} FROM {self.tabla}_ORIGEN")
+        return conexion
+
+    def _conectar_sqlite(self):
+        conexion = sqlite3.connect(':memory:', check_same_thread=False)
+        df = pd.concat([self._leer_extracto(ruta) for ruta in self.rutas], ignore_index=True)
+        df.to_sql(self.tabla, conexion, index=False)
+        return conexion
+
+    def traducir(self, sql: str) -> str:
+        if self.motor == 'duckdb':
+            # :nombre -> $nombre (sin tocar los casts ::tipo)
+            return re.sub(r'(?<![:\w]):(\w+)', r'$\1', sql)
+        return sql
+
+    def origen(self, tabla: str, muestra: Dict[str, Any] = None) -> str:
+        if muestra is None or self.motor != 'duckdb':
+            return super().origen(tabla, muestra)
+        metodo = 'system' if muestra['bloques'] else 'bernoulli'
+        origen = f"{tabla} TABLESAMPLE {metodo}({muestra['porcentaje']}%)"
+        if muestra['semilla'] is not None:
+            origen += f" REPEATABLE ({muestra['semilla']})"
+        return origen
+
+    def expresion_mes(self, columna: str) -> str:
+        if self.motor == 'duckdb':
+            return f"date_trunc('month', {columna})"
+        return f"strftime('%Y-%m-01', {columna})"
+
+    def leer(self, conexion, sql: str, parametros: Dict[str, Any] = None) -> pd.DataFrame:
+        if duckdb is not None and isinstance(conexion, duckdb.DuckDBPyConnection):
+            # Resultado columnar directo a pandas
+            return conexion.execute(self.traducir(sql), parametros or {}).df()
+        return super().leer(conexion, sql, parametros)
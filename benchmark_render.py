@@ -0,0 +1,461 @@
+import argparse
+import gzip
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Dict, List, Any
+import numpy as np
+import pandas as pd
+from agregaciones import construir_cubo
+from reduccion_datos import reducir_visualizacion
+from render_json_html import (
+    SECCIONES, VERSION_SECCIONES, DIRECTORIO_VENDOR, PaqueteDashboard,
+    render, partes_informe, plantilla_render, datos_sidecar, renderizar_lote
+)
+
+
+# Tamaños de los informes sintéticos, de un informe real pequeño a una
+# cohorte nacional: pacientes (filas del cubo), bins de edad (filas de la
+# tabla y del histograma), categorías de sexo, frases por lista de
+# insights, regiones y servicios (celdas del cubo) y días de la serie.
+ESCALAS_BENCHMARK = {
+    'pequena': {'pacientes': 50, 'bins_edad': 2, 'sexos': 2, 'insights': 2,
+                'regiones': 1, 'servicios': 1, 'dias': 30},
+    'mediana': {'pacientes': 5_000, 'bins_edad': 20, 'sexos': 3, 'insights': 10,
+                'regiones': 17, 'servicios': 10, 'dias': 365},
+    'grande': {'pacientes': 50_000, 'bins_edad': 100, 'sexos': 4, 'insights': 50,
+               'regiones': 17, 'servicios': 40, 'dias': 1_500},
+    'enorme': {'pacientes': 200_000, 'bins_edad': 400, 'sexos': 6, 'insights': 200,
+               'regiones': 20, 'servicios': 60, 'dias': 3_650}
+}
+
+# Presupuestos de peso de la página. Por encima de ~1.500 nodos el
+# navegador tarda en calcular estilos y layout, y el script en línea se
+# parsea y compila en el hilo principal antes de pintar nada.
+PRESUPUESTOS_PAGINA = {
+    'html_bytes': 250_000,
+    'script_inline_bytes': 150_000,
+    'nodos_dom': 1_500
+}
+
+# Empeoramiento tolerado frente a unos resultados de referencia (nuevo / referencia)
+TOLERANCIA_REGRESION = {
+    'mediana_ms': 1.25,
+    'pico_memoria_kb': 1.25,
+    'html_bytes': 1.05
+}
+
+# Por debajo de esta diferencia el tiempo es ruido, aunque el ratio sea grande
+MARGEN_MS = 0.5
+
+# Variantes de la página medidas por defecto (los modos paquete_* necesitan las librerías vendorizadas)
+MODOS_BENCHMARK = ['dashboard', 'perezoso']
+
+FRASE_SINTETICA = ("Insight sintético {i}: el grupo {grupo} concentra el {porcentaje:.1f}% de los casos "
+                   "y su tendencia se mantiene estable en los últimos periodos analizados.")
+
+
+# ============================================================================
+# INFORMES SINTÉTICOS
+# ============================================================================
+
+def informe_sintetico(escala: Dict[str, int], semilla: int = 0) -> Dict[str, Any]:
+    """
+    Genera un informe_completo.json con la estructura del pipeline.
+
+    Las estadísticas, la distribución por edad y el cubo salen de una
+    cohorte aleatoria (reproducible con la semilla), así que los totales
+    cuadran entre sí como en un informe real; las series de visualización
+    se reducen igual que en generarOracle.
+    """
+    rng = np.random.default_rng(semilla)
+    n = escala['pacientes']
+    edad_maxima = max(100, escala['bins_edad'])
+    edades = np.clip(rng.normal(edad_maxima * 0.4, edad_maxima * 0.2, n), 0, edad_maxima - 1).astype(int)
+    sexos = rng.integers(1, escala['sexos'] + 1, n)
+    casos = rng.random(n) < 0.3
+    df = pd.DataFrame({
+        'EDAD': edades,
+        'SEXO': sexos,
+        'Comunidad Autónoma': rng.integers(0, escala['regiones'], n).astype(str),
+        'Servicio': rng.integers(0, escala['servicios'], n).astype(str),
+        'Coste APR': rng.gamma(2.0, 1500.0, n)
+    })
+
+    # Distribución por edad: bins de igual anchura sobre [0, edad_maxima)
+    cortes = np.linspace(0, edad_maxima, escala['bins_edad'] + 1).round().astype(int)
+    bins = np.searchsorted(cortes, edades, side='right') - 1
+    totales = np.bincount(bins, minlength=escala['bins_edad'])
+    casos_bin = np.bincount(bins, weights=casos, minlength=escala['bins_edad']).astype(int)
+    distribucion_edad = {
+        f"{inicio}-{fin - 1} años": {
+            'total': int(total),
+            'casos_esquizofrenia': int(caso),
+            'tasa': round(caso / total * 100, 2) if total else 0.0
+        }
+        for inicio, fin, total, caso in zip(cortes[:-1], cortes[1:], totales, casos_bin)
+    }
+
+    por_sexo = {}
+    for sexo in range(1, escala['sexos'] + 1):
+        mascara = sexos == sexo
+        total = int(mascara.sum())
+        por_sexo[str(sexo)] = {
+            'total': total,
+            'casos_esquizofrenia': int(casos[mascara].sum()),
+            'tasa': round(casos[mascara].mean() * 100, 2) if total else 0.0,
+            'edad_media': float(edades[mascara].mean()) if total else 0.0
+        }
+
+    def frases(k):
+        return [FRASE_SINTETICA.format(i=i + 1, grupo=f"G{i % 7 + 1}", porcentaje=rng.uniform(1, 60))
+                for i in range(k)]
+
+    fechas = np.arange(np.datetime64('2024-01-01'), np.datetime64('2024-01-01') + escala['dias'])
+    ingresos = rng.poisson(max(n / max(escala['dias'], 1), 1), escala['dias'])
+    cubo = construir_cubo(df)
+
+    return {
+        'metadata': {
+            'fecha_analisis': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'total_registros': n,
+            'modelo_ia': 'sintetico',
+            'fuente_datos': 'Benchmark'
+        },
+        'datos_empiricos': {
+            'tipo': 'DATOS_REALES',
+            'fuente': 'Cohorte sintética',
+            'estadisticas': {
+                'total_pacientes': n,
+                'edad_media': float(edades.mean()),
+                'edad_min': int(edades.min()),
+                'edad_max': int(edades.max()),
+                'edad_std': float(edades.std(ddof=1)) if n > 1 else 0.0,
+                'distribucion_sexo': {sexo: datos['total'] for sexo, datos in por_sexo.items()},
+                'casos_esquizofrenia': int(casos.sum()),
+                'tasa_esquizofrenia': round(casos.mean() * 100, 2),
+                'distribucion_edad': distribucion_edad,
+                'esquizofrenia_por_sexo': por_sexo,
+                'correlaciones': {'edad_esquizofrenia': float(np.corrcoef(edades, casos)[0, 1])},
+                'categoria_diagnostico': 'Sintética'
+            },
+            'visualizacion': {'color': '#2E86AB', 'icono': 'database'}
+        },
+        'insights_ia': {
+            'tipo': 'GENERADO_POR_IA',
+            'fuente': 'Benchmark',
+            'contenido': {
+                'patrones_demograficos': frases(escala['insights']),
+                'factores_asociados': frases(escala['insights']),
+                'analisis_comparativo': {'por_edad': frases(1)[0], 'por_sexo': frases(1)[0]},
+                'proyeccion_6_meses': {
+                    'nuevos_casos_estimados': int(n * 0.05),
+                    'tasa_crecimiento': 0.05,
+                    'confianza': 'media',
+                    'justificacion': frases(1)[0]
+                },
+                'recomendaciones': frases(escala['insights']),
+                'grupos_prioritarios': frases(escala['insights']),
+                'insights_adicionales': frases(escala['insights'])
+            },
+            'visualizacion': {'color': '#A23B72', 'icono': 'brain'}
+        },
+        'datos_visualizacion': reducir_visualizacion({
+            'distribucion_edad': [
+                {'rango': rango, 'total': d['total'], 'casos': d['casos_esquizofrenia'], 'tasa': d['tasa']}
+                for rango, d in distribucion_edad.items()
+            ],
+            'distribucion_sexo': [
+                {'sexo': sexo, 'total': d['total'], 'casos': d['casos_esquizofrenia'], 'tasa': d['tasa'],
+                 'edad_media': d['edad_media']}
+                for sexo, d in por_sexo.items()
+            ],
+            'serie_ingresos': [
+                {'fecha': str(fecha), 'casos': int(valor)} for fecha, valor in zip(fechas, ingresos)
+            ],
+            'tasas_prevalencia': {'actual': round(casos.mean() * 100, 2), 'proyectada': 0.05},
+            'cubo': cubo.a_compacto(['edad'])
+        })
+    }
+
+
+# ============================================================================
+# PESO DE LA PÁGINA
+# ============================================================================
+
+class _MedidorPagina(HTMLParser):
+    """Cuenta los elementos del documento y los bytes de los <script> en línea."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.nodos = 0
+        self.script_inline = 0
+        self._en_script = False
+
+    def handle_starttag(self, etiqueta, atributos):
+        self.nodos += 1
+        self._en_script = etiqueta == 'script' and not any(nombre == 'src' for nombre, _ in atributos)
+
+    def handle_startendtag(self, etiqueta, atributos):
+        self.nodos += 1
+
+    def handle_endtag(self, etiqueta):
+        if etiqueta == 'script':
+            self._en_script = False
+
+    def handle_data(self, datos):
+        if self._en_script:
+            self.script_inline += len(datos.encode('utf-8'))
+
+
+def peso_pagina(html: str) -> Dict[str, int]:
+    """Bytes del HTML (plano y gzip), bytes de script en línea y nodos del DOM."""
+    medidor = _MedidorPagina()
+    medidor.feed(html)
+    medidor.close()
+    cuerpo = html.encode('utf-8')
+    return {
+        'html_bytes': len(cuerpo),
+        'html_gzip_bytes': len(gzip.compress(cuerpo, compresslevel=6, mtime=0)),
+        'script_inline_bytes': medidor.script_inline,
+        'nodos_dom': medidor.nodos
+    }
+
+
+def comprobar_presupuestos(peso: Dict[str, int], presupuestos: Dict[str, int]) -> Dict[str, Dict[str, Any]]:
+    """Valor, límite y si se cumple cada presupuesto."""
+    return {
+        clave: {'valor': peso[clave], 'limite': limite, 'cumple': peso[clave] <= limite}
+        for clave, limite in presupuestos.items() if clave in peso
+    }
+
+
+# ============================================================================
+# MEDICIÓN DEL RENDER
+# ============================================================================
+
+def _percentil(valores: List[float], q: float) -> float:
+    return float(np.percentile(valores, q)) if valores else 0.0
+
+
+def medir_render(data: Dict[str, Any], repeticiones: int = 20, paquete: PaqueteDashboard = None,
+                 perezoso: bool = False) -> Dict[str, Any]:
+    """
+    Tiempo, memoria y tamaño del render de un informe.
+
+    El tiempo se mide sin tracemalloc (que lo multiplica) y la memoria en
+    una pasada aparte. También se cronometra cada sección por separado
+    para que una regresión apunte directamente a su generador.
+    """
+    render(data, paquete, perezoso)  # Calentamiento: plantillas y cachés de Python
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        html = render(data, paquete, perezoso)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+
+    plantilla, perezoso = plantilla_render(paquete, perezoso)
+    tiempos_secciones = {nombre: [] for nombre in SECCIONES if nombre in plantilla[1]}
+    for _ in range(max(repeticiones // 4, 1)):
+        partes = partes_informe(data, perezoso)
+        for nombre in tiempos_secciones:
+            inicio = time.perf_counter()
+            SECCIONES[nombre][1](partes)
+            tiempos_secciones[nombre].append((time.perf_counter() - inicio) * 1000)
+
+    tracemalloc.start()
+    try:
+        render(data, paquete, perezoso)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'render': {
+            'min_ms': round(min(tiempos), 3),
+            'mediana_ms': round(statistics.median(tiempos), 3),
+            'p95_ms': round(_percentil(tiempos, 95), 3)
+        },
+        'secciones_ms': {nombre: round(statistics.median(t), 3) for nombre, t in tiempos_secciones.items()},
+        'pico_memoria_kb': round(pico / 1024, 1),
+        'sidecar_bytes': len(datos_sidecar(data).encode('utf-8')) if perezoso else 0,
+        **peso_pagina(html)
+    }
+
+
+def medir_lote(escala: Dict[str, int], informes: int, procesos: int = None, paquete: PaqueteDashboard = None,
+               perezoso: bool = False) -> Dict[str, Any]:
+    """Render por lotes (renderizar_lote) de informes sintéticos escritos en una carpeta temporal."""
+    with tempfile.TemporaryDirectory(prefix='benchmark_render_') as carpeta:
+        entrada = Path(carpeta) / 'informes'
+        entrada.mkdir()
+        for i in range(informes):
+            with open(entrada / f"informe_{i:04d}.json", "w", encoding="utf-8") as f:
+                json.dump(informe_sintetico(escala, semilla=i), f, ensure_ascii=False)
+
+        inicio = time.perf_counter()
+        salidas = renderizar_lote([entrada], Path(carpeta) / 'html', procesos, paquete=paquete, perezoso=perezoso)
+        segundos = time.perf_counter() - inicio
+
+    return {
+        'informes': informes,
+        'procesos': procesos or os.cpu_count(),
+        'segundos': round(segundos, 3),
+        'ms_por_informe': round(segundos / max(informes, 1) * 1000, 3),
+        'bytes_totales': sum(tamano for _, tamano in salidas)
+    }
+
+
+# ============================================================================
+# SUITE COMPLETA Y COMPARACIÓN CON UNA REFERENCIA
+# ============================================================================
+
+def _paquete_modo(modo: str, directorio_vendor: str):
+    """(paquete, perezoso) de un modo de MODOS_BENCHMARK o 'paquete_inline' / 'paquete_compartido'."""
+    if modo.startswith('paquete_'):
+        return PaqueteDashboard(modo[len('paquete_'):], directorio_vendor), False
+    return None, modo == 'perezoso'
+
+
+def ejecutar_benchmark(escalas: List[str] = None, modos: List[str] = None, repeticiones: int = 20,
+                       presupuestos: Dict[str, int] = None, lote: int = 0, procesos: int = None,
+                       directorio_vendor: str = DIRECTORIO_VENDOR) -> Dict[str, Any]:
+    """
+    Mide el render de informes sintéticos de tamaño creciente.
+
+    Args:
+        escalas: Nombres de ESCALAS_BENCHMARK (default: todas)
+        modos: 'dashboard', 'perezoso', 'paquete_inline' o 'paquete_compartido' (default: MODOS_BENCHMARK)
+        repeticiones: Renders cronometrados por informe y modo
+        presupuestos: (Opcional) Límites de peso; se combinan con PRESUPUESTOS_PAGINA
+        lote: Si > 0, informes por escala del render por lotes
+        procesos: Procesos del pool del lote (default: núcleos)
+        directorio_vendor: Librerías vendorizadas (solo modos paquete_*)
+
+    Returns:
+        Resultados (serializables a JSON) con los presupuestos incumplidos
+    """
+    escalas = escalas or list(ESCALAS_BENCHMARK)
+    modos = modos or MODOS_BENCHMARK
+    presupuestos = {**PRESUPUESTOS_PAGINA, **(presupuestos or {})}
+    paquetes = {modo: _paquete_modo(modo, directorio_vendor) for modo in modos}
+
+    resultados = {
+        'fecha': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'entorno': {
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'procesadores': os.cpu_count(),
+            'version_secciones': VERSION_SECCIONES
+        },
+        'configuracion': {
+            'escalas': {nombre: ESCALAS_BENCHMARK[nombre] for nombre in escalas},
+            'modos': modos,
+            'repeticiones': repeticiones,
+            'presupuestos': presupuestos
+        },
+        'informes': [],
+        'lotes': [],
+        'incumplidos': []
+    }
+
+    for nombre in escalas:
+        data = informe_sintetico(ESCALAS_BENCHMARK[nombre])
+        tamano_json = len(json.dumps(data, ensure_ascii=False).encode('utf-8'))
+        for modo in modos:
+            paquete, perezoso = paquetes[modo]
+            medida = medir_render(data, repeticiones, paquete, perezoso)
+            medida['presupuestos'] = comprobar_presupuestos(medida, presupuestos)
+            resultados['informes'].append({'escala': nombre, 'modo': modo, 'json_bytes': tamano_json, **medida})
+            for clave, comprobacion in medida['presupuestos'].items():
+                if not comprobacion['cumple']:
+                    resultados['incumplidos'].append({'escala': nombre, 'modo': modo, 'presupuesto': clave,
+                                                      **comprobacion})
+            print(f"⏱️ {nombre:<8} {modo:<18} {medida['render']['mediana_ms']:>9.2f} ms  "
+                  f"{medida['pico_memoria_kb']:>9.0f} KB  {medida['html_bytes'] / 1000:>8.1f} kB HTML  "
+                  f"{medida['nodos_dom']:>6} nodos")
+
+        if lote > 0:
+            paquete, perezoso = paquetes[modos[0]]
+            medida_lote = medir_lote(ESCALAS_BENCHMARK[nombre], lote, procesos, paquete, perezoso)
+            resultados['lotes'].append({'escala': nombre, 'modo': modos[0], **medida_lote})
+
+    return resultados
+
+
+def comparar_con_referencia(resultados: Dict[str, Any], referencia: Dict[str, Any],
+                            tolerancia: Dict[str, float] = None) -> List[Dict[str, Any]]:
+    """
+    Métricas que empeoran más de lo tolerado respecto a unos resultados anteriores.
+
+    Solo se comparan las combinaciones (escala, modo) presentes en ambos.
+    """
+    tolerancia = {**TOLERANCIA_REGRESION, **(tolerancia or {})}
+    anteriores = {(r['escala'], r['modo']): r for r in referencia.get('informes', [])}
+    regresiones = []
+    for actual in resultados['informes']:
+        anterior = anteriores.get((actual['escala'], actual['modo']))
+        if anterior is None:
+            continue
+        for metrica, maximo in tolerancia.items():
+            nuevo = actual['render'][metrica] if metrica == 'mediana_ms' else actual[metrica]
+            previo = anterior['render'][metrica] if metrica == 'mediana_ms' else anterior[metrica]
+            if previo <= 0 or nuevo <= previo * maximo:
+                continue
+            if metrica == 'mediana_ms' and nuevo - previo < MARGEN_MS:
+                continue
+            regresiones.append({'escala': actual['escala'], 'modo': actual['modo'], 'metrica': metrica,
+                                'referencia': previo, 'actual': nuevo, 'ratio': round(nuevo / previo, 3)})
+    return regresiones
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del render del dashboard y presupuestos de peso")
+    parser.add_argument("--escalas", nargs="+", choices=list(ESCALAS_BENCHMARK),
+                        help="Tamaños de informe a medir (default: todos)")
+    parser.add_argument("--modos", nargs="+", default=MODOS_BENCHMARK,
+                        choices=MODOS_BENCHMARK + ["paquete_inline", "paquete_compartido"],
+                        help="Variantes de la página (default: %(default)s)")
+    parser.add_argument("--repeticiones", type=int, default=20, help="Renders cronometrados (default: %(default)s)")
+    parser.add_argument("--lote", type=int, default=0, help="Informes por escala del render por lotes (0: sin lote)")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos del pool del lote (default: núcleos)")
+    parser.add_argument("--presupuestos", help="JSON con límites de peso (html_bytes, script_inline_bytes, nodos_dom)")
+    parser.add_argument("--referencia", help="Resultados anteriores: falla si alguna métrica empeora")
+    parser.add_argument("--vendor", default=DIRECTORIO_VENDOR, help="Librerías vendorizadas (modos paquete_*)")
+    parser.add_argument("--salida", default="resultados_benchmark.json",
+                        help="JSON de resultados (default: %(default)s)")
+    args = parser.parse_args()
+
+    presupuestos = None
+    if args.presupuestos:
+        with open(args.presupuestos, "r", encoding="utf-8") as f:
+            presupuestos = json.load(f)
+
+    resultados = ejecutar_benchmark(args.escalas, args.modos, args.repeticiones, presupuestos,
+                                    args.lote, args.procesos, args.vendor)
+    resultados['regresiones'] = []
+    if args.referencia:
+        with open(args.referencia, "r", encoding="utf-8") as f:
+            resultados['regresiones'] = comparar_con_referencia(resultados, json.load(f))
+
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, indent=2, ensure_ascii=False)
+    print(f"💾 Resultados en {args.salida}")
+
+    for fallo in resultados['incumplidos']:
+        print(f"❌ {fallo['escala']}/{fallo['modo']}: {fallo['presupuesto']} = {fallo['valor']} "
+              f"(límite {fallo['limite']})")
+    for regresion in resultados['regresiones']:
+        print(f"📉 {regresion['escala']}/{regresion['modo']}: {regresion['metrica']} "
+              f"{regresion['referencia']} → {regresion['actual']} (x{regresion['ratio']})")
+    if resultados['incumplidos'] or resultados['regresiones']:
+        sys.exit(1)
+    print("✅ Todos los presupuestos se cumplen")
@@ -0,0 +1,251 @@
+import pandas as pd
+import json
+import hashlib
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Any
+from agregaciones import construir_cubo, CuboAgregacion, AcumuladorCorrelacion, COLUMNAS_CORRELACION
+from pronostico import contar_ingresos, contar_ingresos_diarios, combinar_conteos, pronosticar_conteos
+from resumen_cohorte import refrescar_resumen
+
+
+class CargadorIncremental:
+    """
+    Carga incremental de una cohorte desde Oracle usando una marca de agua.
+
+    Por cada cohorte (tabla + filtros) se guarda en disco la marca de agua
+    y los agregados combinables (cubo, acumulador de correlaciones y
+    conteos de ingresos por mes y por día). En cada actualización solo se
+    leen las filas posteriores a la marca y se combinan con lo guardado,
+    de modo que calcular_estadisticas trabaja sobre el delta y el
+    pronóstico y la serie de ingresos cubren toda la cohorte.
+
+    Cada cierto tiempo (o cada cierto número de cargas) se hace una
+    reconciliación completa que reconstruye el estado desde cero y avisa
+    si había deriva (filas modificadas o borradas, commits tardíos...).
+
+    Nota: si se usa ORA_ROWSCN la tabla debería crearse con ROWDEPENDENCIES;
+    sin ella el SCN es por bloque y una carga puede volver a leer filas ya
+    contadas. En ese caso es preferible una columna de secuencia o de fecha
+    de carga.
+    """
+
+    def __init__(self, analizador, directorio_estado: str = 'estado_incremental',
+                 columna_marca: str = 'ORA_ROWSCN', dias_reconciliacion: int = 7,
+                 cargas_por_reconciliacion: int = None):
+        """
+        Inicializa el cargador.
+
+        Args:
+            analizador: Instancia de AnalizadorSaludMentalIA (aporta conexión y consulta)
+            directorio_estado: Carpeta donde se guarda el estado de cada cohorte
+            columna_marca: Expresión SQL monótona (ORA_ROWSCN, secuencia, fecha de carga)
+            dias_reconciliacion: Días máximos entre reconciliaciones completas
+            cargas_por_reconciliacion: (Opcional) Cargas incrementales máximas entre reconciliaciones
+        """
+        self.analizador = analizador
+        self.directorio_estado = Path(directorio_estado)
+        self.columna_marca = columna_marca
+        self.dias_reconciliacion = dias_reconciliacion
+        self.cargas_por_reconciliacion = cargas_por_reconciliacion
+
+    # ------------------------------------------------------------------
+    # Estado persistido
+    # ------------------------------------------------------------------
+
+    def _clave_cohorte(self, filtro_edad: int, tabla: str) -> str:
+        """Identificador estable de la cohorte (tabla + consulta + marca)."""
+        query = self.analizador._construir_query(filtro_edad, tabla)
+        firma = f"{query}|{self.columna_marca}".encode('utf-8')
+        return f"{tabla.lower()}_{hashlib.sha256(firma).hexdigest()[:12]}"
+
+    def _ruta_estado(self, clave: str) -> Path:
+        return self.directorio_estado / f"{clave}.json"
+
+    def cargar_estado(self, clave: str):
+        """Lee el estado guardado de una cohorte (None si no existe)."""
+        ruta = self._ruta_estado(clave)
+        if not ruta.exists():
+            return None
+        with open(ruta, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def guardar_estado(self, clave: str, estado: Dict[str, Any]):
+        """Guarda el estado de una cohorte de forma atómica."""
+        self.directorio_estado.mkdir(parents=True, exist_ok=True)
+        ruta = self._ruta_estado(clave)
+        temporal = ruta.with_suffix('.tmp')
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(estado, f, ensure_ascii=False)
+        temporal.replace(ruta)
+
+    @staticmethod
+    def _serializar_marca(valor):
+        """Convierte la marca de agua a un valor apto para JSON."""
+        if valor is None or pd.isna(valor):
+            return None
+        if isinstance(valor, (pd.Timestamp, datetime)):
+            return {'tipo': 'fecha', 'valor': pd.Timestamp(valor).isoformat()}
+        return {'tipo': 'numero', 'valor': int(valor) if float(valor).is_integer() else float(valor)}
+
+    @staticmethod
+    def _deserializar_marca(marca):
+        """Convierte la marca guardada al valor que se pasa como bind."""
+        if marca is None:
+            return None
+        if marca['tipo'] == 'fecha':
+            return pd.Timestamp(marca['valor']).to_pydatetime()
+        return marca['valor']
+
+    def _necesita_reconciliacion(self, estado: Dict[str, Any]) -> bool:
+        """Decide si toca una recarga completa para evitar deriva."""
+        ultima = datetime.fromisoformat(estado['ultima_reconciliacion'])
+        if datetime.now() - ultima >= timedelta(days=self.dias_reconciliacion):
+            return True
+        if (self.cargas_por_reconciliacion is not None
+                and estado['cargas_desde_reconciliacion'] >= self.cargas_por_reconciliacion):
+            return True
+        return False
+
+    def _acumular_ingresos(self, df: pd.DataFrame, estado: Dict[str, Any] = None):
+        """
+        Conteos de ingresos de la cohorte: los guardados más los de df.
+
+        Returns:
+            (conteos mensuales por subcohorte, fecha de ingreso máxima,
+             ingresos por día); None si no hay fechas de ingreso
+        """
+        conteos, fecha_maxima, diarios = None, None, None
+        if estado is not None and estado.get('conteos_ingresos'):
+            conteos = pd.DataFrame(estado['conteos_ingresos'])
+            fecha_maxima = pd.Timestamp(estado['fecha_maxima_ingreso'])
+            diarios = pd.Series(estado['ingresos_diarios'], dtype='int64')
+            diarios.index = pd.to_datetime(diarios.index)
+
+        if 'FECHA_INGRESO' in df.columns and len(df) > 0:
+            conteos_nuevos, fecha_nueva = contar_ingresos(
+                df, 'FECHA_INGRESO', self.analizador.columnas_cohorte_pronostico
+            )
+            if fecha_nueva is not None:
+                conteos = conteos_nuevos if conteos is None else combinar_conteos(conteos, conteos_nuevos)
+                fecha_maxima = fecha_nueva if fecha_maxima is None else max(fecha_maxima, fecha_nueva)
+                nuevos = contar_ingresos_diarios(df, 'FECHA_INGRESO')
+                diarios = nuevos if diarios is None else diarios.add(nuevos, fill_value=0).astype('int64')
+        return conteos, fecha_maxima, diarios
+
+    # ------------------------------------------------------------------
+    # Actualización
+    # ------------------------------------------------------------------
+
+    def _leer(self, filtro_edad: int, tabla: str, marca=None):
+        """Lee la cohorte completa (marca=None) o solo las filas posteriores a la marca."""
+        columnas_extra = [f"{self.columna_marca} AS MARCA_AGUA"]
+        if marca is None:
+            return self.analizador.cargar_datos(filtro_edad, tabla, columnas_extra=columnas_extra)
+        return self.analizador.cargar_datos(
+            filtro_edad,
+            tabla,
+            columnas_extra=columnas_extra,
+            condiciones_extra=[f"{self.columna_marca} > :marca_agua"],
+            parametros={'marca_agua': marca}
+        )
+
+    def actualizar(self, filtro_edad: int = 20, tabla: str = "SALUDMENTAL",
+                   forzar_completa: bool = False):
+        """
+        Actualiza la cohorte y recalcula los datos empíricos del analizador.
+
+        Args:
+            filtro_edad: Edad máxima para filtrar (default: 20)
+            tabla: Nombre de la tabla (default: SALUDMENTAL)
+            forzar_completa: Si True, hace una reconciliación completa
+
+        Returns:
+            datos_empiricos actualizados
+        """
+        clave = self._clave_cohorte(filtro_edad, tabla)
+        estado = self.cargar_estado(clave)
+        completa = (
+            forzar_completa
+            or estado is None
+            or estado['marca_agua'] is None
+            or 'conteos_ingresos' not in estado  # Estado anterior a los conteos de ingresos
+            or self._necesita_reconciliacion(estado)
+        )
+
+        if completa:
+            print(f"🔄 Carga completa de la cohorte {clave} (reconciliación)")
+            df = self._leer(filtro_edad, tabla)
+            cubo = construir_cubo(df, self.analizador.dimensiones, self.analizador.medidas)
+            correlacion = AcumuladorCorrelacion.desde_df(df, COLUMNAS_CORRELACION)
+
+            if estado is not None:
+                anterior = estado['total_pacientes']
+                actual = int(cubo.total()['conteo'])
+                if anterior != actual:
+                    print(f"⚠️ Deriva detectada: estado incremental {anterior} vs real {actual} registros")
+                else:
+                    print("✅ Sin deriva respecto al estado incremental")
+
+            marca = df['MARCA_AGUA'].max() if len(df) > 0 else None
+            cargas = 0
+            ultima_reconciliacion = datetime.now().isoformat()
+        else:
+            marca_anterior = self._deserializar_marca(estado['marca_agua'])
+            print(f"⚡ Carga incremental de la cohorte {clave} desde marca {marca_anterior}")
+            df = self._leer(filtro_edad, tabla, marca_anterior)
+
+            cubo = CuboAgregacion.desde_dict(estado['cubo'])
+            correlacion = AcumuladorCorrelacion.desde_dict(estado['correlacion'])
+            if len(df) > 0:
+                cubo = cubo.combinar(
+                    construir_cubo(df, self.analizador.dimensiones, self.analizador.medidas)
+                )
+                correlacion = correlacion.combinar(
+                    AcumuladorCorrelacion.desde_df(df, COLUMNAS_CORRELACION)
+                )
+                marca = df['MARCA_AGUA'].max()
+            else:
+                marca = marca_anterior
+            print(f"   Filas nuevas: {len(df)}")
+            cargas = estado['cargas_desde_reconciliacion'] + 1
+            ultima_reconciliacion = estado['ultima_reconciliacion']
+
+        # Las cargas servidas desde la vista resumen deben ver las filas nuevas
+        resumen = self.analizador.resumen
+        if resumen is not None and resumen['tabla'] == tabla and (completa or len(df) > 0):
+            refrescar_resumen(self.analizador.connection, resumen['vista'])
+
+        datos_empiricos = self.analizador.calcular_estadisticas(cubo=cubo, correlacion=correlacion)
+
+        # El pronóstico y la serie de ingresos, de los conteos de toda la cohorte
+        conteos, fecha_maxima, diarios = self._acumular_ingresos(df, None if completa else estado)
+        self.analizador.ingresos_diarios = diarios
+        if conteos is not None and fecha_maxima is not None:
+            print("🔮 Calculando pronóstico estadístico a 6 meses...")
+            pronostico = pronosticar_conteos(conteos, fecha_maxima, horizonte=6)
+            if pronostico:
+                datos_empiricos['pronostico_6_meses'] = pronostico
+
+        self.guardar_estado(clave, {
+            'cohorte': clave,
+            'tabla': tabla,
+            'filtro_edad': filtro_edad,
+            'columna_marca': self.columna_marca,
+            'marca_agua': self._serializar_marca(marca),
+            'total_pacientes': datos_empiricos['total_pacientes'],
+            'cubo': cubo.a_dict(),
+            'correlacion': correlacion.a_dict(),
+            'conteos_ingresos': conteos.to_dict(orient='records') if conteos is not None else None,
+            'fecha_maxima_ingreso': fecha_maxima.isoformat() if fecha_maxima is not None else None,
+            'ingresos_diarios': (
+                {fecha.strftime('%Y-%m-%d'): int(casos) for fecha, casos in diarios.items()}
+                if diarios is not None else None
+            ),
+            'ultima_reconciliacion': ultima_reconciliacion,
+            'cargas_desde_reconciliacion': cargas,
+            'ultima_actualizacion': datetime.now().isoformat()
+        })
+        print(f"💾 Estado incremental guardado en: {self._ruta_estado(clave)}")
+
+        return datos_empiricos
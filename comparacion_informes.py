@@ -0,0 +1,453 @@
+import html
+import json
+from pathlib import Path
+from typing import Dict, List, Any, Tuple
+import numpy as np
+from render_json_html import (
+    LIBRERIAS_CDN, ESTILOS, ESTILOS_PAGINACION, CONFIGURACION_GRAFICOS, TABLA_PAGINADA, DIRECTORIO_ACTIVOS,
+    compilar_plantilla, ensamblar, fijar_hueco, ruta_sidecar, escribir_comprimidos
+)
+
+
+# KPIs que se comparan: (clave, etiqueta, ruta dentro del informe, decimales)
+KPIS_COMPARACION = [
+    ('total_pacientes', 'Pacientes', ('datos_empiricos', 'estadisticas', 'total_pacientes'), 0),
+    ('edad_media', 'Edad media', ('datos_empiricos', 'estadisticas', 'edad_media'), 2),
+    ('edad_std', 'σ edad', ('datos_empiricos', 'estadisticas', 'edad_std'), 2),
+    ('nuevos_casos_estimados', 'Proyección 6 meses',
+     ('insights_ia', 'contenido', 'proyeccion_6_meses', 'nuevos_casos_estimados'), 0),
+    ('tasa_crecimiento', 'Crecimiento %', ('insights_ia', 'contenido', 'proyeccion_6_meses', 'tasa_crecimiento'), 2)
+]
+
+
+# ============================================================================
+# CARGA Y ALINEACIÓN
+# ============================================================================
+
+def cargar_informes(entradas) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Lee los informes (archivos o carpetas) y los ordena por fecha de análisis.
+
+    Returns:
+        Lista de (nombre, informe); el nombre es el del archivo sin extensión
+    """
+    rutas = []
+    for entrada in map(Path, entradas):
+        rutas.extend(sorted(entrada.glob("*.json")) if entrada.is_dir() else [entrada])
+    informes = []
+    for ruta in rutas:
+        if ruta.name.endswith(".datos.json"):
+            continue
+        with open(ruta, "r", encoding="utf-8") as f:
+            informes.append((ruta.stem, json.load(f)))
+    informes.sort(key=lambda par: (str(par[1].get('metadata', {}).get('fecha_analisis', '')), par[0]))
+    return informes
+
+
+def _valor(data: Dict[str, Any], ruta: tuple) -> float:
+    for clave in ruta:
+        if not isinstance(data, dict) or clave not in data:
+            return np.nan
+        data = data[clave]
+    try:
+        return float(data)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _matriz_categorias(filas: List[Dict[str, Any]], campo: str = 'total') -> Tuple[List[str], np.ndarray]:
+    """
+    Alinea las categorías de varios informes en una matriz (informes x categorías).
+
+    Las categorías se unen en orden de primera aparición; las que faltan
+    en un informe cuentan 0.
+    """
+    posiciones = {}
+    for categorias in filas:
+        for etiqueta in categorias:
+            posiciones.setdefault(str(etiqueta), len(posiciones))
+    matriz = np.zeros((len(filas), len(posiciones)))
+    for i, categorias in enumerate(filas):
+        for etiqueta, datos in categorias.items():
+            matriz[i, posiciones[str(etiqueta)]] = datos.get(campo, 0)
+    return list(posiciones), matriz
+
+
+def alinear_informes(informes: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Estadísticas de N informes alineadas en arrays.
+
+    Returns:
+        {'nombres', 'fechas', 'modelos', 'kpis' (N x K), 'edad': (etiquetas, N x B),
+         'sexo': (etiquetas, N x S), 'edad_media_sexo': N x S}
+    """
+    estadisticas = [data.get('datos_empiricos', {}).get('estadisticas', {}) for _, data in informes]
+    sexos = [est.get('esquizofrenia_por_sexo', {}) for est in estadisticas]
+    etiquetas_sexo, totales_sexo = _matriz_categorias(sexos)
+    _, edad_media_sexo = _matriz_categorias(sexos, 'edad_media')
+    return {
+        'nombres': [nombre for nombre, _ in informes],
+        'fechas': [data.get('metadata', {}).get('fecha_analisis', '') for _, data in informes],
+        'modelos': [data.get('metadata', {}).get('modelo_ia', '') for _, data in informes],
+        'kpis': np.array([[_valor(data, ruta) for _, _, ruta, _ in KPIS_COMPARACION] for _, data in informes],
+                         dtype=float).reshape(len(informes), len(KPIS_COMPARACION)),
+        'edad': _matriz_categorias([est.get('distribucion_edad', {}) for est in estadisticas]),
+        'sexo': (etiquetas_sexo, totales_sexo),
+        'edad_media_sexo': np.where(totales_sexo > 0, edad_media_sexo, np.nan)
+    }
+
+
+# ============================================================================
+# COMPARACIÓN VECTORIZADA
+# ============================================================================
+
+def comparar(alineado: Dict[str, Any], referencia: int = 0) -> Dict[str, np.ndarray]:
+    """
+    Deltas, ratios, proporciones y tendencias de todos los informes a la vez.
+
+    Args:
+        alineado: Resultado de alinear_informes
+        referencia: Índice del informe con el que se comparan los demás
+
+    Returns:
+        {'delta', 'ratio' (N x K), 'tendencia' (pendiente por informe, K),
+         'cambio' (% del primero al último, K), 'proporcion_edad', 'proporcion_sexo'}
+    """
+    kpis = alineado['kpis']
+    n = len(kpis)
+    if not 0 <= referencia < n:
+        raise ValueError(f"Informe de referencia fuera de rango: {referencia} (hay {n} informes)")
+    base = kpis[referencia]
+
+    # Pendiente de mínimos cuadrados por columna (los huecos toman la media de la columna)
+    x = np.arange(n, dtype=float) - (n - 1) / 2
+    validos = ~np.isnan(kpis)
+    cuenta = validos.sum(axis=0)
+    medias = np.divide(np.where(validos, kpis, 0).sum(axis=0), cuenta,
+                       out=np.zeros(kpis.shape[1]), where=cuenta > 0)
+    rellenos = np.where(np.isnan(kpis), medias, kpis)
+    tendencia = x @ (rellenos - medias) / (x @ x) if n > 1 else np.zeros(kpis.shape[1])
+
+    def proporcion(matriz):
+        sumas = matriz.sum(axis=1, keepdims=True)
+        return np.divide(matriz, sumas, out=np.zeros_like(matriz), where=sumas > 0)
+
+    return {
+        'delta': kpis - base,
+        'ratio': np.divide(kpis, base, out=np.full_like(kpis, np.nan), where=(base != 0) & ~np.isnan(base)),
+        'tendencia': tendencia,
+        'cambio': np.divide((kpis[-1] - kpis[0]) * 100, np.abs(kpis[0]), out=np.full(kpis.shape[1], np.nan),
+                            where=(kpis[0] != 0) & ~np.isnan(kpis[0])) if n else np.array([]),
+        'proporcion_edad': proporcion(alineado['edad'][1]),
+        'proporcion_sexo': proporcion(alineado['sexo'][1])
+    }
+
+
+def _lista(valores: np.ndarray, decimales: int = 2):
+    """Array a listas de JSON (NaN -> null, que JSON.parse sí acepta)."""
+    valores = np.asarray(valores, dtype=float)
+    return np.where(np.isnan(valores), None, np.round(valores, decimales)).tolist()
+
+
+def datos_comparacion(informes: List[Tuple[str, Dict[str, Any]]], referencia: int = 0) -> Dict[str, Any]:
+    """Datos de la página de comparación (listos para JSON, orientados por columnas)."""
+    alineado = alinear_informes(informes)
+    resultado = comparar(alineado, referencia)
+    return {
+        'informes': {
+            'nombres': alineado['nombres'],
+            'fechas': alineado['fechas'],
+            'modelos': alineado['modelos']
+        },
+        'referencia': referencia,
+        'kpis': {
+            'claves': [clave for clave, _, _, _ in KPIS_COMPARACION],
+            'etiquetas': [etiqueta for _, etiqueta, _, _ in KPIS_COMPARACION],
+            'decimales': [decimales for _, _, _, decimales in KPIS_COMPARACION],
+            'valores': _lista(alineado['kpis']),
+            'delta': _lista(resultado['delta']),
+            'ratio': _lista(resultado['ratio'], 3),
+            'tendencia': _lista(resultado['tendencia'], 3),
+            'cambio': _lista(resultado['cambio'])
+        },
+        'edad': {
+            'etiquetas': alineado['edad'][0],
+            'totales': _lista(alineado['edad'][1], 0),
+            'proporcion': _lista(resultado['proporcion_edad'] * 100, 1)
+        },
+        'sexo': {
+            'etiquetas': alineado['sexo'][0],
+            'totales': _lista(alineado['sexo'][1], 0),
+            'proporcion': _lista(resultado['proporcion_sexo'] * 100, 1),
+            'edad_media': _lista(alineado['edad_media_sexo'], 1)
+        }
+    }
+
+
+# ============================================================================
+# PÁGINA DE COMPARACIÓN
+# ============================================================================
+
+INICIO_COMPARACION = """<!DOCTYPE html>
+<html lang="es">
+<head>
+  <meta charset="UTF-8" />
+  <meta name="viewport" content="width=device-width, initial-scale=1.0" />
+  <title>🏥 Comparación de Informes - Dashboard Clínico</title>
+"""
+
+CUERPO_COMPARACION = """</head>
+<body>
+  <header>
+    <div class="header-content">
+      <h1>🏥 Comparación de Informes</h1>
+      <div class="header-meta">
+        <span>📚 <strong>Informes:</strong> {{num_informes}}</span>
+        <span>📌 <strong>Referencia:</strong> {{referencia}}</span>
+      </div>
+    </div>
+  </header>
+
+  <div class="container">
+    <h2 style="margin: 2rem 0 1rem; font-size: 1.8rem; color: var(--color-primary);">📈 Tendencias</h2>
+    <div class="grid" id="tendencias"></div>
+
+    <div class="card">
+      <div class="card-header">
+        <div class="card-title">
+          <div class="card-icon icon-chart">📉</div>
+          Evolución entre informes
+        </div>
+      </div>
+      <div class="chart-container">
+        <canvas id="chartEvolucion"></canvas>
+      </div>
+    </div>
+
+    <div class="card">
+      <div class="card-header">
+        <div class="card-title">
+          <div class="card-icon icon-empirico">📊</div>
+          Indicadores por informe (Δ y ratio frente a la referencia)
+        </div>
+      </div>
+      <table>
+        <thead id="cabecera-kpis"></thead>
+        <tbody id="filas-kpis"><tr><td>⏳ Cargando datos...</td></tr></tbody>
+      </table>
+    </div>
+
+    <h2 style="margin: 2rem 0 1rem; font-size: 1.8rem; color: var(--color-primary);">🧩 Distribución por edad (% de cada informe)</h2>
+    <div class="grid" id="multiples"></div>
+  </div>
+
+  <!-- SCRIPTS -->
+"""
+
+# Usa tablaPaginada y URL_DATOS de TABLA_PAGINADA (en línea o en el JS del paquete)
+CODIGO_COMPARACION = """
+    const formato = (v, d) => v === null ? '-' : Number(v).toFixed(d);
+    const conSigno = (v, d) => v === null ? '-' : (v > 0 ? '+' : '') + Number(v).toFixed(d);
+
+    function pintarTendencias(datos) {
+      const k = datos.kpis, contenedor = document.getElementById('tendencias');
+      k.etiquetas.forEach((etiqueta, j) => {
+        const tarjeta = document.createElement('div');
+        tarjeta.className = 'card stat-card';
+        tarjeta.innerHTML = '<div class="stat-value"></div><div class="stat-label"></div><div class="stat-sublabel"></div>';
+        tarjeta.querySelector('.stat-value').textContent = conSigno(k.cambio[j], 1) + '%';
+        tarjeta.querySelector('.stat-label').textContent = etiqueta;
+        tarjeta.querySelector('.stat-sublabel').textContent = `Pendiente ${conSigno(k.tendencia[j], 2)} por informe`;
+        contenedor.appendChild(tarjeta);
+      });
+    }
+
+    function pintarEvolucion(datos) {
+      const k = datos.kpis, total = k.claves.indexOf('total_pacientes'), edad = k.claves.indexOf('edad_media');
+      new Chart(document.getElementById('chartEvolucion'), {
+        type: 'line',
+        data: {
+          labels: datos.informes.nombres,
+          datasets: [
+            { label: k.etiquetas[total], data: k.valores.map(fila => fila[total]), borderColor: '#2E86AB', yAxisID: 'y' },
+            { label: k.etiquetas[edad], data: k.valores.map(fila => fila[edad]), borderColor: '#A23B72', yAxisID: 'y1' }
+          ]
+        },
+        options: {
+          responsive: true,
+          maintainAspectRatio: false,
+          animation: false,
+          elements: { point: { radius: datos.informes.nombres.length > 50 ? 0 : 3 } },
+          plugins: { datalabels: { display: false } },
+          scales: { y: { position: 'left' }, y1: { position: 'right', grid: { drawOnChartArea: false } } }
+        }
+      });
+    }
+
+    function pintarTabla(datos) {
+      const k = datos.kpis, n = datos.informes.nombres.length;
+      const columnas = ['Informe', 'Fecha'];
+      k.etiquetas.forEach(etiqueta => columnas.push(etiqueta, 'Δ', 'Ratio'));
+      const cabecera = document.createElement('tr');
+      columnas.forEach(nombre => {
+        const th = document.createElement('th');
+        th.textContent = nombre;
+        cabecera.appendChild(th);
+      });
+      document.getElementById('cabecera-kpis').appendChild(cabecera);
+
+      // Una fila por informe: la tabla paginada recibe los índices
+      const indices = Array.from({ length: n }, (_, i) => i);
+      tablaPaginada(document.getElementById('filas-kpis'), indices, i => {
+        const celdas = [datos.informes.nombres[i] + (i === datos.referencia ? ' 📌' : ''), datos.informes.fechas[i]];
+        k.claves.forEach((_, j) => celdas.push(
+          formato(k.valores[i][j], k.decimales[j]), conSigno(k.delta[i][j], k.decimales[j]), formato(k.ratio[i][j], 2)
+        ));
+        return celdas;
+      }, 'informes');
+    }
+
+    // Un gráfico pequeño por informe, con la misma escala en todos; cada
+    // uno se construye al entrar en pantalla
+    function pintarMultiples(datos) {
+      const contenedor = document.getElementById('multiples');
+      const maximo = Math.max(1, ...datos.edad.proporcion.flat().filter(v => v !== null));
+      const pendientes = new IntersectionObserver((entries) => {
+        entries.forEach(entry => {
+          if (!entry.isIntersecting) return;
+          pendientes.unobserve(entry.target);
+          const i = Number(entry.target.dataset.informe);
+          new Chart(entry.target, {
+            type: 'bar',
+            data: {
+              labels: datos.edad.etiquetas,
+              datasets: [{ data: datos.edad.proporcion[i], backgroundColor: 'rgba(46, 134, 171, 0.8)' }]
+            },
+            options: {
+              responsive: true,
+              maintainAspectRatio: false,
+              animation: false,
+              plugins: { legend: { display: false }, datalabels: { display: false } },
+              scales: { y: { max: Math.ceil(maximo), ticks: { callback: v => v + '%' } } }
+            }
+          });
+        });
+      }, { rootMargin: '200px' });
+
+      const fragmento = document.createDocumentFragment();
+      datos.informes.nombres.forEach((nombre, i) => {
+        const tarjeta = document.createElement('div');
+        tarjeta.className = 'card';
+        tarjeta.innerHTML = '<div class="card-title" style="font-size: 0.95rem;"></div>' +
+          '<div class="chart-container chart-small" style="height: 160px;"><canvas></canvas></div>';
+        tarjeta.querySelector('.card-title').textContent = `${nombre} · ${datos.informes.fechas[i]}`;
+        const lienzo = tarjeta.querySelector('canvas');
+        lienzo.dataset.informe = i;
+        pendientes.observe(lienzo);
+        fragmento.appendChild(tarjeta);
+      });
+      contenedor.appendChild(fragmento);
+    }
+
+    const cargarDatos = typeof DATOS_COMPARACION !== 'undefined'
+      ? Promise.resolve(DATOS_COMPARACION)
+      : fetch(URL_DATOS).then(respuesta => {
+          if (!respuesta.ok) throw new Error(`HTTP ${respuesta.status}`);
+          return respuesta.json();
+        });
+
+    cargarDatos
+      .then(datos => {
+        pintarTendencias(datos);
+        pintarEvolucion(datos);
+        pintarTabla(datos);
+        pintarMultiples(datos);
+      })
+      .catch(error => {
+        console.error('No se pudieron cargar los datos de la comparación', error);
+        document.querySelector('#filas-kpis td').textContent =
+          `⚠️ No se pudieron cargar los datos (${URL_DATOS}). Abre la comparación desde un servidor HTTP.`;
+      });
+"""
+
+FINAL_COMPARACION = """
+</body>
+</html>
+"""
+
+
+def plantilla_comparacion(paquete=None):
+    """
+    Plantilla compilada de la página de comparación.
+
+    Con paquete reutiliza sus activos (el mismo JS/CSS con hash que los
+    dashboards); sin él, CDN y estilos en línea como el dashboard.
+    """
+    datos = "{{datos}}"
+    codigo = "  <script>\n{{__codigo__}}  </script>\n"
+    if paquete is None:
+        cabeza = LIBRERIAS_CDN + "  <style>\n{{__css__}}  </style>\n"
+        scripts = "  <script>\n{{__config__}}  </script>\n" + datos + codigo
+        plantilla = compilar_plantilla(INICIO_COMPARACION + cabeza + CUERPO_COMPARACION + scripts + FINAL_COMPARACION)
+        plantilla = fijar_hueco(fijar_hueco(plantilla, "__css__", ESTILOS + ESTILOS_PAGINACION), "__config__",
+                                CONFIGURACION_GRAFICOS + TABLA_PAGINADA)
+    elif paquete.modo == "inline":
+        cabeza = "  <style>{{__css__}}</style>\n"
+        scripts = "  <script>{{__js__}}</script>\n" + datos + codigo
+        plantilla = compilar_plantilla(INICIO_COMPARACION + cabeza + CUERPO_COMPARACION + scripts + FINAL_COMPARACION)
+        plantilla = fijar_hueco(fijar_hueco(plantilla, "__css__", paquete.css), "__js__", paquete.js)
+    else:
+        cabeza = f'  <link rel="stylesheet" href="{DIRECTORIO_ACTIVOS}/{paquete.nombre_css}" />\n'
+        scripts = f'  <script src="{DIRECTORIO_ACTIVOS}/{paquete.nombre_js}"></script>\n' + datos + codigo
+        plantilla = compilar_plantilla(INICIO_COMPARACION + cabeza + CUERPO_COMPARACION + scripts + FINAL_COMPARACION)
+    return fijar_hueco(plantilla, "__codigo__", CODIGO_COMPARACION)
+
+
+def guardar_comparacion(entradas, ruta: str = 'comparacion.html', paquete=None, perezoso: bool = True,
+                        comprimir: bool = False, referencia: int = 0) -> Dict[str, Any]:
+    """
+    Genera la página de comparación de varios informes.
+
+    Args:
+        entradas: Informes JSON o carpetas con informes
+        ruta: HTML de salida
+        paquete: (Opcional) PaqueteDashboard; los activos se comparten con los dashboards
+        perezoso: Si True los datos van en el sidecar <ruta>.datos.json (el
+            HTML no crece con el número de informes); si False, en línea
+        comprimir: Si True escribe también las variantes .gz/.br
+        referencia: Índice (por fecha) del informe de referencia
+
+    Returns:
+        Datos de la comparación
+    """
+    informes = cargar_informes(entradas)
+    if not informes:
+        raise ValueError("No hay informes que comparar")
+    datos = datos_comparacion(informes, referencia)
+    contenido = json.dumps(datos, ensure_ascii=False, separators=(",", ":"))
+
+    ruta = Path(ruta)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    if paquete is not None:
+        paquete.escribir_activos(ruta.parent, comprimir)
+    if perezoso:
+        ruta_sidecar(ruta).write_text(contenido, encoding="utf-8")
+        if comprimir:
+            escribir_comprimidos(ruta_sidecar(ruta))
+        en_linea = ""
+    else:
+        seguro = contenido.replace("</", "<\\/")
+        en_linea = f"  <script>\n    const DATOS_COMPARACION = {seguro};\n  </script>\n"
+
+    pagina = ensamblar({
+        'num_informes': str(len(informes)),
+        'referencia': html.escape(datos['informes']['nombres'][referencia]),
+        'datos': en_linea
+    }, plantilla_comparacion(paquete))
+    ruta.write_text(pagina, encoding="utf-8")
+    if comprimir:
+        escribir_comprimidos(ruta)
+
+    print(f"✅ Comparación de {len(informes)} informes en {ruta} "
+          f"({len(pagina.encode('utf-8')) / 1e3:.1f} kB de HTML, {len(contenido.encode('utf-8')) / 1e3:.1f} kB de datos)")
+    return datos
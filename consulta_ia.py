@@ -0,0 +1,346 @@
+import json
+import queue
+import time
+import threading
+import numpy as np
+from pathlib import Path
+from typing import Callable, Dict, Any, List
+from esquema_insights import respuesta_aprovechable
+from telemetria_ia import TelemetriaIA, PresupuestoExcedido, estimar_tokens
+
+
+MENSAJE_SISTEMA = (
+    "Eres un experto en análisis de datos de salud mental. "
+    "Respondes SOLO con JSON válido, sin texto adicional."
+)
+
+# Límites superiores (segundos) de los buckets del histograma de latencias
+LIMITES_LATENCIA = [0.5, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89]
+
+# API key por defecto de las llamadas (la de cada modelo en su config tiene prioridad)
+_API_KEY = {'valor': None}
+
+
+def fijar_api_key(api_key: str):
+    """Fija la API key de OpenAI que usan las llamadas sin 'api_key' propia."""
+    _API_KEY['valor'] = api_key
+
+
+def validar_respuesta(texto: str) -> bool:
+    """True si la respuesta (reparada localmente) cumple el esquema de insights completo."""
+    return respuesta_aprovechable(texto, max_campos_invalidos=0)
+
+
+def llamar_modelo(config: Dict[str, Any], prompt: str, plazo: float = None,
+                  telemetria: TelemetriaIA = None, etapa: str = 'insights', reintento: int = 0) -> str:
+    """
+    Una llamada a OpenAI con la configuración de un modelo.
+
+    Args:
+        config: {'modelo', 'api_key', 'api_base', 'temperature', 'max_tokens'}
+        prompt: Prompt del usuario
+        plazo: (Opcional) Timeout de la petición en segundos
+        telemetria: (Opcional) TelemetriaIA que comprueba el presupuesto y registra la llamada
+        etapa: Etapa del pipeline que hace la llamada (para la telemetría)
+        reintento: 0 para la primera llamada, >0 para coberturas y campos pendientes
+    """
+    max_tokens = config.get('max_tokens', 2000)
+    if telemetria is not None:
+        telemetria.comprobar(estimar_tokens(MENSAJE_SISTEMA + prompt) + max_tokens)
+
+    # openai solo se importa al consultar: el resto del pipeline funciona sin él
+    try:
+        import openai  # pip install openai
+    except ImportError as e:
+        raise ImportError("La consulta a la IA necesita openai (pip install openai)") from e
+
+    extra = {clave: config[clave] for clave in ('api_key', 'api_base') if config.get(clave)}
+    if 'api_key' not in extra and _API_KEY['valor']:
+        extra['api_key'] = _API_KEY['valor']
+    if plazo is not None:
+        extra['request_timeout'] = plazo
+    inicio = time.perf_counter()
+    try:
+        response = openai.ChatCompletion.create(
+            model=config['modelo'],
+            messages=[
+                {"role": "system", "content": MENSAJE_SISTEMA},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=config.get('temperature', 0.3),
+            max_tokens=max_tokens,
+            **extra
+        )
+    except Exception as e:
+        if telemetria is not None:
+            telemetria.registrar_llamada(config['modelo'], etapa, time.perf_counter() - inicio,
+                                         reintento=reintento, error=str(e))
+        raise
+
+    if telemetria is not None:
+        uso = response.get('usage') or {}
+        telemetria.registrar_llamada(
+            config['modelo'], etapa, time.perf_counter() - inicio,
+            uso.get('prompt_tokens', 0), uso.get('completion_tokens', 0), reintento
+        )
+    return response['choices'][0]['message']['content']
+
+
+class HistogramaLatencias:
+    """Histograma acumulado de latencias de un modelo (buckets fijos)."""
+
+    def __init__(self, limites: List[float] = None, conteos: List[int] = None,
+                 suma: float = 0.0, errores: int = 0):
+        self.limites = list(limites or LIMITES_LATENCIA)
+        # Un bucket más para las latencias por encima del último límite
+        self.conteos = list(conteos or [0] * (len(self.limites) + 1))
+        self.suma = suma
+        self.errores = errores
+
+    @property
+    def total(self) -> int:
+        return int(sum(self.conteos))
+
+    def registrar(self, segundos: float):
+        self.conteos[int(np.searchsorted(self.limites, segundos))] += 1
+        self.suma += segundos
+
+    def percentil(self, p: float) -> float:
+        """Percentil aproximado (límite superior del bucket que lo contiene)."""
+        if self.total == 0:
+            return float('nan')
+        acumulado = np.cumsum(self.conteos)
+        bucket = int(np.searchsorted(acumulado, p * self.total))
+        return float(self.limites[bucket]) if bucket < len(self.limites) else float('inf')
+
+    def a_dict(self) -> Dict[str, Any]:
+        return {
+            'limites': self.limites,
+            'conteos': self.conteos,
+            'suma': self.suma,
+            'errores': self.errores,
+            'total': self.total,
+            'media': self.suma / self.total if self.total else None,
+            'p50': self.percentil(0.5) if self.total else None,
+            'p90': self.percentil(0.9) if self.total else None,
+            'p99': self.percentil(0.99) if self.total else None
+        }
+
+    @classmethod
+    def desde_dict(cls, datos: Dict[str, Any]) -> 'HistogramaLatencias':
+        return cls(datos['limites'], datos['conteos'], datos['suma'], datos.get('errores', 0))
+
+
+class ConsultorIA:
+    """
+    Consulta a varios modelos con cobertura (hedging) y plazo máximo.
+
+    Se lanza el modelo principal; si pasado el retardo de cobertura no hay
+    una respuesta válida se lanza el siguiente modelo (o endpoint), y así
+    sucesivamente. Gana la primera respuesta que pasa la validación
+    estricta; si ninguna la pasa se usa la primera aprovechable (a la que
+    luego se le piden aparte los campos inválidos). Si no hay ninguna antes
+    del plazo máximo se devuelve None y el llamador usa los insights de
+    plantilla.
+
+    Cada llamada corre en un hilo daemon: al vencer el plazo las
+    perdedoras se abandonan y no retrasan la salida del proceso.
+
+    Las latencias de cada modelo se acumulan en histogramas (persistidos
+    en disco si se indica ruta) para ajustar el retardo de cobertura.
+    """
+
+    def __init__(self, modelos: List[Dict[str, Any]], retardo_cobertura: float = 10.0,
+                 plazo_maximo: float = 60.0, validar: Callable[[str], bool] = validar_respuesta,
+                 ruta_latencias: str = None, telemetria: TelemetriaIA = None,
+                 aprovechable: Callable[[str], bool] = respuesta_aprovechable):
+        """
+        Inicializa el consultor.
+
+        Args:
+            modelos: Modelos por orden de preferencia, p.ej.
+                [{'modelo': 'gpt-4o'}, {'modelo': 'gpt-4o-mini', 'api_base': '...', 'api_key': '...'}]
+            retardo_cobertura: Segundos de espera antes de lanzar el siguiente modelo
+            plazo_maximo: Segundos tras los que se abandona y se usa la plantilla
+            validar: Función que decide si una respuesta gana la cobertura
+            ruta_latencias: (Opcional) JSON donde se acumulan los histogramas
+            telemetria: (Opcional) TelemetriaIA para tokens, latencias y presupuesto
+            aprovechable: Función que decide si una respuesta no válida sirve de respaldo
+        """
+        self.modelos = modelos
+        self.retardo_cobertura = retardo_cobertura
+        self.plazo_maximo = plazo_maximo
+        self.validar = validar
+        self.aprovechable = aprovechable
+        self.ruta_latencias = Path(ruta_latencias) if ruta_latencias else None
+        self.telemetria = telemetria
+        self.histogramas = {}
+        self._bloqueo = threading.Lock()
+
+        if self.ruta_latencias is not None and self.ruta_latencias.exists():
+            with open(self.ruta_latencias, 'r', encoding='utf-8') as f:
+                self.histogramas = {
+                    modelo: HistogramaLatencias.desde_dict(datos)
+                    for modelo, datos in json.load(f).items()
+                }
+
+    # ------------------------------------------------------------------
+    # Llamadas
+    # ------------------------------------------------------------------
+
+    def _clave(self, config: Dict[str, Any]) -> str:
+        """Nombre del modelo en los histogramas (con endpoint si no es el de por defecto)."""
+        if config.get('api_base'):
+            return f"{config['modelo']}@{config['api_base']}"
+        return config['modelo']
+
+    def _llamar(self, config: Dict[str, Any], prompt: str, reintento: int = 0) -> str:
+        """Llamada a un modelo; registra su latencia al terminar (aunque ya no se use)."""
+        inicio = time.perf_counter()
+        try:
+            respuesta = llamar_modelo(config, prompt, self.plazo_maximo, self.telemetria,
+                                      reintento=reintento)
+        except PresupuestoExcedido:
+            raise  # No llegó a llamarse: no cuenta como error del modelo
+        except Exception:
+            self._registrar(config, None)
+            raise
+        self._registrar(config, time.perf_counter() - inicio)
+        return respuesta
+
+    def _registrar(self, config: Dict[str, Any], segundos: float = None):
+        with self._bloqueo:
+            histograma = self.histogramas.setdefault(self._clave(config), HistogramaLatencias())
+            if segundos is None:
+                histograma.errores += 1
+            else:
+                histograma.registrar(segundos)
+
+    def _lanzar(self, config: Dict[str, Any], prompt: str, reintento: int, resultados: queue.Queue):
+        """
+        Llamada en un hilo daemon; el resultado (o el error) llega por la cola.
+
+        PresupuestoExcedido viaja tal cual: consultar deja de cubrir con más
+        modelos (también se quedarían sin presupuesto) y lo relanza.
+        """
+        def tarea():
+            try:
+                resultados.put((config, self._llamar(config, prompt, reintento), None))
+            except Exception as e:
+                resultados.put((config, None, e))
+
+        threading.Thread(target=tarea, name=f'consulta-ia-{reintento}', daemon=True).start()
+
+    def consultar(self, prompt: str):
+        """
+        Consulta con cobertura.
+
+        Returns:
+            (respuesta, modelo) de la primera respuesta válida (o, si no hay
+            ninguna, de la primera aprovechable), o (None, None) si no llega
+            ninguna antes del plazo máximo
+
+        Raises:
+            PresupuestoExcedido: Si se agotó el presupuesto y no llegó ninguna respuesta
+        """
+        inicio = time.monotonic()
+        resultados = queue.Queue()
+        pendientes = 0
+        siguiente = 0
+        adelantar = False  # Un fallo lanza el siguiente modelo sin esperar al retardo
+        respaldo = None  # Primera respuesta aprovechable pero no válida
+        sin_presupuesto = None  # PresupuestoExcedido de algún modelo: no se lanzan más
+
+        try:
+            while True:
+                transcurrido = time.monotonic() - inicio
+                if transcurrido >= self.plazo_maximo:
+                    if respaldo is not None:
+                        print(f"⏰ Plazo agotado: se usa la respuesta parcial de {self._clave(respaldo[1])}")
+                        return respaldo[0], respaldo[1]['modelo']
+                    if sin_presupuesto is not None:
+                        raise sin_presupuesto
+                    print(f"⏰ Plazo de {self.plazo_maximo:.0f} s agotado sin respuesta válida")
+                    return None, None
+
+                # Lanzar el siguiente modelo al cumplirse su retardo (o tras un fallo)
+                if siguiente < len(self.modelos) and (
+                        not pendientes or adelantar or transcurrido >= siguiente * self.retardo_cobertura):
+                    adelantar = False
+                    config = self.modelos[siguiente]
+                    if siguiente > 0:
+                        print(f"🪂 Cobertura: lanzando {self._clave(config)} tras {transcurrido:.1f} s")
+                    self._lanzar(config, prompt, siguiente, resultados)
+                    pendientes += 1
+                    siguiente += 1
+                    continue
+
+                if not pendientes:
+                    if respaldo is not None:
+                        print(f"🩹 Ninguna respuesta completa: se usa la parcial de {self._clave(respaldo[1])}")
+                        return respaldo[0], respaldo[1]['modelo']
+                    if sin_presupuesto is not None:
+                        raise sin_presupuesto
+                    print("❌ Todos los modelos fallaron")
+                    return None, None
+
+                # Esperar hasta la próxima respuesta, el próximo lanzamiento o el plazo
+                limite = self.plazo_maximo
+                if siguiente < len(self.modelos) and not adelantar:
+                    limite = min(limite, siguiente * self.retardo_cobertura)
+                try:
+                    config, respuesta, error = resultados.get(timeout=max(limite - transcurrido, 0.001))
+                except queue.Empty:
+                    continue
+                pendientes -= 1
+                if isinstance(error, PresupuestoExcedido):
+                    print(f"💸 {self._clave(config)}: {error}; sin más cobertura")
+                    sin_presupuesto = error
+                    siguiente = len(self.modelos)
+                    continue
+                if error is not None:
+                    print(f"⚠️ {self._clave(config)} falló: {error}")
+                    adelantar = True
+                    continue
+                if self.validar(respuesta):
+                    print(f"✅ Respuesta válida de {self._clave(config)} en {time.monotonic() - inicio:.1f} s")
+                    return respuesta, config['modelo']
+                if respaldo is None and self.aprovechable(respuesta):
+                    respaldo = (respuesta, config)
+                    print(f"⚠️ Respuesta de {self._clave(config)} incompleta: se guarda como respaldo")
+                else:
+                    print(f"⚠️ Respuesta de {self._clave(config)} no supera la validación")
+                adelantar = True
+        finally:
+            # Las llamadas perdedoras siguen en sus hilos daemon (solo registran su latencia)
+            self.guardar_latencias()
+
+    # ------------------------------------------------------------------
+    # Latencias
+    # ------------------------------------------------------------------
+
+    def latencias(self) -> Dict[str, Dict[str, Any]]:
+        """Histogramas por modelo con media y percentiles aproximados."""
+        with self._bloqueo:
+            return {modelo: histograma.a_dict() for modelo, histograma in self.histogramas.items()}
+
+    def retardo_sugerido(self, percentil: float = 0.95) -> float:
+        """Retardo de cobertura según el percentil de latencia del modelo principal."""
+        histograma = self.histogramas.get(self._clave(self.modelos[0]))
+        if histograma is None or histograma.total == 0:
+            return self.retardo_cobertura
+        return histograma.percentil(percentil)
+
+    def guardar_latencias(self):
+        """Persiste los histogramas (si hay ruta) para acumular entre ejecuciones."""
+        if self.ruta_latencias is None:
+            return
+        datos = {
+            modelo: {clave: valor for clave, valor in histograma.items()
+                     if clave in ('limites', 'conteos', 'suma', 'errores')}
+            for modelo, histograma in self.latencias().items()
+        }
+        temporal = self.ruta_latencias.with_suffix('.tmp')
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(datos, f, indent=2)
+        temporal.replace(self.ruta_latencias)
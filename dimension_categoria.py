@@ -0,0 +1,153 @@
+from typing import Dict, List
+
+# oracledb solo hace falta con el backend de Oracle
+# pip install oracledb
+try:
+    import oracledb
+except ImportError:
+    oracledb = None
+
+
+# ============================================================================
+# DDL DE LA DIMENSIÓN DE CATEGORÍAS
+# ============================================================================
+
+DDL_DIMENSION = """
+CREATE TABLE DIM_CATEGORIA (
+    CATEGORIA_COD NUMBER(5) PRIMARY KEY,
+    "Categoría"   VARCHAR2(4000) NOT NULL UNIQUE
+)
+"""
+
+DDL_COLUMNA_CODIGO = """
+ALTER TABLE {tabla} ADD (CATEGORIA_COD NUMBER(5))
+"""
+
+# Índice que cubre el filtro de la cohorte (código + edad + sexo)
+DDL_INDICE = """
+CREATE INDEX IX_{tabla}_CAT_EDAD ON {tabla} (CATEGORIA_COD, EDAD, SEXO)
+"""
+
+# Codifica al vuelo las filas nuevas de categorías ya conocidas; las
+# categorías nuevas quedan a NULL hasta el siguiente backfill
+DDL_TRIGGER = """
+CREATE OR REPLACE TRIGGER TRG_{tabla}_CAT_COD
+BEFORE INSERT OR UPDATE OF "Categoría" ON {tabla}
+FOR EACH ROW
+BEGIN
+    SELECT MAX(CATEGORIA_COD) INTO :NEW.CATEGORIA_COD
+    FROM DIM_CATEGORIA
+    WHERE "Categoría" = :NEW."Categoría";
+END;
+"""
+
+# Alta de categorías nuevas con códigos consecutivos a partir del máximo
+SQL_ALTA_CATEGORIAS = """
+INSERT INTO DIM_CATEGORIA (CATEGORIA_COD, "Categoría")
+SELECT (SELECT NVL(MAX(CATEGORIA_COD), 0) FROM DIM_CATEGORIA)
+       + ROW_NUMBER() OVER (ORDER BY categoria),
+       categoria
+FROM (
+    SELECT DISTINCT "Categoría" AS categoria
+    FROM {tabla} s
+    WHERE "Categoría" IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM DIM_CATEGORIA d WHERE d."Categoría" = s."Categoría")
+)
+"""
+
+# Backfill por lotes para no generar una única transacción enorme
+SQL_BACKFILL = """
+UPDATE {tabla} s
+SET CATEGORIA_COD = (
+    SELECT d.CATEGORIA_COD FROM DIM_CATEGORIA d WHERE d."Categoría" = s."Categoría"
+)
+WHERE CATEGORIA_COD IS NULL
+  AND "Categoría" IS NOT NULL
+  AND ROWNUM <= :lote
+"""
+
+# ORA-00955: el nombre ya existe / ORA-01430: la columna ya existe /
+# ORA-01408: ya hay un índice sobre esas columnas /
+# ORA-12000: el log de vista materializada ya existe / ORA-12006: la vista materializada ya existe
+ERRORES_YA_EXISTE = {955, 1430, 1408, 12000, 12006}
+
+
+def ejecutar_ddl(cursor, ddl: str, descripcion: str):
+    """Ejecuta una sentencia DDL ignorando el error si el objeto ya existe."""
+    try:
+        cursor.execute(ddl)
+        print(f"✅ {descripcion}")
+    except oracledb.DatabaseError as e:
+        error, = e.args
+        if error.code in ERRORES_YA_EXISTE:
+            print(f"⏭️ {descripcion} (ya existía)")
+        else:
+            raise
+
+
+def preparar_dimension_categoria(conexion, tabla: str = "SALUDMENTAL",
+                                 tamano_lote: int = 50000, crear_trigger: bool = True):
+    """
+    Crea la dimensión de categorías, añade el código a la tabla y lo rellena.
+
+    Es idempotente: se puede relanzar después de cada carga de datos para
+    dar de alta categorías nuevas y codificar las filas que falten.
+
+    Args:
+        conexion: Conexión de Oracle
+        tabla: Tabla de hechos (default: SALUDMENTAL)
+        tamano_lote: Filas actualizadas por commit en el backfill
+        crear_trigger: Si True codifica también las filas que se inserten después
+    """
+    print(f"🏗️ Preparando dimensión de categorías para {tabla}...")
+    cursor = conexion.cursor()
+    try:
+        ejecutar_ddl(cursor, DDL_DIMENSION, "Tabla DIM_CATEGORIA")
+        ejecutar_ddl(cursor, DDL_COLUMNA_CODIGO.format(tabla=tabla), f"Columna {tabla}.CATEGORIA_COD")
+
+        cursor.execute(SQL_ALTA_CATEGORIAS.format(tabla=tabla))
+        print(f"   Categorías nuevas: {cursor.rowcount}")
+        conexion.commit()
+
+        total = 0
+        while True:
+            cursor.execute(SQL_BACKFILL.format(tabla=tabla), lote=tamano_lote)
+            actualizadas = cursor.rowcount
+            conexion.commit()
+            total += actualizadas
+            if actualizadas < tamano_lote:
+                break
+            print(f"   Backfill: {total} filas codificadas...")
+        print(f"✅ Backfill completado: {total} filas codificadas")
+
+        ejecutar_ddl(cursor, DDL_INDICE.format(tabla=tabla), f"Índice IX_{tabla}_CAT_EDAD")
+        if crear_trigger:
+            cursor.execute(DDL_TRIGGER.format(tabla=tabla))
+            print(f"✅ Trigger TRG_{tabla}_CAT_COD")
+        cursor.callproc('DBMS_STATS.GATHER_TABLE_STATS', [None, tabla])
+        print("✅ Estadísticas del optimizador actualizadas")
+    finally:
+        cursor.close()
+
+
+def codigos_categoria(conexion, patron: str) -> List[int]:
+    """Códigos de las categorías cuyo texto cumple el patrón LIKE (consulta a la dimensión)."""
+    cursor = conexion.cursor()
+    try:
+        cursor.execute(
+            'SELECT CATEGORIA_COD FROM DIM_CATEGORIA WHERE "Categoría" LIKE :patron ORDER BY 1',
+            patron=patron
+        )
+        return [int(codigo) for codigo, in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def mapa_categorias(conexion) -> Dict[int, str]:
+    """Diccionario código -> texto de la categoría."""
+    cursor = conexion.cursor()
+    try:
+        cursor.execute('SELECT CATEGORIA_COD, "Categoría" FROM DIM_CATEGORIA')
+        return {int(codigo): texto for codigo, texto in cursor.fetchall()}
+    finally:
+        cursor.close()
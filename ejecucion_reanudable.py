@@ -0,0 +1,118 @@
+import json
+import hashlib
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Any, Dict
+
+
+def hash_contenido(datos: bytes) -> str:
+    """Hash SHA-256 del contenido de un artefacto."""
+    return hashlib.sha256(datos).hexdigest()
+
+
+class EjecucionReanudable:
+    """
+    Ejecuta un pipeline por etapas guardando cada artefacto en disco.
+
+    Cada etapa se registra en un manifiesto con el hash de su entrada y el
+    hash de su artefacto. Al relanzar con el mismo directorio, las etapas
+    cuya entrada no ha cambiado y cuyo artefacto sigue intacto se leen del
+    disco en lugar de recalcularse, así que un fallo solo obliga a repetir
+    la etapa que falló (y las que dependen de ella).
+
+    Sin directorio las etapas se ejecutan sin guardar nada.
+    """
+
+    def __init__(self, directorio: str = None):
+        """
+        Inicializa la ejecución.
+
+        Args:
+            directorio: (Opcional) Carpeta de la ejecución con los artefactos y el manifiesto
+        """
+        self.directorio = Path(directorio) if directorio else None
+        self.manifiesto = {'etapas': {}}
+
+        if self.directorio is not None:
+            self.directorio.mkdir(parents=True, exist_ok=True)
+            ruta = self.directorio / 'manifiesto.json'
+            if ruta.exists():
+                with open(ruta, 'r', encoding='utf-8') as f:
+                    self.manifiesto = json.load(f)
+                print(f"♻️ Reanudando ejecución en: {self.directorio}")
+
+    def _guardar_manifiesto(self):
+        ruta = self.directorio / 'manifiesto.json'
+        temporal = ruta.with_suffix('.tmp')
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(self.manifiesto, f, indent=2, ensure_ascii=False)
+        temporal.replace(ruta)
+
+    def _artefacto_valido(self, nombre: str, hash_entrada: str):
+        """Devuelve el contenido del artefacto si se puede reutilizar."""
+        registro = self.manifiesto['etapas'].get(nombre)
+        if registro is None or registro['hash_entrada'] != hash_entrada:
+            return None
+
+        ruta = self.directorio / registro['archivo']
+        if not ruta.exists():
+            return None
+
+        datos = ruta.read_bytes()
+        if hash_contenido(datos) != registro['hash']:
+            print(f"⚠️ Artefacto '{nombre}' modificado o corrupto, se recalcula")
+            return None
+        return datos
+
+    def etapa(self, nombre: str, hash_entrada: str, calcular: Callable[[], Any],
+              serializar: Callable[[Any], bytes], deserializar: Callable[[bytes], Any],
+              extension: str = 'json'):
+        """
+        Ejecuta (o reanuda) una etapa del pipeline.
+
+        Args:
+            nombre: Nombre de la etapa
+            hash_entrada: Hash de todo lo que determina el resultado de la etapa
+            calcular: Función que produce el resultado
+            serializar: Convierte el resultado a bytes
+            deserializar: Reconstruye el resultado desde bytes (y restaura el estado)
+            extension: Extensión del archivo del artefacto
+
+        Returns:
+            (resultado, hash del artefacto); sin directorio el hash es None
+        """
+        if self.directorio is None:
+            return calcular(), None
+
+        datos = self._artefacto_valido(nombre, hash_entrada)
+        if datos is not None:
+            print(f"⏭️ Etapa '{nombre}' reutilizada desde checkpoint")
+            return deserializar(datos), self.manifiesto['etapas'][nombre]['hash']
+
+        resultado = calcular()
+        datos = serializar(resultado)
+        archivo = f"{nombre}.{extension}"
+        (self.directorio / archivo).write_bytes(datos)
+
+        self.manifiesto['etapas'][nombre] = {
+            'archivo': archivo,
+            'hash': hash_contenido(datos),
+            'hash_entrada': hash_entrada,
+            'fecha': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+        self._guardar_manifiesto()
+        return resultado, self.manifiesto['etapas'][nombre]['hash']
+
+    def invalidar(self, nombre: str):
+        """Olvida una etapa para que se recalcule en la próxima ejecución."""
+        if self.directorio is None or nombre not in self.manifiesto['etapas']:
+            return
+        del self.manifiesto['etapas'][nombre]
+        self._guardar_manifiesto()
+
+
+def hash_parametros(parametros: Dict[str, Any]) -> str:
+    """Hash estable de un diccionario de parámetros."""
+    return hash_contenido(
+        json.dumps(parametros, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')
+    )
@@ -0,0 +1,356 @@
+import json
+import re
+from typing import Callable, Dict, Any, List, Tuple
+
+
+# ============================================================================
+# ESQUEMA DE LOS INSIGHTS (JSON Schema)
+# ============================================================================
+
+_LISTA_TEXTOS = {'type': 'array', 'items': {'type': 'string'}, 'minItems': 1}
+
+ESQUEMA_INSIGHTS = {
+    'type': 'object',
+    'required': [
+        'patrones_demograficos',
+        'factores_asociados',
+        'analisis_comparativo',
+        'proyeccion_6_meses',
+        'recomendaciones',
+        'grupos_prioritarios'
+    ],
+    'properties': {
+        'patrones_demograficos': _LISTA_TEXTOS,
+        'factores_asociados': _LISTA_TEXTOS,
+        'analisis_comparativo': {
+            'type': 'object',
+            'required': ['por_edad', 'por_sexo'],
+            'properties': {
+                'por_edad': {'type': 'string'},
+                'por_sexo': {'type': 'string'}
+            }
+        },
+        'proyeccion_6_meses': {
+            'type': 'object',
+            'required': ['nuevos_casos_estimados', 'tasa_crecimiento', 'confianza', 'justificacion'],
+            'properties': {
+                'nuevos_casos_estimados': {'type': 'integer', 'minimum': 0},
+                'tasa_crecimiento': {'type': 'number'},
+                'confianza': {'type': 'string', 'enum': ['alta', 'media', 'baja']},
+                'justificacion': {'type': 'string'}
+            }
+        },
+        'recomendaciones': _LISTA_TEXTOS,
+        'grupos_prioritarios': _LISTA_TEXTOS,
+        'insights_adicionales': {'type': 'array', 'items': {'type': 'string'}}
+    }
+}
+
+
+# Campos que se pueden pedir aparte antes de descartar una respuesta entera
+MAX_CAMPOS_A_COMPLETAR = 2
+
+
+# ============================================================================
+# COMPILACIÓN DEL ESQUEMA
+# ============================================================================
+#
+# Se traduce el esquema una sola vez a una función por nodo, de modo que
+# validar no vuelve a interpretar el diccionario. Se cubre el subconjunto
+# de JSON Schema que usa ESQUEMA_INSIGHTS.
+
+_TIPOS = {
+    'object': lambda v: isinstance(v, dict),
+    'array': lambda v: isinstance(v, list),
+    'string': lambda v: isinstance(v, str),
+    'integer': lambda v: isinstance(v, int) and not isinstance(v, bool),
+    'number': lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    'boolean': lambda v: isinstance(v, bool)
+}
+
+
+def compilar_esquema(esquema: Dict[str, Any]) -> Callable[[Any, str], List[Tuple[str, str]]]:
+    """
+    Compila un esquema a una función validar(valor, ruta) -> [(ruta, error)].
+    """
+    comprobaciones = []
+
+    if 'type' in esquema:
+        es_tipo = _TIPOS[esquema['type']]
+        nombre_tipo = esquema['type']
+        comprobaciones.append(
+            lambda v, ruta: [] if es_tipo(v) else [(ruta, f"se esperaba {nombre_tipo}")]
+        )
+
+    if 'enum' in esquema:
+        opciones = list(esquema['enum'])
+        comprobaciones.append(
+            lambda v, ruta: [] if v in opciones else [(ruta, f"valor fuera de {opciones}")]
+        )
+
+    if 'minimum' in esquema:
+        minimo = esquema['minimum']
+        comprobaciones.append(
+            lambda v, ruta: [] if not _TIPOS['number'](v) or v >= minimo else [(ruta, f"menor que {minimo}")]
+        )
+
+    if 'minItems' in esquema:
+        minimo_items = esquema['minItems']
+        comprobaciones.append(
+            lambda v, ruta: [] if not isinstance(v, list) or len(v) >= minimo_items
+            else [(ruta, f"menos de {minimo_items} elementos")]
+        )
+
+    if 'required' in esquema:
+        requeridos = list(esquema['required'])
+        comprobaciones.append(
+            lambda v, ruta: [] if not isinstance(v, dict)
+            else [(f"{ruta}.{campo}" if ruta else campo, "falta") for campo in requeridos if campo not in v]
+        )
+
+    if 'properties' in esquema:
+        propiedades = {
+            campo: compilar_esquema(subesquema) for campo, subesquema in esquema['properties'].items()
+        }
+
+        def validar_propiedades(v, ruta):
+            if not isinstance(v, dict):
+                return []
+            errores = []
+            for campo, validar in propiedades.items():
+                if campo in v:
+                    errores += validar(v[campo], f"{ruta}.{campo}" if ruta else campo)
+            return errores
+        comprobaciones.append(validar_propiedades)
+
+    if 'items' in esquema:
+        validar_item = compilar_esquema(esquema['items'])
+        comprobaciones.append(
+            lambda v, ruta: [] if not isinstance(v, list)
+            else [error for i, item in enumerate(v) for error in validar_item(item, f"{ruta}[{i}]")]
+        )
+
+    def validar(valor, ruta: str = '') -> List[Tuple[str, str]]:
+        errores = []
+        for comprobar in comprobaciones:
+            errores += comprobar(valor, ruta)
+            # Con el tipo equivocado el resto de comprobaciones no aporta nada
+            if errores and comprobar is comprobaciones[0] and 'type' in esquema:
+                break
+        return errores
+
+    return validar
+
+
+validar_insights = compilar_esquema(ESQUEMA_INSIGHTS)
+
+
+# ============================================================================
+# REPARACIÓN LOCAL
+# ============================================================================
+
+def _cerrar_truncado(texto: str) -> str:
+    """Cierra cadenas, arrays y objetos abiertos de un JSON cortado."""
+    pila = []
+    en_cadena = False
+    escape = False
+    ultimo_seguro = 0  # Posición tras el último valor completo
+
+    for i, caracter in enumerate(texto):
+        if en_cadena:
+            if escape:
+                escape = False
+            elif caracter == '\\':
+                escape = True
+            elif caracter == '"':
+                en_cadena = False
+                ultimo_seguro = i + 1
+        elif caracter == '"':
+            en_cadena = True
+        elif caracter in '{[':
+            pila.append('}' if caracter == '{' else ']')
+        elif caracter in '}]':
+            if pila:
+                pila.pop()
+            ultimo_seguro = i + 1
+        elif caracter == ',':
+            ultimo_seguro = i
+        elif not caracter.isspace() and caracter != ':':
+            ultimo_seguro = i + 1
+
+    if not pila and not en_cadena:
+        return texto
+
+    if en_cadena:
+        texto += '"'
+    else:
+        texto = texto[:ultimo_seguro]
+    # Una clave sin valor ("clave": o "clave") no se puede completar: se quita
+    if pila and pila[-1] == '}' and _clave_colgante(texto):
+        texto = re.sub(r'[,{]?\s*"[^"]*"\s*:?\s*$', lambda m: '{' if m.group(0).startswith('{') else '', texto)
+    texto = texto.rstrip().rstrip(',')
+    return texto + ''.join(reversed(pila))
+
+
+def _clave_colgante(texto: str) -> bool:
+    """True si el texto acaba en una clave de objeto sin valor."""
+    return bool(re.search(r'[{,]\s*"[^"]*"\s*:?\s*$', texto))
+
+
+def reparar_json(texto: str) -> Tuple[Any, List[str]]:
+    """
+    Intenta convertir la respuesta del modelo en un objeto JSON.
+
+    Corrige bloques de código markdown, texto alrededor del objeto, comas
+    finales y respuestas truncadas (cierra cadenas, arrays y objetos).
+
+    Returns:
+        (objeto o None, lista de reparaciones aplicadas)
+    """
+    reparaciones = []
+    limpio = (texto or '').strip()
+
+    bloque = re.search(r'```(?:json)?\s*(.*?)(```|$)', limpio, re.DOTALL)
+    if bloque and '{' not in limpio[:bloque.start()]:
+        limpio = bloque.group(1).strip()
+        reparaciones.append('bloque de código')
+
+    inicio = limpio.find('{')
+    if inicio == -1:
+        return None, reparaciones
+    if inicio > 0:
+        reparaciones.append('texto antes del JSON')
+    limpio = limpio[inicio:]
+
+    try:
+        return json.loads(limpio), reparaciones
+    except json.JSONDecodeError:
+        pass
+
+    # Texto después del objeto
+    fin = limpio.rfind('}') + 1
+    if fin > 0:
+        try:
+            objeto = json.loads(limpio[:fin])
+            return objeto, reparaciones + ['texto después del JSON']
+        except json.JSONDecodeError:
+            pass
+
+    sin_comas = re.sub(r',\s*([}\]])', r'\1', limpio)
+    if sin_comas != limpio:
+        reparaciones.append('comas finales')
+        limpio = sin_comas
+        try:
+            return json.loads(limpio), reparaciones
+        except json.JSONDecodeError:
+            pass
+
+    cerrado = re.sub(r',\s*([}\]])', r'\1', _cerrar_truncado(limpio))
+    try:
+        return json.loads(cerrado), reparaciones + ['respuesta truncada']
+    except json.JSONDecodeError:
+        return None, reparaciones
+
+
+def _a_numero(valor, entero: bool):
+    """Convierte '12,5 %', '1.234' o 12.0 al tipo numérico esperado (None si no se puede)."""
+    if isinstance(valor, bool):
+        return None
+    if isinstance(valor, str):
+        numero = re.search(r'-?\d+(?:[.,]\d+)*', valor.replace(' ', ''))
+        if not numero:
+            return None
+        texto = numero.group(0)
+        if ',' in texto and '.' in texto:
+            texto = texto.replace('.', '').replace(',', '.')
+        elif ',' in texto:
+            texto = texto.replace(',', '.')
+        elif entero and re.fullmatch(r'-?\d{1,3}(\.\d{3})+', texto):
+            texto = texto.replace('.', '')  # Separador de miles
+        valor = float(texto)
+    if not isinstance(valor, (int, float)):
+        return None
+    return int(round(valor)) if entero else float(valor)
+
+
+def coercionar_tipos(valor, esquema: Dict[str, Any] = None):
+    """Ajusta tipos recuperables según el esquema (números como texto, enums, listas...)."""
+    esquema = ESQUEMA_INSIGHTS if esquema is None else esquema
+    tipo = esquema.get('type')
+
+    if tipo in ('integer', 'number') and not _TIPOS[tipo](valor):
+        convertido = _a_numero(valor, tipo == 'integer')
+        return valor if convertido is None else convertido
+    if tipo == 'integer' and isinstance(valor, float) and valor.is_integer():
+        return int(valor)
+    if tipo == 'string' and 'enum' in esquema and isinstance(valor, str):
+        normalizado = valor.strip().lower()
+        normalizado = normalizado.translate(str.maketrans('áéíóú', 'aeiou'))
+        return normalizado if normalizado in esquema['enum'] else valor
+    if tipo == 'string' and isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return str(valor)
+    if tipo == 'array':
+        if isinstance(valor, str):
+            valor = [valor]
+        if isinstance(valor, list) and 'items' in esquema:
+            return [coercionar_tipos(item, esquema['items']) for item in valor]
+        return valor
+    if tipo == 'object' and isinstance(valor, dict):
+        propiedades = esquema.get('properties', {})
+        return {
+            campo: coercionar_tipos(v, propiedades[campo]) if campo in propiedades else v
+            for campo, v in valor.items()
+        }
+    return valor
+
+
+def campos_invalidos(insights: Dict[str, Any]) -> List[str]:
+    """Campos de primer nivel que faltan o no cumplen el esquema."""
+    campos = []
+    for ruta, _ in validar_insights(insights):
+        campo = re.split(r'[.\[]', ruta)[0]
+        if campo not in campos:
+            campos.append(campo)
+    return campos
+
+
+def interpretar_respuesta(texto: str):
+    """
+    Repara, ajusta tipos y valida una respuesta del modelo.
+
+    Returns:
+        (insights, campos_invalidos, reparaciones): insights es {} si no se
+        pudo leer nada
+    """
+    objeto, reparaciones = reparar_json(texto)
+    if not isinstance(objeto, dict):
+        return {}, list(ESQUEMA_INSIGHTS['required']), reparaciones
+
+    ajustado = coercionar_tipos(objeto)
+    if ajustado != objeto:
+        reparaciones.append('tipos')
+    return ajustado, campos_invalidos(ajustado), reparaciones
+
+
+def respuesta_aprovechable(texto: str, max_campos_invalidos: int = MAX_CAMPOS_A_COMPLETAR) -> bool:
+    """
+    True si la respuesta, tras la reparación local, cumple el esquema salvo
+    como mucho max_campos_invalidos campos (que se piden después aparte).
+    """
+    _, invalidos, _ = interpretar_respuesta(texto)
+    return len(invalidos) <= max_campos_invalidos
+
+
+def prompt_campos(campos: List[str], datos_empiricos: Dict[str, Any]) -> str:
+    """Prompt breve que pide solo los campos que faltan o son inválidos."""
+    esquema = {campo: ESQUEMA_INSIGHTS['properties'][campo] for campo in campos}
+    datos = json.dumps(
+        {clave: valor for clave, valor in datos_empiricos.items() if clave != 'pronostico_6_meses'},
+        ensure_ascii=False, default=str
+    )
+    return (
+        "Datos empíricos de pacientes menores de 20 años con esquizofrenia, "
+        f"trastornos esquizotípicos y delirantes:\n{datos}\n\n"
+        f"Devuelve SOLO un JSON con las claves {', '.join(campos)} "
+        f"que cumpla este JSON Schema:\n{json.dumps(esquema, ensure_ascii=False)}"
+    )
@@ -0,0 +1,180 @@
+import pandas as pd
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Any, Tuple
+
+# oracledb solo hace falta con el backend de Oracle
+# pip install oracledb
+try:
+    import oracledb
+except ImportError:
+    oracledb = None
+
+# pyarrow es opcional: sin él cada partición se lee con un cursor normal
+# pip install pyarrow
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+
+# Rangos de ROWID al estilo DBMS_PARALLEL_EXECUTE: se reparten los extents
+# de la tabla en N grupos con el mismo número de bloques.
+QUERY_RANGOS_ROWID = """
+SELECT grupo,
+       DBMS_ROWID.ROWID_CREATE(1, o.data_object_id, fno_min, bloque_min, 0) AS rowid_min,
+       DBMS_ROWID.ROWID_CREATE(1, o.data_object_id, fno_max, bloque_max, 32767) AS rowid_max
+FROM (
+    SELECT DISTINCT grupo,
+           FIRST_VALUE(relative_fno) OVER (PARTITION BY grupo ORDER BY relative_fno, block_id
+               ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING) AS fno_min,
+           FIRST_VALUE(block_id) OVER (PARTITION BY grupo ORDER BY relative_fno, block_id
+               ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING) AS bloque_min,
+           LAST_VALUE(relative_fno) OVER (PARTITION BY grupo ORDER BY relative_fno, block_id
+               ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING) AS fno_max,
+           LAST_VALUE(block_id + blocks - 1) OVER (PARTITION BY grupo ORDER BY relative_fno, block_id
+               ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING) AS bloque_max
+    FROM (
+        SELECT relative_fno, block_id, blocks,
+               TRUNC((SUM(blocks) OVER (ORDER BY relative_fno, block_id) - 0.01)
+                     / (SUM(blocks) OVER () / :particiones)) AS grupo
+        FROM user_extents
+        WHERE segment_name = :tabla
+          AND segment_type = 'TABLE'
+    )
+) rangos,
+(SELECT data_object_id FROM user_objects
+ WHERE object_name = :tabla AND object_type = 'TABLE') o
+ORDER BY grupo
+"""
+
+
+def crear_pool(db_config: Dict[str, str], sesiones: int):
+    """
+    Crea un pool de sesiones de Oracle con un tamaño fijo.
+
+    Args:
+        db_config: Configuración de conexión (la misma que usa el analizador)
+        sesiones: Número de sesiones del pool
+    """
+    if oracledb is None:
+        raise ImportError("El pool de sesiones de Oracle necesita oracledb (pip install oracledb)")
+    print(f"🔌 Creando pool de {sesiones} sesiones en Oracle Database...")
+    return oracledb.create_pool(
+        user=db_config['user'],
+        password=db_config['password'],
+        dsn=db_config['dsn'],
+        config_dir=db_config['config_dir'],
+        wallet_location=db_config['wallet_location'],
+        wallet_password=db_config['wallet_password'],
+        min=sesiones,
+        max=sesiones,
+        increment=0
+    )
+
+
+def particiones_hash(n: int) -> List[Tuple[str, Dict[str, Any]]]:
+    """N cubos disjuntos con ORA_HASH(ROWID); no necesita permisos extra."""
+    return [
+        (f"ORA_HASH(ROWID, {n - 1}) = :particion", {'particion': i})
+        for i in range(n)
+    ]
+
+
+def particiones_rowid(conexion, tabla: str, n: int) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    N rangos de ROWID con el mismo número de bloques (lecturas contiguas).
+
+    Usa USER_EXTENTS, así que la tabla debe pertenecer al usuario conectado
+    y no estar particionada (cada partición tiene su propio data_object_id).
+    Si no salen rangos se usa particiones_hash.
+    """
+    cursor = conexion.cursor()
+    try:
+        cursor.execute(QUERY_RANGOS_ROWID, particiones=n, tabla=tabla.upper())
+        rangos = cursor.fetchall()
+    finally:
+        cursor.close()
+
+    if not rangos:
+        print(f"⚠️ Sin rangos de ROWID para {tabla} (no es del usuario o está particionada); "
+              f"se usa ORA_HASH(ROWID)")
+        return particiones_hash(n)
+
+    return [
+        ("ROWID BETWEEN :rowid_min AND :rowid_max", {'rowid_min': rowid_min, 'rowid_max': rowid_max})
+        for _, rowid_min, rowid_max in rangos
+    ]
+
+
+def _leer_particion(pool, query: str, parametros: Dict[str, Any], arraysize: int):
+    """Lee una partición en su propia sesión del pool (Arrow si está disponible)."""
+    inicio = time.perf_counter()
+    with pool.acquire() as conexion:
+        if pa is not None and hasattr(conexion, 'fetch_df_all'):
+            odf = conexion.fetch_df_all(statement=query, parameters=parametros, arraysize=arraysize)
+            if hasattr(odf, '__arrow_c_stream__'):
+                lote = pa.table(odf)
+            else:
+                lote = pa.Table.from_arrays(odf.column_arrays(), names=odf.column_names())
+            filas = lote.num_rows
+        else:
+            cursor = conexion.cursor()
+            try:
+                cursor.arraysize = arraysize
+                cursor.execute(query, parametros)
+                columnas = [descripcion[0] for descripcion in cursor.description]
+                lote = pd.DataFrame.from_records(cursor.fetchall(), columns=columnas)
+            finally:
+                cursor.close()
+            filas = len(lote)
+    return lote, filas, time.perf_counter() - inicio
+
+
+def extraer_en_paralelo(pool, construir_query: Callable[[List[str]], str],
+                        particiones: List[Tuple[str, Dict[str, Any]]],
+                        parametros: Dict[str, Any] = None,
+                        arraysize: int = 10000) -> pd.DataFrame:
+    """
+    Lee todas las particiones a la vez, una por sesión, y las une en el cliente.
+
+    Args:
+        pool: Pool de sesiones (ver crear_pool)
+        construir_query: Función que recibe las condiciones extra y devuelve el SQL
+        particiones: Lista de (condición, binds) disjuntas que cubren la tabla
+        parametros: (Opcional) Binds comunes a todas las particiones
+        arraysize: Filas por viaje de red en cada sesión
+
+    Returns:
+        DataFrame con todas las filas
+    """
+    if not particiones:
+        raise ValueError("La extracción paralela necesita al menos una partición")
+    inicio = time.perf_counter()
+    trabajos = [
+        (construir_query([condicion]), {**(parametros or {}), **binds})
+        for condicion, binds in particiones
+    ]
+
+    with ThreadPoolExecutor(max_workers=len(trabajos), thread_name_prefix='particion') as ejecutor:
+        resultados = list(ejecutor.map(
+            lambda trabajo: _leer_particion(pool, trabajo[0], trabajo[1], arraysize),
+            trabajos
+        ))
+
+    lotes = [lote for lote, _, _ in resultados]
+    for i, (_, filas, segundos) in enumerate(resultados):
+        print(f"   Partición {i + 1}/{len(resultados)}: {filas} filas en {segundos:.2f} s")
+
+    if pa is not None and all(isinstance(lote, pa.Table) for lote in lotes):
+        df = pa.concat_tables(lotes, promote_options='default').to_pandas()
+    else:
+        df = pd.concat(
+            [lote.to_pandas() if pa is not None and isinstance(lote, pa.Table) else lote
+             for lote in lotes],
+            ignore_index=True
+        )
+
+    print(f"⚡ Extracción paralela: {len(df)} filas en {time.perf_counter() - inicio:.2f} s "
+          f"({len(particiones)} sesiones)")
+    return df
@@ -1,14 +1,52 @@
 import pandas as pd
 import numpy as np
-import oracledb
-import openai
 import subprocess
 import json
 import json
+import pickle
+import threading
+import time
+import os
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any
 import warnings
+from agregaciones import (
+    construir_cubo, CuboAgregacion, AcumuladorCorrelacion,
+    DIMENSIONES_COHORTE, MEDIDAS_COHORTE, COLUMNAS_CORRELACION
+)
+from ejecucion_reanudable import EjecucionReanudable, hash_contenido, hash_parametros
+from pronostico import (
+    pronosticar_cohortes, contar_ingresos, contar_ingresos_diarios, combinar_conteos, pronosticar_conteos
+)
+from muestreo import intervalos_confianza
+from extraccion_paralela import crear_pool, particiones_hash, particiones_rowid, extraer_en_paralelo
+from dimension_categoria import codigos_categoria, mapa_categorias
+from resumen_cohorte import (
+    VISTA_RESUMEN, crear_resumen, refrescar_resumen,
+    leer_resumen, conteos_mensuales, cohorte_resumible
+)
+from instrumentacion import RegistradorConsultas
+from backends import BackendDatos, BackendOracle
+from consulta_ia import ConsultorIA, llamar_modelo, fijar_api_key, MENSAJE_SISTEMA
+from telemetria_ia import TelemetriaIA, PresupuestoExcedido, estimar_tokens
+from esquema_insights import (
+    interpretar_respuesta, reparar_json, coercionar_tipos, prompt_campos,
+    campos_invalidos as campos_invalidos_esquema
+)
+from insights_plantilla import insights_plantilla, MODELO_PLANTILLA
+from reduccion_datos import reducir_visualizacion
+from render_json_html import guardar_dashboard, RenderIncremental, PaqueteDashboard, OUTPUT_HTML_FILE
 warnings.filterwarnings('ignore')
 
+CATEGORIA_ESQUIZOFRENIA = 'Esquizofrenia, trastornos esquizotípicos y trastornos delirantes'
+
+# Porcentaje mínimo que acepta SAMPLE de Oracle (100 equivale a la carga exacta)
+MUESTRA_MINIMA = 0.000001
+
+# Respuestas validadas que guarda la caché de respaldo de la IA (las más recientes)
+MAX_RESPUESTAS_CACHE = 50
+
 class AnalizadorSaludMentalIA:
     """
     Sistema de análisis de datos de salud mental con integración de IA.
@@ -16,7 +54,8 @@ class AnalizadorSaludMentalIA:
     Versión Oracle Database
     """
     
-    def __init__(self, api_key: str, connection=None, db_config: Dict[str, str] = None):
+    def __init__(self, api_key: str, connection=None, db_config: Dict[str, str] = None,
+                 backend: BackendDatos = None):
         """
         Inicializa el analizador.
         
@@ -32,13 +71,65 @@ class AnalizadorSaludMentalIA:
                     'wallet_location': 'ruta/wallet',
                     'wallet_password': 'password_wallet'
                 }
+            backend: (Opcional) Motor de datos; por defecto Oracle con db_config.
+                Con backends.BackendLocal el pipeline corre sobre los extractos
+                en proceso (DuckDB/sqlite), sin wallet ni red.
         """
-        openai.api_key = api_key
+        fijar_api_key(api_key)
         self.db_config = db_config
         self.connection = connection  # Puede ser None o una conexión existente
+        self.backend = backend if backend is not None else BackendOracle(db_config)
+        self.pool = None  # Pool de sesiones para la extracción paralela
         self.df = None
+        self.cubo = None
+        self.correlacion = None
+        self.dimensiones = DIMENSIONES_COHORTE
+        self.medidas = MEDIDAS_COHORTE
+        self.columna_fecha = '"Fecha de Ingreso"'  # None para no pronosticar
+        self.columnas_cohorte_pronostico = ['SEXO']
         self.datos_empiricos = {}
         self.insights_ia = {}
+        self.muestra = None  # Configuración de SAMPLE de la última carga (None = exacta)
+        self.codigos_categoria = None  # Códigos de DIM_CATEGORIA (None = filtrar con LIKE)
+        self.mapa_categorias = {}
+        self.resumen = None  # Vista resumen que responde la cohorte (None = leer filas)
+        self.filas_resumen = None  # Filas del resumen de la última carga
+        self.fecha_resumen = None
+        self.ingresos_diarios = None  # Ingresos por día de toda la cohorte (None = contar en self.df)
+        self.registrador = None  # RegistradorConsultas (None = sin instrumentar)
+        self.consultor = None  # ConsultorIA con cobertura (None = un solo modelo)
+        self.modelo_ia = 'gpt-4o'  # Modelo que generó los insights actuales
+        self.telemetria = None  # TelemetriaIA con tokens y presupuesto (None = sin límites)
+        self.ruta_cache_ia = None  # Respuestas validadas de la IA por prompt (respaldo si no hay presupuesto)
+        self.clave_cache_ia = None  # Hash del prompt de la consulta en curso
+        self.respuesta_de_respaldo = False  # True si la respuesta viene de caché o plantilla
+        self.presupuesto_puntos = None  # Puntos máximos por gráfica (None = PRESUPUESTO_PUNTOS)
+    
+    def instrumentar(self, ruta_log: str = 'consultas.jsonl', capturar_plan: bool = False):
+        """
+        Registra todas las llamadas a la base de datos en un log JSONL.
+        
+        Envuelve la conexión (y el pool, si existe) para medir conexión,
+        ejecución y fetch de cada consulta, con filas, bytes y viajes de red.
+        Para el plan de una consulta concreta: self.registrador.pedir_plan(sql).
+        
+        Args:
+            ruta_log: Archivo JSONL del log
+            capturar_plan: Si True adjunta el plan (DBMS_XPLAN) a cada consulta
+        """
+        self.registrador = RegistradorConsultas(ruta_log, capturar_plan)
+        if self.connection is not None:
+            self.connection = self.registrador.envolver(self.connection)
+        if self.pool is not None:
+            self.pool = self.registrador.envolver_pool(self.pool)
+        print(f"📝 Instrumentación de consultas activa: {ruta_log}")
+        return self.registrador
+    
+    def _operacion(self, nombre: str, **contexto):
+        """Agrupa las consultas de un bloque en el log (no hace nada sin instrumentar)."""
+        if self.registrador is None:
+            return nullcontext()
+        return self.registrador.operacion(nombre, **contexto)
     
     def conectar_bd(self):
         """Establece conexión con Oracle Database."""
@@ -49,62 +140,280 @@ class AnalizadorSaludMentalIA:
             return self.connection
         
         # Si no hay configuración, error
-        if self.db_config is None:
+        if isinstance(self.backend, BackendOracle) and self.db_config is None:
             raise ValueError("Se requiere db_config o una conexión existente")
         
-        print("🔌 Conectando a Oracle Database...")
+        if isinstance(self.backend, BackendOracle):
+            print("🔌 Conectando a Oracle Database...")
+        else:
+            print(f"🔌 Abriendo motor local ({self.backend.nombre})...")
         
         try:
-            self.connection = oracledb.connect(
-                user=self.db_config['user'],
-                password=self.db_config['password'],
-                dsn=self.db_config['dsn'],
-                config_dir=self.db_config['config_dir'],
-                wallet_location=self.db_config['wallet_location'],
-                wallet_password=self.db_config['wallet_password']
-            )
+            if self.registrador is not None:
+                self.connection = self.registrador.conectar(self.backend.conectar, backend=self.backend.nombre)
+            else:
+                self.connection = self.backend.conectar()
             print("✅ Conexión establecida correctamente")
             return self.connection
             
         except Exception as e:
-            print(f"❌ Error al conectar con Oracle: {e}")
+            print(f"❌ Error al conectar con {self.backend.nombre}: {e}")
             raise
     
-    def cargar_datos(self, filtro_edad: int = 20, tabla: str = "SALUDMENTAL"):
+    def usar_dimension_categoria(self):
+        """
+        Filtra la cohorte por CATEGORIA_COD en lugar de LIKE sobre "Categoría".
+        
+        Resuelve una sola vez los códigos en DIM_CATEGORIA (ver
+        dimension_categoria.preparar_dimension_categoria). Si la dimensión
+        no existe se sigue usando LIKE.
+        
+        Returns:
+            True si las consultas usarán el código
+        """
+        if self.connection is None:
+            self.conectar_bd()
+        
+        try:
+            codigos = codigos_categoria(self.connection, f'%{CATEGORIA_ESQUIZOFRENIA}%')
+            mapa = mapa_categorias(self.connection)
+        except Exception as e:
+            print(f"⚠️ DIM_CATEGORIA no disponible, se filtra con LIKE: {e}")
+            self.codigos_categoria = None
+            return False
+        
+        if not codigos:
+            print("⚠️ La categoría no está en DIM_CATEGORIA, se filtra con LIKE")
+            self.codigos_categoria = None
+            return False
+        
+        self.codigos_categoria = codigos
+        self.mapa_categorias = mapa
+        print(f"✅ Filtro de categoría por código: {codigos}")
+        return True
+    
+    def usar_resumen(self, vista: str = VISTA_RESUMEN, tabla: str = "SALUDMENTAL",
+                     crear: bool = False, refrescar: bool = False):
+        """
+        Responde las cargas de la cohorte desde la vista materializada resumen.
+        
+        Con la vista activa, cargar_datos lee unos cientos de filas agregadas
+        (EDAD x SEXO x CATEGORÍA x MES) en lugar de recorrer la tabla, siempre
+        que la cohorte pedida se pueda responder desde ese grano; si no, lee
+        las filas como siempre.
+        
+        Args:
+            vista: Nombre de la vista materializada
+            tabla: Tabla de hechos que resume la vista
+            crear: Si True crea el log y la vista si no existen
+            refrescar: Si True aplica los cambios pendientes antes de usarla
+        """
+        if self.connection is None:
+            self.conectar_bd()
+        
+        if crear:
+            crear_resumen(self.connection, tabla, self.columna_fecha, vista)
+        if refrescar:
+            refrescar_resumen(self.connection, vista)
+        
+        self.resumen = {'vista': vista, 'tabla': tabla}
+        print(f"✅ Cohorte servida desde el resumen {vista}")
+    
+    def _cargar_resumen(self, filtro_edad: int):
+        """Lee las filas del resumen que cubren la cohorte (self.df queda a None)."""
+        vista = self.resumen['vista']
+        print(f"🔍 Leyendo resumen {vista}...")
+        print(f"   Filtro edad: < {filtro_edad} años")
+        print(f"   Filtro categoría: Esquizofrenia")
+        
+        filas = leer_resumen(
+            self.connection, filtro_edad, f'%{CATEGORIA_ESQUIZOFRENIA}%',
+            con_mes=bool(self.columna_fecha), vista=vista
+        )
+        # Mismo corte que la carga por filas: el último mes con ingresos de la cohorte
+        # (el resumen solo guarda el mes, así que ese mes cuenta como incompleto)
+        fecha = None
+        if 'MES' in filas.columns:
+            fecha = pd.to_datetime(filas['MES'], errors='coerce').max()
+        return self._fijar_agregado(filas, None if pd.isna(fecha) else fecha)
+    
+    def _cargar_agregado(self, filtro_edad: int, tabla: str):
+        """Agrega la cohorte en el motor (EDAD x SEXO x CATEGORÍA x MES) y lee solo los grupos."""
+        print(f"🔍 Agregando la cohorte en {self.backend.nombre}...")
+        print(f"   Filtro edad: < {filtro_edad} años")
+        print(f"   Filtro categoría: Esquizofrenia")
+        
+        filas = self.backend.leer(self.connection, self._construir_query_agregada(filtro_edad, tabla))
+        self._decodificar_categoria(filas)
+        fecha = None
+        if 'FECHA_MAXIMA' in filas.columns:
+            fecha = pd.to_datetime(filas.pop('FECHA_MAXIMA'), errors='coerce').max()
+        return self._fijar_agregado(filas, None if pd.isna(fecha) else fecha)
+    
+    def _fijar_agregado(self, filas: pd.DataFrame, fecha_maxima):
+        """Deja las filas agregadas como resultado de la carga (self.df queda a None)."""
+        filas['Esquizofrenia'] = 1
+        
+        self.df = None
+        self.filas_resumen = filas
+        self.fecha_resumen = fecha_maxima
+        
+        print(f"✅ Agregado cargado: {len(filas)} filas ({int(filas['CASOS'].sum())} registros)")
+        return filas
+    
+    def _decodificar_categoria(self, df: pd.DataFrame):
+        """Sustituye CATEGORIA_COD por la columna "Categoría" (categórica) en el cliente."""
+        if 'CATEGORIA_COD' in df.columns:
+            df['Categoría'] = df.pop('CATEGORIA_COD').map(self.mapa_categorias).astype('category')
+        return df
+    
+    def _filtro_categoria(self):
+        """Columna de categoría a leer y condición de la cohorte sobre ella."""
+        if self.codigos_categoria:
+            # Comparación de enteros indexable en lugar de LIKE '%...%'
+            codigos = ', '.join(str(int(c)) for c in self.codigos_categoria)
+            return 'CATEGORIA_COD', f"CATEGORIA_COD IN ({codigos})"
+        return '"Categoría"', f'"Categoría" LIKE \'%{CATEGORIA_ESQUIZOFRENIA}%\''
+    
+    def _construir_query(self, filtro_edad: int = 20, tabla: str = "SALUDMENTAL",
+                         columnas_extra: list = None, condiciones_extra: list = None,
+                         muestra: Dict[str, Any] = None):
+        """
+        Construye la consulta SQL de la cohorte.
+        
+        Args:
+            filtro_edad: Edad máxima para filtrar
+            tabla: Nombre de la tabla
+            columnas_extra: (Opcional) Expresiones SQL adicionales en el SELECT
+            condiciones_extra: (Opcional) Condiciones adicionales en el WHERE
+            muestra: (Opcional) Configuración de SAMPLE (porcentaje, semilla, bloques)
+        """
+        columna_categoria, filtro_categoria = self._filtro_categoria()
+        
+        columnas = ['EDAD', 'SEXO', columna_categoria]
+        if self.columna_fecha:
+            columnas.append(f'{self.columna_fecha} AS FECHA_INGRESO')
+        columnas += list(columnas_extra or [])
+        condiciones = [
+            f'EDAD < {filtro_edad}',
+            filtro_categoria,
+            'SEXO IS NOT NULL'
+        ] + list(condiciones_extra or [])
+        
+        select = ',\n            '.join(columnas)
+        where = '\n          AND '.join(condiciones)
+        
+        origen = self.backend.origen(tabla, muestra)
+        
+        query = f"""
+        SELECT 
+            {select}
+        FROM {origen}
+        WHERE {where}
+        """
+        return query
+    
+    def _construir_query_agregada(self, filtro_edad: int = 20, tabla: str = "SALUDMENTAL"):
+        """
+        Consulta de la cohorte agregada en el motor al grano del resumen.
+        
+        Devuelve unos cientos de grupos (EDAD, SEXO, categoría, MES) con su
+        número de episodios en lugar de una fila por episodio.
+        """
+        columna_categoria, filtro_categoria = self._filtro_categoria()
+        columnas = ['EDAD', 'SEXO', columna_categoria]
+        grupo = list(columnas)
+        if self.columna_fecha:
+            mes = self.backend.expresion_mes(self.columna_fecha)
+            columnas += [f'{mes} AS MES', f'MAX({self.columna_fecha}) AS FECHA_MAXIMA']
+            grupo.append(mes)
+        
+        select = ',\n            '.join(columnas + ['COUNT(*) AS CASOS'])
+        where = '\n          AND '.join([f'EDAD < {filtro_edad}', filtro_categoria, 'SEXO IS NOT NULL'])
+        return f"""
+        SELECT 
+            {select}
+        FROM {self.backend.origen(tabla)}
+        WHERE {where}
+        GROUP BY {', '.join(grupo)}
+        """
+    
+    def cargar_datos(self, filtro_edad: int = 20, tabla: str = "SALUDMENTAL",
+                     columnas_extra: list = None, condiciones_extra: list = None,
+                     parametros: Dict[str, Any] = None, muestra: float = None,
+                     semilla: int = None, muestreo_bloques: bool = False,
+                     paralelo: int = None, particionado: str = 'hash',
+                     agregar_en_bd: bool = False):
         """
         Carga y filtra los datos desde Oracle DB.
         
         Args:
             filtro_edad: Edad máxima para filtrar (default: 20)
             tabla: Nombre de la tabla (default: SALUDMENTAL)
+            columnas_extra: (Opcional) Columnas adicionales a seleccionar
+            condiciones_extra: (Opcional) Condiciones adicionales del WHERE
+            parametros: (Opcional) Variables bind usadas en las condiciones extra
+            muestra: (Opcional) Porcentaje a muestrear con SAMPLE (MUESTRA_MINIMA-100); None o 100 = exacta
+            semilla: (Opcional) Semilla de SAMPLE para resultados reproducibles
+            muestreo_bloques: Si True usa SAMPLE BLOCK (más rápido, menos preciso)
+            paralelo: (Opcional) Número de sesiones para extraer en paralelo
+            particionado: 'hash' (ORA_HASH de ROWID) o 'rowid' (rangos de extents)
+            agregar_en_bd: Si True la cohorte se agrega en el motor y solo se leen
+                los grupos (cuando la consulta lo permite; ver cohorte_resumible)
         """
         print("📊 Cargando datos desde Oracle Database...")
         
+        self.muestra = None
+        self.ingresos_diarios = None
+        if muestra is not None and not MUESTRA_MINIMA <= muestra <= 100:
+            raise ValueError(f"El porcentaje de muestra debe estar entre {MUESTRA_MINIMA} y 100: {muestra}")
+        if muestra is not None and muestra < 100:
+            self.muestra = {
+                'porcentaje': muestra,
+                'semilla': semilla,
+                'bloques': muestreo_bloques,
+                # Conservador: las filas de un mismo bloque están correlacionadas
+                'efecto_diseno': 2.0 if muestreo_bloques else 1.0
+            }
+        
         # Asegurar conexión
         if self.connection is None:
             self.conectar_bd()
         elif not hasattr(self.connection, 'cursor'):
             raise ValueError("La conexión proporcionada no es válida")
         
+        # Cohorte respondible desde el resumen: no hace falta leer filas
+        self.filas_resumen = None
+        if (self.resumen is not None and self.resumen['tabla'] == tabla and not paralelo
+                and cohorte_resumible(columnas_extra, condiciones_extra, self.muestra)):
+            with self._operacion('carga_resumen', tabla=tabla, filtro_edad=filtro_edad):
+                return self._cargar_resumen(filtro_edad)
+        if agregar_en_bd and not paralelo and cohorte_resumible(columnas_extra, condiciones_extra, self.muestra):
+            with self._operacion('carga_agregada', tabla=tabla, filtro_edad=filtro_edad):
+                return self._cargar_agregado(filtro_edad, tabla)
+        
         # Construir query SQL
-        query = f"""
-        SELECT 
-            EDAD, 
-            SEXO, 
-            "Categoría"
-        FROM {tabla}
-        WHERE EDAD < {filtro_edad}
-          AND "Categoría" LIKE '%Esquizofrenia, trastornos esquizotípicos y trastornos delirantes%'
-          AND SEXO IS NOT NULL
-        """
+        query = self._construir_query(
+            filtro_edad, tabla, columnas_extra, condiciones_extra, self.muestra
+        )
         
         print("🔍 Ejecutando consulta SQL...")
         print(f"   Filtro edad: < {filtro_edad} años")
         print(f"   Filtro categoría: Esquizofrenia")
+        if self.muestra is not None:
+            print(f"   Muestra: {muestra}% {'por bloques' if muestreo_bloques else 'por filas'} (semilla {semilla})")
         
         try:
             # Ejecutar query y cargar en DataFrame
-            self.df = pd.read_sql(query, self.connection)
+            with self._operacion('carga', tabla=tabla, filtro_edad=filtro_edad, paralelo=paralelo):
+                if paralelo and paralelo > 1:
+                    self.df = self._cargar_en_paralelo(
+                        filtro_edad, tabla, columnas_extra, condiciones_extra,
+                        parametros, paralelo, particionado
+                    )
+                else:
+                    self.df = self.backend.leer(self.connection, query, parametros)
+                self._decodificar_categoria(self.df)
             
             # Crear columna binaria de Esquizofrenia
             self.df['Esquizofrenia'] = 1
@@ -125,26 +434,104 @@ class AnalizadorSaludMentalIA:
             print(f"❌ Error al ejecutar query: {e}")
             raise
     
-    def calcular_estadisticas(self):
+    def _cargar_en_paralelo(self, filtro_edad: int, tabla: str, columnas_extra: list,
+                            condiciones_extra: list, parametros: Dict[str, Any],
+                            paralelo: int, particionado: str):
+        """
+        Divide la tabla en particiones disjuntas y lee cada una en su propia sesión.
+        
+        Necesita db_config para crear el pool; con solo una conexión
+        existente se lee en serie.
+        """
+        if self.db_config is None or not isinstance(self.backend, BackendOracle):
+            print("⚠️ Extracción paralela no disponible sin db_config de Oracle, se lee en serie")
+            query = self._construir_query(
+                filtro_edad, tabla, columnas_extra, condiciones_extra, self.muestra
+            )
+            return self.backend.leer(self.connection, query, parametros)
+        
+        if self.pool is None or self.pool.max != paralelo:
+            if self.pool is not None:
+                self.pool.close()
+            self.pool = crear_pool(self.db_config, paralelo)
+            if self.registrador is not None:
+                self.pool = self.registrador.envolver_pool(self.pool)
+        
+        if particionado == 'rowid':
+            particiones = particiones_rowid(self.connection, tabla, paralelo)
+        elif particionado == 'hash':
+            particiones = particiones_hash(paralelo)
+        else:
+            raise ValueError(f"Particionado no soportado: {particionado}")
+        
+        print(f"   Extracción paralela: {len(particiones)} particiones ({particionado})")
+        return extraer_en_paralelo(
+            self.pool,
+            lambda extra: self._construir_query(
+                filtro_edad, tabla, columnas_extra,
+                list(condiciones_extra or []) + extra, self.muestra
+            ),
+            particiones,
+            parametros
+        )
+    
+    def calcular_estadisticas(self, cubo: CuboAgregacion = None,
+                              correlacion: AcumuladorCorrelacion = None):
         """
         Calcula estadísticas descriptivas y correlaciones.
         Genera DATOS EMPÍRICOS para el análisis.
+        
+        Todas las cifras se leen del cubo de agregación y del acumulador de
+        correlaciones, que se construyen en una sola pasada sobre self.df
+        (o sobre las filas del resumen si la carga se respondió desde él).
+        Si hay fechas de ingreso se añade además el pronóstico estadístico
+        a 6 meses.
+        
+        Args:
+            cubo: (Opcional) Cubo ya construido; si no se pasa se calcula desde self.df
+            correlacion: (Opcional) Acumulador de correlaciones ya construido
         """
         print("\n📈 Calculando estadísticas empíricas...")
         
+        # El pronóstico necesita la cohorte completa, no un cubo ni una muestra
+        pronostico = self._calcular_pronostico() if cubo is None and self.muestra is None else {}
+        
+        if cubo is None and self.df is None and self.filas_resumen is not None:
+            cubo = construir_cubo(
+                self.filas_resumen, self.dimensiones, self.medidas, columna_conteo='CASOS'
+            )
+            if correlacion is None:
+                correlacion = AcumuladorCorrelacion.desde_df(
+                    self.filas_resumen, COLUMNAS_CORRELACION, columna_conteo='CASOS'
+                )
+        if cubo is None:
+            cubo = construir_cubo(self.df, self.dimensiones, self.medidas)
+        if correlacion is None and self.df is not None:
+            correlacion = AcumuladorCorrelacion.desde_df(self.df, COLUMNAS_CORRELACION)
+        self.cubo = cubo
+        self.correlacion = correlacion
+        
+        total = self.cubo.total()
+        edad = total['edad']
+        distribucion_sexo = sorted(
+            self.cubo.tabla('sexo'), key=lambda fila: fila['conteo'], reverse=True
+        )
+        
         self.datos_empiricos = {
             # Estadísticas generales
-            'total_pacientes': int(len(self.df)),
-            'edad_media': float(self.df['EDAD'].mean()),
-            'edad_min': int(self.df['EDAD'].min()),
-            'edad_max': int(self.df['EDAD'].max()),
-            'edad_std': float(self.df['EDAD'].std()),
+            'total_pacientes': int(total['conteo']),
+            'edad_media': edad['media'],
+            'edad_min': int(edad['min']),
+            'edad_max': int(edad['max']),
+            'edad_std': edad['std'],
             
             # Distribución por sexo
-            'distribucion_sexo': self.df['SEXO'].value_counts().to_dict(),
+            'distribucion_sexo': {
+                fila['sexo']: fila['conteo'] for fila in distribucion_sexo
+            },
             
             # Prevalencia de esquizofrenia (todos son casos en este dataset filtrado)
-            'casos_esquizofrenia': int(len(self.df)),
+            'casos_esquizofrenia': int(total['conteo']),
             'tasa_esquizofrenia': 100.0,  # 100% porque están todos filtrados
             
             # Análisis por grupos de edad
@@ -157,73 +544,246 @@ class AnalizadorSaludMentalIA:
             'correlaciones': self._calcular_correlaciones(),
             
             # Información de la categoría
-            'categoria_diagnostico': 'Esquizofrenia, trastornos esquizotípicos y trastornos delirantes'
+            'categoria_diagnostico': CATEGORIA_ESQUIZOFRENIA
         }
         
+        # Pronóstico estadístico a 6 meses (si hay fechas de ingreso)
+        if pronostico:
+            self.datos_empiricos['pronostico_6_meses'] = pronostico
+        
+        # Vista previa: escalar conteos e incluir intervalos de confianza
+        if self.muestra is not None:
+            self._escalar_muestra()
+        
         print("✅ Estadísticas calculadas")
         return self.datos_empiricos
     
-    def _agrupar_por_edad(self):
-        """Agrupa pacientes por rangos de edad."""
-        bins = [0, 10, 15, 20]
-        labels = ['0-10 años', '11-15 años', '16-19 años']
-        
-        self.df['Rango_Edad'] = pd.cut(
-            self.df['EDAD'], 
-            bins=bins, 
-            labels=labels, 
-            include_lowest=True
-        )
+    def calcular_estadisticas_streaming(self, filtro_edad: int = 20, tabla: str = "SALUDMENTAL",
+                                        tamano_lote: int = 50000):
+        """
+        Calcula los datos empíricos recorriendo el cursor por lotes (fetchmany).
+        
+        Cada lote actualiza el cubo de agregación, el acumulador de
+        correlaciones y los conteos mensuales del pronóstico, y después se
+        descarta. La memoria depende del tamaño del lote, no de la cohorte,
+        y el resultado es el mismo diccionario que con cargar_datos +
+        calcular_estadisticas. self.df queda a None.
+        
+        Args:
+            filtro_edad: Edad máxima para filtrar (default: 20)
+            tabla: Nombre de la tabla (default: SALUDMENTAL)
+            tamano_lote: Filas por fetchmany (default: 50000)
+        """
+        print("📊 Agregando datos desde Oracle Database por lotes...")
+        
+        # Asegurar conexión
+        if self.connection is None:
+            self.conectar_bd()
+        elif not hasattr(self.connection, 'cursor'):
+            raise ValueError("La conexión proporcionada no es válida")
+        
+        query = self._construir_query(filtro_edad, tabla)
+        self.df = None
+        self.filas_resumen = None
+        self.muestra = None
+        self.ingresos_diarios = None
         
+        cubo = None
+        correlacion = None
+        conteos = None
+        fecha_maxima = None
+        registros = 0
+        lotes = 0
+        
+        with self._operacion('carga_streaming', tabla=tabla, filtro_edad=filtro_edad):
+            for lote in self.backend.leer_por_lotes(self.connection, query, tamano_lote=tamano_lote):
+                self._decodificar_categoria(lote)
+                lote['Esquizofrenia'] = 1
+                
+                cubo_lote = construir_cubo(lote, self.dimensiones, self.medidas)
+                correlacion_lote = AcumuladorCorrelacion.desde_df(lote, COLUMNAS_CORRELACION)
+                cubo = cubo_lote if cubo is None else cubo.combinar(cubo_lote)
+                correlacion = (
+                    correlacion_lote if correlacion is None
+                    else correlacion.combinar(correlacion_lote)
+                )
+                
+                if 'FECHA_INGRESO' in lote.columns:
+                    conteos_lote, fecha_lote = contar_ingresos(
+                        lote, 'FECHA_INGRESO', self.columnas_cohorte_pronostico
+                    )
+                    conteos = conteos_lote if conteos is None else combinar_conteos(conteos, conteos_lote)
+                    if fecha_lote is not None:
+                        fecha_maxima = fecha_lote if fecha_maxima is None else max(fecha_maxima, fecha_lote)
+                
+                registros += len(lote)
+                lotes += 1
+                del lote
+        
+        print(f"✅ {registros} registros agregados en {lotes} lotes de hasta {tamano_lote}")
+        
+        self.calcular_estadisticas(cubo=cubo, correlacion=correlacion)
+        
+        if conteos is not None and fecha_maxima is not None:
+            print("🔮 Calculando pronóstico estadístico a 6 meses...")
+            pronostico = pronosticar_conteos(conteos, fecha_maxima, horizonte=6)
+            if pronostico:
+                self.datos_empiricos['pronostico_6_meses'] = pronostico
+        
+        return self.datos_empiricos
+    
+    def _agrupar_por_edad(self):
+        """Agrupa pacientes por rangos de edad (marginal del cubo)."""
         resultado = {}
-        for rango in labels:
-            datos_rango = self.df[self.df['Rango_Edad'] == rango]
-            if len(datos_rango) > 0:
-                # Todos son casos de esquizofrenia (filtrados previamente)
-                resultado[rango] = {
-                    'total': int(len(datos_rango)),
-                    'casos_esquizofrenia': int(len(datos_rango)),
-                    'tasa': 100.0
-                }
+        for fila in self.cubo.tabla('rango_edad'):
+            # Todos son casos de esquizofrenia (filtrados previamente)
+            resultado[fila['rango_edad']] = {
+                'total': fila['conteo'],
+                'casos_esquizofrenia': fila['conteo'],
+                'tasa': 100.0
+            }
         
         return resultado
     
     def _analizar_por_sexo(self):
-        """Analiza la relación entre sexo y esquizofrenia."""
+        """Analiza la relación entre sexo y esquizofrenia (marginal del cubo)."""
         resultado = {}
         
-        for sexo in self.df['SEXO'].unique():
-            datos_sexo = self.df[self.df['SEXO'] == sexo]
+        for fila in self.cubo.tabla('sexo'):
             # Todos son casos de esquizofrenia
-            resultado[str(sexo)] = {
-                'total': int(len(datos_sexo)),
-                'casos_esquizofrenia': int(len(datos_sexo)),
+            resultado[str(fila['sexo'])] = {
+                'total': fila['conteo'],
+                'casos_esquizofrenia': fila['conteo'],
                 'tasa': 100.0,
-                'edad_media': float(datos_sexo['EDAD'].mean())
+                'edad_media': fila['edad']['media']
             }
         
         return resultado
     
     def _calcular_correlaciones(self):
-        """Calcula correlaciones entre variables numéricas."""
-        # Seleccionar solo columnas numéricas
-        columnas_numericas = self.df.select_dtypes(
-            include=[np.number]
-        ).columns.tolist()
-        
-        if len(columnas_numericas) >= 2:
-            corr_matrix = self.df[columnas_numericas].corr()
-            
-            # Extraer correlación edad-esquizofrenia si existe
-            if 'EDAD' in columnas_numericas and 'Esquizofrenia' in columnas_numericas:
-                return {
-                    'edad_esquizofrenia': float(
-                        corr_matrix.loc['EDAD', 'Esquizofrenia']
-                    )
-                }
+        """Calcula correlaciones entre variables numéricas (desde el acumulador)."""
+        if self.correlacion is None:
+            return {}
+        
+        # Extraer correlación edad-esquizofrenia si existe
+        if 'EDAD' in self.correlacion.columnas and 'Esquizofrenia' in self.correlacion.columnas:
+            return {
+                'edad_esquizofrenia': self.correlacion.correlacion('EDAD', 'Esquizofrenia')
+            }
         
         return {}
     
+    def _escalar_muestra(self):
+        """Escala los conteos de la muestra a la cohorte y añade intervalos de confianza."""
+        fraccion = self.muestra['porcentaje'] / 100
+        factor = 1 / fraccion
+        registros = self.datos_empiricos['total_pacientes']
+        
+        def escalar(valor):
+            return int(round(valor * factor))
+        
+        self.datos_empiricos['total_pacientes'] = escalar(registros)
+        self.datos_empiricos['casos_esquizofrenia'] = escalar(registros)
+        self.datos_empiricos['distribucion_sexo'] = {
+            sexo: escalar(cantidad)
+            for sexo, cantidad in self.datos_empiricos['distribucion_sexo'].items()
+        }
+        for grupo in ('distribucion_edad', 'esquizofrenia_por_sexo'):
+            for datos in self.datos_empiricos[grupo].values():
+                datos['total'] = escalar(datos['total'])
+                datos['casos_esquizofrenia'] = escalar(datos['casos_esquizofrenia'])
+        
+        self.datos_empiricos['muestra'] = {
+            **self.muestra,
+            'registros_muestra': registros,
+            'factor_expansion': factor
+        }
+        self.datos_empiricos['intervalos_confianza'] = intervalos_confianza(
+            self.cubo, fraccion, efecto_diseno=self.muestra['efecto_diseno']
+        )
+        print(f"🎲 Vista previa: {registros} registros muestreados, factor de expansión {factor:.1f}")
+    
+    def vista_previa(self, porcentaje: float = 1.0, semilla: int = 42,
+                     filtro_edad: int = 20, muestreo_bloques: bool = True):
+        """
+        Calcula una vista previa rápida de las estadísticas sobre una muestra.
+        
+        No consulta a la IA. Los conteos se escalan a la cohorte completa y
+        cada cifra trae su intervalo de confianza en 'intervalos_confianza'.
+        
+        Args:
+            porcentaje: Porcentaje a muestrear (default: 1%)
+            semilla: Semilla de SAMPLE (default: 42)
+            filtro_edad: Edad máxima para filtrar (default: 20)
+            muestreo_bloques: Si True usa SAMPLE BLOCK (default: True)
+        """
+        inicio = time.perf_counter()
+        self.cargar_datos(
+            filtro_edad=filtro_edad,
+            muestra=porcentaje,
+            semilla=semilla,
+            muestreo_bloques=muestreo_bloques
+        )
+        self.calcular_estadisticas()
+        print(f"⏱️ Vista previa en {time.perf_counter() - inicio:.3f} s")
+        return self.datos_empiricos
+    
+    def refinar_en_segundo_plano(self, porcentajes: tuple = (10, None), callback=None,
+                                 semilla: int = 42, filtro_edad: int = 20):
+        """
+        Refina la vista previa en un hilo aparte hasta llegar al resultado exacto.
+        
+        Cada paso recarga con un porcentaje mayor (None = cohorte completa)
+        y llama a callback(datos_empiricos, porcentaje). Mientras el hilo
+        esté vivo no se debe usar el analizador ni su conexión desde fuera.
+        
+        Args:
+            porcentajes: Porcentajes sucesivos; None significa consulta exacta
+            callback: (Opcional) Función llamada tras cada paso
+            semilla: Semilla de SAMPLE (default: 42)
+            filtro_edad: Edad máxima para filtrar (default: 20)
+        
+        Returns:
+            El hilo lanzado (threading.Thread)
+        """
+        def refinar():
+            for porcentaje in porcentajes:
+                try:
+                    self.cargar_datos(filtro_edad=filtro_edad, muestra=porcentaje, semilla=semilla)
+                    datos = self.calcular_estadisticas()
+                except Exception as e:
+                    print(f"❌ Error refinando al {porcentaje or 100}%: {e}")
+                    return
+                if callback is not None:
+                    callback(datos, porcentaje)
+        
+        hilo = threading.Thread(target=refinar, name='refinado-vista-previa', daemon=True)
+        hilo.start()
+        return hilo
+    
+    def _calcular_pronostico(self):
+        """Pronostica la incidencia mensual de la cohorte a 6 meses."""
+        if self.df is None and self.filas_resumen is not None and 'MES' in self.filas_resumen.columns:
+            # El mes del último refresco se trata como el último observado
+            print("🔮 Calculando pronóstico estadístico a 6 meses (resumen)...")
+            columnas = [col for col in self.columnas_cohorte_pronostico if col in self.filas_resumen.columns]
+            pronostico = pronosticar_conteos(
+                conteos_mensuales(self.filas_resumen, columnas), self.fecha_resumen, horizonte=6
+            )
+        elif self.df is None or 'FECHA_INGRESO' not in self.df.columns:
+            return {}
+        else:
+            print("🔮 Calculando pronóstico estadístico a 6 meses...")
+            pronostico = pronosticar_cohortes(
+                self.df,
+                'FECHA_INGRESO',
+                columnas_cohorte=self.columnas_cohorte_pronostico,
+                horizonte=6
+            )
+        if not pronostico:
+            print("⚠️ Historia insuficiente para pronosticar (se necesitan al menos 3 meses)")
+        return pronostico
+    
     def construir_prompt(self):
         """
         Construye un prompt estructurado y contextualizado para la IA.
@@ -231,6 +791,14 @@ class AnalizadorSaludMentalIA:
         """
         print("\n🤖 Construyendo prompt para IA...")
         
+        if 'pronostico_6_meses' in self.datos_empiricos:
+            instruccion_proyeccion = (
+                "Interpreta el pronóstico estadístico proporcionado. Copia sus cifras "
+                "tal cual en el JSON y explica en la justificación qué las explica"
+            )
+        else:
+            instruccion_proyeccion = "Estimación prudente de nuevos casos esperados en esta población"
+        
         prompt = f"""Eres un experto en análisis de datos de salud mental pediátrica y juvenil. 
         Analiza los siguientes datos REALES de pacientes menores de 20 años DIAGNOSTICADOS con esquizofrenia, trastornos esquizotípicos y trastornos delirantes.
 
@@ -252,6 +820,7 @@ class AnalizadorSaludMentalIA:
         {self._formatear_analisis_sexo()}
 
         {self._formatear_correlaciones()}
+        {self._formatear_pronostico()}
 
         ## CONTEXTO IMPORTANTE:
         - Estos son TODOS casos diagnosticados (no población general)
@@ -265,7 +834,7 @@ class AnalizadorSaludMentalIA:
         1. **Patrones demográficos**: Identifica tendencias en edad, sexo y distribución
         2. **Factores de riesgo observados**: Basándote en los datos demográficos disponibles
         3. **Análisis comparativo**: Diferencias entre grupos de edad y sexo
-        4. **Proyección a 6 meses**: Estimación prudente de nuevos casos esperados en esta población
+        4. **Proyección a 6 meses**: {instruccion_proyeccion}
         5. **Recomendaciones clínicas**: Acciones específicas para el seguimiento de estos pacientes
         6. **Áreas de atención prioritaria**: Grupos demográficos que requieren mayor seguimiento
 
@@ -353,39 +922,162 @@ class AnalizadorSaludMentalIA:
             return texto
         return ""
     
+    def _formatear_pronostico(self):
+        """Formatea el pronóstico estadístico para el prompt."""
+        pronostico = self.datos_empiricos.get('pronostico_6_meses')
+        if not pronostico:
+            return ""
+        total = pronostico['total']
+        intervalo = total['intervalo_prediccion']
+        texto = "### Pronóstico Estadístico a 6 Meses (modelo local, no IA):\n"
+        texto += f"- Modelo: {total['modelo']} ({total['meses_observados']} meses observados)\n"
+        texto += f"- Nuevos casos estimados: {total['nuevos_casos_estimados']} "
+        texto += f"(IC {intervalo['nivel'] * 100:.0f}%: {intervalo['inferior']}-{intervalo['superior']})\n"
+        texto += f"- Tasa de crecimiento: {total['tasa_crecimiento']:.2f}%\n"
+        texto += f"- Confianza: {total['confianza']}\n"
+        for cohorte in pronostico['por_cohorte']:
+            texto += f"- {cohorte['cohorte']}: {cohorte['nuevos_casos_estimados']} casos "
+            texto += f"({cohorte['intervalo_prediccion']['inferior']}-{cohorte['intervalo_prediccion']['superior']})\n"
+        return texto
+    
+    def configurar_cobertura(self, modelos_respaldo: list, retardo: float = 10.0,
+                             plazo: float = 60.0, modelo: str = "gpt-4o",
+                             ruta_latencias: str = 'latencias_ia.json'):
+        """
+        Activa las consultas con cobertura (hedging) y plazo máximo.
+        
+        Si el modelo principal no da una respuesta válida en `retardo`
+        segundos se lanza el siguiente modelo de respaldo, y se queda la
+        primera respuesta válida. Pasado `plazo` sin respuesta se usan los
+        insights de plantilla construidos con los datos empíricos.
+        
+        Args:
+            modelos_respaldo: Modelos de respaldo, nombres o diccionarios
+                {'modelo', 'api_base', 'api_key'} para otro endpoint
+            retardo: Segundos antes de lanzar cada respaldo
+            plazo: Plazo máximo en segundos
+            modelo: Modelo principal (default: gpt-4o)
+            ruta_latencias: JSON donde se acumulan los histogramas de latencia
+        """
+        modelos = [{'modelo': modelo}] + [
+            respaldo if isinstance(respaldo, dict) else {'modelo': respaldo}
+            for respaldo in modelos_respaldo
+        ]
+        self.consultor = ConsultorIA(modelos, retardo, plazo, ruta_latencias=ruta_latencias,
+                                     telemetria=self.telemetria)
+        print(f"🪂 Cobertura activa: {[m['modelo'] for m in modelos]} (retardo {retardo} s, plazo {plazo} s)")
+        return self.consultor
+    
+    def configurar_telemetria(self, tokens_ejecucion: int = None, tokens_diarios: int = None,
+                              ruta_log: str = 'llamadas_ia.jsonl', ruta_metricas: str = 'metricas_ia.prom',
+                              ruta_estado: str = 'consumo_ia.json',
+                              ruta_cache: str = 'ultima_respuesta_ia.json'):
+        """
+        Registra tokens, latencia y caché de cada llamada a la IA y limita el consumo.
+        
+        Los contadores acumulados se exportan en formato Prometheus y cada
+        llamada queda en un log JSONL. Si una consulta no cabe en el
+        presupuesto de la ejecución o del día, se usa la respuesta validada
+        que se guardó en ruta_cache para el mismo prompt (misma cohorte y
+        mismas estadísticas) y, si no hay, los insights de plantilla.
+        
+        Args:
+            tokens_ejecucion: (Opcional) Tokens máximos por ejecución
+            tokens_diarios: (Opcional) Tokens máximos por día
+            ruta_log: JSONL con una línea por llamada
+            ruta_metricas: Archivo de métricas Prometheus (textfile collector)
+            ruta_estado: JSON con los contadores acumulados y el consumo diario
+            ruta_cache: JSON con las últimas respuestas validadas de la IA, por prompt
+        """
+        self.telemetria = TelemetriaIA(ruta_log, ruta_metricas, ruta_estado, tokens_ejecucion, tokens_diarios)
+        self.ruta_cache_ia = ruta_cache
+        if self.consultor is not None:
+            self.consultor.telemetria = self.telemetria
+        print(f"📈 Telemetría de IA activa: {ruta_metricas} "
+              f"(presupuesto: ejecución {tokens_ejecucion or '∞'}, diario {tokens_diarios or '∞'} tokens)")
+        return self.telemetria
+    
+    def _leer_cache_ia(self) -> Dict[str, Any]:
+        """Respuestas validadas guardadas, por hash del prompt ({} si no hay caché)."""
+        if not self.ruta_cache_ia or not os.path.exists(self.ruta_cache_ia):
+            return {}
+        with open(self.ruta_cache_ia, 'r', encoding='utf-8') as f:
+            return json.load(f).get('respuestas', {})
+    
+    def _respuesta_de_respaldo(self) -> str:
+        """Respuesta validada para este mismo prompt si existe; si no, insights de plantilla."""
+        self.respuesta_de_respaldo = True
+        cache = self._leer_cache_ia().get(self.clave_cache_ia)
+        if cache is not None:
+            print(f"🗃️ Usando la respuesta guardada de la IA para este prompt ({cache['modelo']}, {cache['fecha']})")
+            self.modelo_ia = cache['modelo']
+            if self.telemetria is not None:
+                self.telemetria.registrar_cache(True, 'respaldo', cache['modelo'])
+            return cache['respuesta']
+        
+        print("📝 Usando insights de plantilla (datos empíricos)")
+        self.modelo_ia = MODELO_PLANTILLA
+        return json.dumps(insights_plantilla(self.datos_empiricos), ensure_ascii=False)
+    
+    def _guardar_respuesta_cache(self, insights: Dict[str, Any]):
+        """Guarda los insights ya validados bajo el hash del prompt que los generó."""
+        if not self.ruta_cache_ia or self.clave_cache_ia is None:
+            return
+        respuestas = self._leer_cache_ia()
+        respuestas.pop(self.clave_cache_ia, None)
+        respuestas[self.clave_cache_ia] = {
+            'respuesta': json.dumps(insights, ensure_ascii=False),
+            'modelo': self.modelo_ia,
+            'fecha': pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+        respuestas = dict(list(respuestas.items())[-MAX_RESPUESTAS_CACHE:])
+        temporal = f"{self.ruta_cache_ia}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump({'respuestas': respuestas}, f, ensure_ascii=False)
+        os.replace(temporal, self.ruta_cache_ia)
+    
     def consultar_ia(self, prompt: str, modelo: str = "gpt-4o"):
         """
         Envía el prompt a OpenAI y obtiene la respuesta.
         
+        Con cobertura activa (configurar_cobertura) consulta a varios modelos
+        y, si ninguno responde a tiempo, devuelve los insights de plantilla.
+        
         Args:
             prompt: El prompt construido
             modelo: Modelo de OpenAI a usar (default: gpt-4o)
         """
+        self.respuesta_de_respaldo = False
+        self.clave_cache_ia = hash_contenido(prompt.encode('utf-8'))[:16]
+        if self.telemetria is not None:
+            self.telemetria.registrar_cache(False, 'respuesta_ia')
+            if not self.telemetria.dentro_presupuesto(estimar_tokens(MENSAJE_SISTEMA + prompt) + 2000):
+                return self._respuesta_de_respaldo()
+        
+        if self.consultor is not None:
+            print("\n🚀 Consultando a OpenAI con cobertura...")
+            try:
+                respuesta_texto, modelo_usado = self.consultor.consultar(prompt)
+            except PresupuestoExcedido as e:
+                print(f"💸 {e}")
+                return self._respuesta_de_respaldo()
+            if respuesta_texto is None:
+                return self._respuesta_de_respaldo()
+            self.modelo_ia = modelo_usado
+            return respuesta_texto
+        
         print(f"\n🚀 Consultando a OpenAI ({modelo})...")
         
         try:
-            response = openai.ChatCompletion.create(
-                model=modelo,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Eres un experto en análisis de datos de salud mental. "
-                                   "Respondes SOLO con JSON válido, sin texto adicional."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.3,  # Baja temperatura para respuestas más precisas
-                max_tokens=2000
-            )
-            
-            respuesta_texto = response['choices'][0]['message']['content']
+            respuesta_texto = llamar_modelo({'modelo': modelo}, prompt, telemetria=self.telemetria)
             print("✅ Respuesta recibida de OpenAI")
+            self.modelo_ia = modelo
             
             return respuesta_texto
             
+        except PresupuestoExcedido as e:
+            print(f"💸 {e}")
+            return self._respuesta_de_respaldo()
         except Exception as e:
             print(f"❌ Error al consultar OpenAI: {e}")
             raise
@@ -394,65 +1086,115 @@ class AnalizadorSaludMentalIA:
         """
         Procesa y valida la respuesta JSON de la IA.
         
+        La respuesta se repara localmente y se valida contra el esquema de
+        insights; solo los campos que siguen siendo inválidos se piden de
+        nuevo al modelo, y si tampoco llegan se toman de la plantilla.
+        
         Args:
             respuesta_texto: Respuesta de OpenAI en texto
         """
         print("\n🔍 Procesando respuesta de la IA...")
         
+        insights, campos_invalidos, reparaciones = interpretar_respuesta(respuesta_texto)
+        if reparaciones:
+            print(f"🔧 Reparación local: {', '.join(reparaciones)}")
+        
+        # Solo se vuelve a preguntar por los campos que faltan o no cumplen el esquema
+        if campos_invalidos and self.modelo_ia != MODELO_PLANTILLA:
+            if not insights:
+                print(f"⚠️ Respuesta ilegible: {respuesta_texto[:200]}...")
+            insights.update(self._completar_campos(campos_invalidos))
+            campos_invalidos = campos_invalidos_esquema(insights)
+        
+        if campos_invalidos:
+            print(f"⚠️ Campos sin respuesta válida, se completan con la plantilla: {campos_invalidos}")
+            plantilla = insights_plantilla(self.datos_empiricos)
+            insights.update({campo: plantilla[campo] for campo in campos_invalidos})
+        else:
+            print("✅ JSON válido según el esquema de insights")
+            # Solo lo que ha pasado la validación puede servir luego de respaldo
+            if not self.respuesta_de_respaldo and self.modelo_ia != MODELO_PLANTILLA:
+                self._guardar_respuesta_cache(insights)
+        
+        self.insights_ia = insights
+        self._aplicar_pronostico()
+        
+        return self.insights_ia
+    
+    def _completar_campos(self, campos: list) -> Dict[str, Any]:
+        """
+        Pide al modelo solo los campos indicados con un prompt breve.
+        
+        Returns:
+            Los campos recuperados (ajustados al esquema); {} si falla
+        """
+        print(f"🎯 Pidiendo de nuevo solo: {campos}")
+        config = {'modelo': self.modelo_ia, 'max_tokens': 800}
+        plazo = None
+        if self.consultor is not None:
+            plazo = self.consultor.plazo_maximo
+            config.update(next(
+                (m for m in self.consultor.modelos if m['modelo'] == self.modelo_ia), {}
+            ))
+            config['max_tokens'] = 800
+        
         try:
-            # Limpiar la respuesta (por si hay texto antes/después del JSON)
-            respuesta_limpia = respuesta_texto.strip()
-            
-            # Buscar el JSON dentro del texto
-            inicio = respuesta_limpia.find('{')
-            fin = respuesta_limpia.rfind('}') + 1
-            
-            if inicio != -1 and fin > inicio:
-                json_texto = respuesta_limpia[inicio:fin]
-                self.insights_ia = json.loads(json_texto)
-            else:
-                self.insights_ia = json.loads(respuesta_limpia)
-            
-            # Validar estructura
-            campos_requeridos = [
-                'patrones_demograficos',
-                'factores_asociados',
-                'analisis_comparativo',
-                'proyeccion_6_meses',
-                'recomendaciones',
-                'grupos_prioritarios'
-            ]
-            
-            campos_faltantes = [
-                campo for campo in campos_requeridos 
-                if campo not in self.insights_ia
-            ]
-            
-            if campos_faltantes:
-                print(f"⚠️ Advertencia: Campos faltantes: {campos_faltantes}")
-            else:
-                print("✅ JSON válido con todos los campos requeridos")
-            
-            return self.insights_ia
-            
-        except json.JSONDecodeError as e:
-            print(f"❌ Error al parsear JSON: {e}")
-            print(f"Respuesta recibida: {respuesta_texto[:500]}...")
-            raise
+            texto = llamar_modelo(config, prompt_campos(campos, self.datos_empiricos), plazo,
+                                  self.telemetria, etapa='campos', reintento=1)
+        except Exception as e:
+            print(f"❌ Error al completar campos: {e}")
+            return {}
+        
+        parcial, _ = reparar_json(texto)
+        if not isinstance(parcial, dict):
+            return {}
+        parcial = coercionar_tipos(parcial)
+        recuperados = {campo: parcial[campo] for campo in campos if campo in parcial}
+        print(f"✅ Campos recuperados: {list(recuperados)}")
+        return recuperados
+    
+    def _aplicar_pronostico(self):
+        """
+        Sustituye las cifras de la proyección por las del pronóstico estadístico.
+        La IA solo aporta la interpretación (justificación).
+        """
+        pronostico = self.datos_empiricos.get('pronostico_6_meses')
+        if not pronostico:
+            return
+        
+        total = pronostico['total']
+        proyeccion = self.insights_ia.get('proyeccion_6_meses')
+        if not isinstance(proyeccion, dict):
+            proyeccion = {}
+        proyeccion.update({
+            'nuevos_casos_estimados': total['nuevos_casos_estimados'],
+            'tasa_crecimiento': total['tasa_crecimiento'],
+            'confianza': total['confianza'],
+            'intervalo_prediccion': total['intervalo_prediccion'],
+            'modelo': total['modelo'],
+            'fuente': 'Pronóstico estadístico local'
+        })
+        proyeccion.setdefault('justificacion', 'Pronóstico estadístico sobre la incidencia mensual')
+        self.insights_ia['proyeccion_6_meses'] = proyeccion
     
-    def generar_informe_completo(self):
+    def generar_informe_completo(self, incluir_insights: bool = True):
         """
         Genera un informe completo diferenciando datos empíricos de insights de IA.
         Formato listo para dashboard.
+        
+        Args:
+            incluir_insights: Si False genera el informe parcial (insights
+                PENDIENTE) mientras la consulta a la IA sigue en curso
         """
-        print("\n📋 Generando informe completo...")
+        print("\n📋 Generando informe completo..." if incluir_insights else "\n📋 Generando informe parcial...")
         
         informe = {
             'metadata': {
                 'fecha_analisis': pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'),
                 'total_registros': self.datos_empiricos['total_pacientes'],
-                'modelo_ia': 'gpt-4o',
-                'fuente_datos': 'Oracle Database'
+                'modelo_ia': self.modelo_ia if incluir_insights else 'pendiente',
+                'fuente_datos': 'Oracle Database',
+                'consumo_ia': self.telemetria.resumen() if self.telemetria is not None else None
             },
             
             # DATOS EMPÍRICOS (de la base de datos)
@@ -468,8 +1210,11 @@ class AnalizadorSaludMentalIA:
             
             # INSIGHTS GENERADOS POR IA
             'insights_ia': {
-                'tipo': 'GENERADO_POR_IA',
-                'fuente': 'Análisis OpenAI GPT-4o',
+                'tipo': 'PLANTILLA' if self.modelo_ia == MODELO_PLANTILLA else 'GENERADO_POR_IA',
+                'fuente': (
+                    'Plantilla a partir de los datos empíricos' if self.modelo_ia == MODELO_PLANTILLA
+                    else f'Análisis OpenAI {self.modelo_ia}'
+                ),
                 'contenido': self.insights_ia,
                 'visualizacion': {
                     'color': '#A23B72',  # Morado para IA
@@ -477,14 +1222,24 @@ class AnalizadorSaludMentalIA:
                 }
             },
             
-            # DATOS PARA GRÁFICOS
-            'datos_visualizacion': {
+            # DATOS PARA GRÁFICOS (reducidos al presupuesto de puntos de cada gráfica)
+            'datos_visualizacion': reducir_visualizacion({
                 'distribucion_edad': self._preparar_datos_edad(),
                 'distribucion_sexo': self._preparar_datos_sexo(),
-                'tasas_prevalencia': self._preparar_tasas_prevalencia()
-            }
+                'serie_ingresos': self._preparar_serie_ingresos(),
+                'tasas_prevalencia': self._preparar_tasas_prevalencia(),
+                'cubo': self._preparar_cubo()
+            }, self.presupuesto_puntos)
         }
         
+        if not incluir_insights:
+            informe['insights_ia'] = {
+                'tipo': 'PENDIENTE',
+                'fuente': 'Consulta a la IA en curso',
+                'contenido': {},
+                'visualizacion': informe['insights_ia']['visualizacion']
+            }
+        
         print("✅ Informe generado correctamente")
         return informe
     
@@ -508,10 +1263,39 @@ class AnalizadorSaludMentalIA:
                 'sexo': sexo,
                 'total': info['total'],
                 'casos': info['casos_esquizofrenia'],
-                'tasa': info['tasa']
+                'tasa': info['tasa'],
+                'edad_media': info['edad_media']
             })
         return datos
     
+    def _preparar_serie_ingresos(self):
+        """
+        Ingresos por día (solo si se cargaron las filas con fecha de ingreso).
+        
+        Tras una carga incremental self.df solo tiene las filas nuevas: la
+        serie sale de los conteos acumulados (self.ingresos_diarios).
+        """
+        if self.ingresos_diarios is not None:
+            dias = self.ingresos_diarios
+        elif self.df is None or 'FECHA_INGRESO' not in self.df.columns:
+            return []
+        else:
+            dias = contar_ingresos_diarios(self.df, 'FECHA_INGRESO')
+        if dias.empty:
+            return []
+        dias = dias.reindex(pd.date_range(dias.index[0], dias.index[-1], freq='D'), fill_value=0)
+        return [
+            {'fecha': fecha.strftime('%Y-%m-%d'), 'casos': int(casos)}
+            for fecha, casos in dias.items()
+        ]
+    
+    def _preparar_cubo(self):
+        """Cubo compacto (typed arrays) para el filtro cruzado del dashboard."""
+        if self.cubo is None:
+            return None
+        factor = 100 / self.muestra['porcentaje'] if self.muestra is not None else 1.0
+        return self.cubo.a_compacto(['edad'], factor)
+    
     def _preparar_tasas_prevalencia(self):
         """Prepara datos de tasas de prevalencia."""
         return {
@@ -522,9 +1306,17 @@ class AnalizadorSaludMentalIA:
             )
         }
     
-    def guardar_informe(self, nombre_archivo: str = 'informe_completo.json'):
-        """Guarda el informe en un archivo JSON."""
-        informe = self.generar_informe_completo()
+    def guardar_informe(self, nombre_archivo: str = 'informe_completo.json',
+                        informe: Dict[str, Any] = None):
+        """
+        Guarda el informe en un archivo JSON.
+        
+        Args:
+            nombre_archivo: Ruta del archivo de salida
+            informe: (Opcional) Informe ya generado; si no se pasa se genera
+        """
+        if informe is None:
+            informe = self.generar_informe_completo()
         
         with open(nombre_archivo, 'w', encoding='utf-8') as f:
             json.dump(informe, f, indent=2, ensure_ascii=False)
@@ -532,41 +1324,183 @@ class AnalizadorSaludMentalIA:
         print(f"\n💾 Informe guardado en: {nombre_archivo}")
     
     def cerrar_conexion(self):
-        """Cierra la conexión con Oracle DB."""
+        """Cierra la conexión con Oracle DB (y el pool, si se creó)."""
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
         if self.connection:
             self.connection.close()
             print("\n🔌 Conexión a Oracle cerrada")
+        if self.registrador is not None:
+            self.registrador.cerrar()
+    
+    def ejecutar_analisis_solapado(self, ruta_dashboard: str = OUTPUT_HTML_FILE,
+                                   nombre_informe: str = 'informe_completo.json',
+                                   filtro_edad: int = 20, paquete: PaqueteDashboard = None):
+        """
+        Pipeline completo con la consulta a la IA solapada con el dashboard.
+        
+        En cuanto están las estadísticas (y el prompt) la consulta a la IA
+        se lanza en segundo plano y, mientras tanto, se escribe un dashboard
+        parcial con los datos empíricos y las gráficas, que se recarga solo.
+        Al resolverse los insights se escribe el informe y el dashboard
+        final. El prompt depende de las estadísticas, así que lo que se
+        solapa con la IA es todo lo posterior: desde ese punto se tarda
+        max(IA, render) en lugar de la suma.
+        
+        Args:
+            ruta_dashboard: HTML del dashboard (parcial y luego final)
+            nombre_informe: JSON del informe final
+            filtro_edad: Edad máxima de la cohorte
+            paquete: (Opcional) render_json_html.PaqueteDashboard para un
+                dashboard que no depende del CDN
+        """
+        print("=" * 70)
+        print("🏆 ANÁLISIS DE SALUD MENTAL CON IA - PREMIO INDRA (SOLAPADO)")
+        print("=" * 70)
+        
+        inicio = time.perf_counter()
+        renderizador = None  # Con renderizador ya hay un dashboard parcial en disco
+        try:
+            self.cargar_datos(filtro_edad=filtro_edad)
+            self.calcular_estadisticas()
+            prompt = self.construir_prompt()
+            fin_datos = time.perf_counter()
+            
+            # El dashboard final reutiliza las secciones empíricas del parcial
+            renderizador = RenderIncremental(paquete=paquete)
+            with ThreadPoolExecutor(max_workers=1, thread_name_prefix='insights-ia') as ejecutor:
+                futuro = ejecutor.submit(lambda: self.procesar_respuesta_ia(self.consultar_ia(prompt)))
+                
+                # Dashboard parcial mientras la IA responde
+                guardar_dashboard(
+                    self.generar_informe_completo(incluir_insights=False), ruta_dashboard, renderizador, paquete
+                )
+                print(f"🖼️ Dashboard parcial (datos empíricos) en {ruta_dashboard} "
+                      f"a los {time.perf_counter() - inicio:.1f} s")
+                
+                futuro.result()
+            fin_ia = time.perf_counter()
+            
+            informe = self.generar_informe_completo()
+            self.guardar_informe(nombre_informe, informe)
+            guardar_dashboard(informe, ruta_dashboard, renderizador, paquete)
+            print(f"🖼️ Dashboard final en {ruta_dashboard} "
+                  f"(secciones regeneradas: {', '.join(renderizador.ultimo['generadas'])})")
+            
+            self.cerrar_conexion()
+            
+            print("\n" + "=" * 70)
+            print(f"✅ ANÁLISIS COMPLETADO EN {time.perf_counter() - inicio:.1f} s "
+                  f"(datos {fin_datos - inicio:.1f} s, IA {fin_ia - fin_datos:.1f} s)")
+            print("=" * 70)
+            
+            return informe
+            
+        except Exception as e:
+            print(f"\n❌ Error en el análisis: {e}")
+            self.cerrar_conexion()
+            if renderizador is not None:
+                self._cerrar_dashboard_parcial(ruta_dashboard, renderizador, paquete)
+            raise
     
-    def ejecutar_analisis_completo(self):
+    def _cerrar_dashboard_parcial(self, ruta_dashboard: str, renderizador: RenderIncremental,
+                                  paquete: PaqueteDashboard = None):
+        """
+        Sustituye el dashboard parcial (que se recarga esperando a la IA) por
+        uno final con los insights de plantilla tras un fallo.
+        """
+        try:
+            self.insights_ia = insights_plantilla(self.datos_empiricos)
+            self.modelo_ia = MODELO_PLANTILLA
+            guardar_dashboard(self.generar_informe_completo(), ruta_dashboard, renderizador, paquete)
+            print(f"📝 Dashboard {ruta_dashboard} cerrado con insights de plantilla")
+        except Exception as e:
+            print(f"⚠️ No se pudo reescribir el dashboard parcial: {e}")
+    
+    def ejecutar_analisis_completo(self, directorio_ejecucion: str = None):
         """
         Ejecuta el pipeline completo de análisis.
         Método principal para usar en la hackathon.
+        
+        Args:
+            directorio_ejecucion: (Opcional) Carpeta donde se guarda cada etapa
+                con su hash. Si la ejecución falla, al relanzar con la misma
+                carpeta se reanuda desde la última etapa correcta.
         """
         print("=" * 70)
         print("🏆 ANÁLISIS DE SALUD MENTAL CON IA - PREMIO INDRA")
         print("=" * 70)
         
+        ejecucion = EjecucionReanudable(directorio_ejecucion)
+        
         try:
             # 1. Cargar datos desde Oracle
-            self.cargar_datos(filtro_edad=20)
+            parametros_carga = {
+                'filtro_edad': 20,
+                'query': self._construir_query(filtro_edad=20),
+                'backend': self.backend.nombre,
+                'resumen': self.resumen
+            }
+            _, hash_carga = ejecucion.etapa(
+                'carga', hash_parametros(parametros_carga),
+                lambda: self.cargar_datos(filtro_edad=20),
+                lambda _: pickle.dumps({
+                    'df': self.df, 'filas_resumen': self.filas_resumen, 'fecha_resumen': self.fecha_resumen
+                }),
+                self._restaurar_carga,
+                extension='pkl'
+            )
             
             # 2. Calcular estadísticas
-            self.calcular_estadisticas()
+            _, hash_estadisticas = ejecucion.etapa(
+                'estadisticas', hash_carga,
+                self.calcular_estadisticas,
+                lambda _: self._serializar_estadisticas(),
+                self._restaurar_estadisticas
+            )
             
             # 3. Construir prompt
-            prompt = self.construir_prompt()
+            prompt, hash_prompt = ejecucion.etapa(
+                'prompt', hash_estadisticas,
+                self.construir_prompt,
+                lambda texto: texto.encode('utf-8'),
+                lambda datos: datos.decode('utf-8'),
+                extension='txt'
+            )
             
             # 4. Consultar IA
-            respuesta = self.consultar_ia(prompt)
+            modelos = [m['modelo'] for m in self.consultor.modelos] if self.consultor else ['gpt-4o']
+            respuesta, hash_respuesta = ejecucion.etapa(
+                'respuesta_ia', hash_parametros({'prompt': hash_prompt, 'modelo': modelos}),
+                lambda: self.consultar_ia(prompt),
+                lambda texto: json.dumps(
+                    {'respuesta': texto, 'modelo': self.modelo_ia}, ensure_ascii=False
+                ).encode('utf-8'),
+                self._restaurar_respuesta
+            )
+            # Caché y plantilla son recursos de emergencia: al reanudar se vuelve a intentar con la IA
+            if self.respuesta_de_respaldo:
+                ejecucion.invalidar('respuesta_ia')
             
             # 5. Procesar respuesta
-            self.procesar_respuesta_ia(respuesta)
+            _, hash_insights = ejecucion.etapa(
+                'insights', hash_respuesta,
+                lambda: self.procesar_respuesta_ia(respuesta),
+                lambda insights: json.dumps(insights, ensure_ascii=False).encode('utf-8'),
+                self._restaurar_insights
+            )
             
             # 6. Generar informe
-            informe = self.generar_informe_completo()
+            informe, _ = ejecucion.etapa(
+                'informe', hash_parametros({'estadisticas': hash_estadisticas, 'insights': hash_insights}),
+                self.generar_informe_completo,
+                lambda informe: json.dumps(informe, indent=2, ensure_ascii=False).encode('utf-8'),
+                lambda datos: json.loads(datos.decode('utf-8'))
+            )
             
             # 7. Guardar informe
-            self.guardar_informe()
+            self.guardar_informe(informe=informe)
             
             # 8. Cerrar conexión
             self.cerrar_conexion()
@@ -579,9 +1513,55 @@ class AnalizadorSaludMentalIA:
             
         except Exception as e:
             print(f"\n❌ Error en el análisis: {e}")
+            if directorio_ejecucion:
+                print(f"♻️ Relanza con directorio_ejecucion='{directorio_ejecucion}' para reanudar")
             # Cerrar conexión en caso de error
             self.cerrar_conexion()
             raise
+    
+    def _restaurar_carga(self, datos: bytes):
+        """Restaura self.df (o las filas del resumen) desde el checkpoint de carga."""
+        carga = pickle.loads(datos)
+        self.df = carga['df']
+        self.filas_resumen = carga['filas_resumen']
+        self.fecha_resumen = carga['fecha_resumen']
+        if self.df is not None:
+            print(f"✅ Datos restaurados: {len(self.df)} registros")
+            return self.df
+        print(f"✅ Resumen restaurado: {len(self.filas_resumen)} filas")
+        return self.filas_resumen
+    
+    def _serializar_estadisticas(self) -> bytes:
+        """Serializa los datos empíricos y los agregados para el checkpoint."""
+        return json.dumps({
+            'datos_empiricos': self.datos_empiricos,
+            'cubo': self.cubo.a_dict(),
+            'correlacion': self.correlacion.a_dict() if self.correlacion else None
+        }, ensure_ascii=False).encode('utf-8')
+    
+    def _restaurar_estadisticas(self, datos: bytes):
+        """Restaura datos empíricos, cubo y correlaciones desde el checkpoint."""
+        estado = json.loads(datos.decode('utf-8'))
+        self.datos_empiricos = estado['datos_empiricos']
+        self.cubo = CuboAgregacion.desde_dict(estado['cubo'])
+        self.correlacion = (
+            AcumuladorCorrelacion.desde_dict(estado['correlacion'])
+            if estado['correlacion'] else None
+        )
+        return self.datos_empiricos
+    
+    def _restaurar_respuesta(self, datos: bytes):
+        """Restaura la respuesta de la IA (y el modelo que la dio) desde el checkpoint."""
+        estado = json.loads(datos.decode('utf-8'))
+        self.modelo_ia = estado['modelo']
+        if self.telemetria is not None:
+            self.telemetria.registrar_cache(True, 'respuesta_ia', estado['modelo'])
+        return estado['respuesta']
+    
+    def _restaurar_insights(self, datos: bytes):
+        """Restaura los insights de la IA desde el checkpoint."""
+        self.insights_ia = json.loads(datos.decode('utf-8'))
+        return self.insights_ia
 
 
 # ============================================================================
@@ -0,0 +1,93 @@
+from typing import Dict, Any
+
+
+# Identificador que aparece como modelo en el informe cuando no hay IA
+MODELO_PLANTILLA = 'plantilla (sin IA)'
+
+
+def _porcentaje(parte: float, total: float) -> float:
+    return 100.0 * parte / total if total else 0.0
+
+
+def insights_plantilla(datos_empiricos: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Insights deterministas construidos solo con los datos empíricos.
+
+    Tienen la misma estructura que la respuesta de la IA, así que el resto
+    del pipeline (informe, dashboard) no distingue el origen. Se usan cuando
+    ningún modelo responde a tiempo o se agota el presupuesto.
+    """
+    total = datos_empiricos['total_pacientes']
+    sexos = sorted(datos_empiricos['distribucion_sexo'].items(), key=lambda par: par[1], reverse=True)
+    edades = datos_empiricos['distribucion_edad']
+    por_sexo = datos_empiricos['esquizofrenia_por_sexo']
+    rango_mayor = max(edades.items(), key=lambda par: par[1]['total']) if edades else None
+
+    patrones = [
+        f"{total} casos diagnosticados con edad media de {datos_empiricos['edad_media']:.1f} años "
+        f"(σ = {datos_empiricos['edad_std']:.1f}, rango {datos_empiricos['edad_min']}-{datos_empiricos['edad_max']})"
+    ]
+    if sexos:
+        sexo, casos = sexos[0]
+        patrones.append(f"El sexo {sexo} concentra {casos} casos ({_porcentaje(casos, total):.1f}%)")
+    if rango_mayor:
+        rango, datos = rango_mayor
+        patrones.append(
+            f"El grupo de {rango} es el más numeroso: {datos['total']} casos "
+            f"({_porcentaje(datos['total'], total):.1f}%)"
+        )
+
+    comparacion_edad = '; '.join(
+        f"{rango}: {datos['total']} casos ({_porcentaje(datos['total'], total):.1f}%)"
+        for rango, datos in edades.items()
+    )
+    comparacion_sexo = '; '.join(
+        f"{sexo}: {datos['total']} casos, edad media {datos['edad_media']:.1f} años"
+        for sexo, datos in por_sexo.items()
+    )
+
+    pronostico = datos_empiricos.get('pronostico_6_meses')
+    if pronostico:
+        total_pronostico = pronostico['total']
+        proyeccion = {
+            'nuevos_casos_estimados': int(total_pronostico['nuevos_casos_estimados']),
+            'tasa_crecimiento': float(total_pronostico['tasa_crecimiento']),
+            'confianza': total_pronostico['confianza'],
+            'justificacion': (
+                f"Pronóstico estadístico ({total_pronostico['modelo']}) sobre "
+                f"{total_pronostico['meses_observados']} meses de incidencia observada"
+            )
+        }
+    else:
+        proyeccion = {
+            'nuevos_casos_estimados': 0,
+            'tasa_crecimiento': 0.0,
+            'confianza': 'baja',
+            'justificacion': 'Sin fechas de ingreso no es posible proyectar la incidencia'
+        }
+
+    prioritarios = []
+    if rango_mayor:
+        prioritarios.append(f"Pacientes de {rango_mayor[0]} ({rango_mayor[1]['total']} casos)")
+    if sexos:
+        prioritarios.append(f"Sexo {sexos[0][0]} ({sexos[0][1]} casos)")
+
+    return {
+        'patrones_demograficos': patrones,
+        'factores_asociados': [
+            "La edad y el sexo son las únicas variables disponibles; no se infieren factores causales"
+        ],
+        'analisis_comparativo': {
+            'por_edad': comparacion_edad,
+            'por_sexo': comparacion_sexo
+        },
+        'proyeccion_6_meses': proyeccion,
+        'recomendaciones': [
+            "Priorizar el seguimiento de los grupos con más casos",
+            "Revisar estos insights cuando el análisis con IA esté disponible"
+        ],
+        'grupos_prioritarios': prioritarios,
+        'insights_adicionales': [
+            "Insights generados automáticamente a partir de los datos empíricos (sin IA)"
+        ]
+    }
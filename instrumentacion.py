@@ -0,0 +1,389 @@
+import json
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List
+
+
+# Plan real de la última sentencia de la sesión (con estadísticas si la
+# consulta se ejecutó con GATHER_PLAN_STATISTICS o STATISTICS_LEVEL=ALL)
+QUERY_PLAN_ORACLE = "SELECT PLAN_TABLE_OUTPUT FROM TABLE(DBMS_XPLAN.DISPLAY_CURSOR(NULL, NULL, 'ALLSTATS LAST'))"
+
+# Filas usadas para estimar los bytes de cada fetch
+FILAS_MUESTRA_BYTES = 1000
+
+
+def hash_sql(sql: str) -> str:
+    """Hash corto del texto SQL normalizado (espacios colapsados)."""
+    normalizado = re.sub(r'\s+', ' ', sql).strip()
+    return hashlib.sha1(normalizado.encode('utf-8')).hexdigest()[:16]
+
+
+def _bytes_valor(valor) -> int:
+    """Tamaño aproximado de un valor tal y como viaja por la red."""
+    if valor is None:
+        return 1
+    if isinstance(valor, str):
+        return len(valor.encode('utf-8'))
+    if isinstance(valor, (bytes, bytearray)):
+        return len(valor)
+    return 8
+
+
+def _estimar_bytes(filas: list) -> int:
+    """Bytes de un lote de filas, extrapolados desde una muestra."""
+    if not filas:
+        return 0
+    muestra = filas[:FILAS_MUESTRA_BYTES]
+    bytes_muestra = sum(_bytes_valor(valor) for fila in muestra for valor in fila)
+    return int(bytes_muestra * len(filas) / len(muestra))
+
+
+class RegistradorConsultas:
+    """
+    Registra cada llamada a la base de datos en un log JSONL.
+
+    Por consulta se guarda el hash del SQL, los binds, los tiempos de
+    ejecución y de fetch, las filas y bytes leídos y los viajes de red
+    (estimados con arraysize; el parse de Oracle va incluido en la
+    ejecución). Las consultas se agrupan en operaciones (p.ej. 'carga') y
+    cada operación registra además el tiempo que no es de base de datos,
+    que es básicamente la construcción del DataFrame.
+
+    Funciona con cualquier conexión DB-API: con Oracle el plan se obtiene
+    con DBMS_XPLAN y con sqlite con EXPLAIN QUERY PLAN.
+    """
+
+    def __init__(self, ruta_log: str = 'consultas.jsonl', capturar_plan: bool = False):
+        """
+        Inicializa el registrador.
+
+        Args:
+            ruta_log: Archivo JSONL donde se añade un registro por consulta
+            capturar_plan: Si True adjunta el plan de ejecución a cada consulta
+        """
+        self.ruta_log = Path(ruta_log)
+        self.capturar_plan = capturar_plan
+        self.planes_pendientes = set()  # Hashes de SQL con plan pedido a demanda
+        self.registros = []
+        self._bloqueo = threading.Lock()
+        self._archivo = None  # Abierto en la primera escritura y reutilizado
+        # Compartida entre hilos: las particiones paralelas cuentan en la operación que las lanza
+        self._operacion = None
+
+    # ------------------------------------------------------------------
+    # Envoltorios
+    # ------------------------------------------------------------------
+
+    def conectar(self, conectar, **contexto):
+        """Abre una conexión midiendo el tiempo y la devuelve instrumentada."""
+        inicio = time.perf_counter()
+        conexion = conectar()
+        self.escribir({
+            'tipo': 'conexion',
+            'operacion': self._operacion_actual(),
+            'conexion_s': round(time.perf_counter() - inicio, 6),
+            **contexto
+        })
+        return self.envolver(conexion)
+
+    def envolver(self, conexion):
+        """Devuelve la conexión instrumentada (idempotente)."""
+        if isinstance(conexion, ConexionInstrumentada):
+            return conexion
+        return ConexionInstrumentada(conexion, self)
+
+    def envolver_pool(self, pool):
+        """Devuelve el pool con sus sesiones instrumentadas."""
+        if isinstance(pool, PoolInstrumentado):
+            return pool
+        return PoolInstrumentado(pool, self)
+
+    def pedir_plan(self, sql: str):
+        """Pide el plan de ejecución de una consulta la próxima vez que se ejecute."""
+        self.planes_pendientes.add(hash_sql(sql))
+
+    # ------------------------------------------------------------------
+    # Operaciones y escritura
+    # ------------------------------------------------------------------
+
+    def _operacion_actual(self):
+        return self._operacion
+
+    @contextmanager
+    def operacion(self, nombre: str, **contexto):
+        """
+        Agrupa las consultas de un bloque y registra su tiempo total.
+
+        El tiempo total menos el de ejecución y fetch de sus consultas es el
+        tiempo del cliente (construcción del DataFrame, conversión de tipos...).
+        """
+        anterior = self._operacion
+        self._operacion = nombre
+        desde = len(self.registros)
+        inicio = time.perf_counter()
+        try:
+            yield self
+        finally:
+            total = time.perf_counter() - inicio
+            self._operacion = anterior
+            with self._bloqueo:
+                consultas = [
+                    r for r in self.registros[desde:]
+                    if r['tipo'] == 'consulta' and r['operacion'] == nombre
+                ]
+            base_datos = sum(r['ejecucion_s'] + r['fetch_s'] for r in consultas)
+            self.escribir({
+                'tipo': 'operacion',
+                'operacion': nombre,
+                'total_s': round(total, 6),
+                'base_datos_s': round(base_datos, 6),
+                'cliente_s': round(max(total - base_datos, 0.0), 6),
+                'consultas': len(consultas),
+                'filas': sum(r['filas'] for r in consultas),
+                'bytes': sum(r['bytes'] for r in consultas),
+                'viajes_red': sum(r['viajes_red'] for r in consultas),
+                **contexto
+            })
+
+    def escribir(self, registro: Dict[str, Any]):
+        """Añade un registro al log (seguro entre hilos)."""
+        registro = {'marca_tiempo': datetime.now().isoformat(timespec='milliseconds'), **registro}
+        linea = json.dumps(registro, ensure_ascii=False, default=str)
+        with self._bloqueo:
+            self.registros.append(registro)
+            if self._archivo is None:
+                self.ruta_log.parent.mkdir(parents=True, exist_ok=True)
+                # Con búfer de línea: cada registro llega al disco sin reabrir el archivo
+                self._archivo = open(self.ruta_log, 'a', encoding='utf-8', buffering=1)
+            self._archivo.write(linea + '\n')
+
+    def cerrar(self):
+        """Cierra el log (una escritura posterior lo vuelve a abrir)."""
+        with self._bloqueo:
+            if self._archivo is not None:
+                self._archivo.close()
+                self._archivo = None
+
+    def resumen(self) -> List[Dict[str, Any]]:
+        """Totales por hash de SQL, ordenados por tiempo de base de datos."""
+        por_sql = {}
+        for registro in self.registros:
+            if registro['tipo'] != 'consulta':
+                continue
+            acumulado = por_sql.setdefault(registro['sql_hash'], {
+                'sql_hash': registro['sql_hash'],
+                'sql': registro['sql'][:120],
+                'ejecuciones': 0, 'ejecucion_s': 0.0, 'fetch_s': 0.0,
+                'filas': 0, 'bytes': 0, 'viajes_red': 0
+            })
+            acumulado['ejecuciones'] += 1
+            for clave in ('ejecucion_s', 'fetch_s', 'filas', 'bytes', 'viajes_red'):
+                acumulado[clave] += registro[clave]
+        return sorted(
+            por_sql.values(), key=lambda r: r['ejecucion_s'] + r['fetch_s'], reverse=True
+        )
+
+    # ------------------------------------------------------------------
+    # Planes de ejecución
+    # ------------------------------------------------------------------
+
+    def plan(self, conexion, sql: str, binds: Dict[str, Any] = None) -> List[str]:
+        """
+        Plan de ejecución de la última consulta de la sesión.
+
+        Con Oracle lee DBMS_XPLAN.DISPLAY_CURSOR; con sqlite (base de datos
+        local de pruebas) usa EXPLAIN QUERY PLAN sobre el SQL y sus binds.
+        """
+        cursor = conexion.cursor()
+        try:
+            if isinstance(conexion, sqlite3.Connection):
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}", binds or {})
+                return [' '.join(str(valor) for valor in fila) for fila in cursor.fetchall()]
+            cursor.execute(QUERY_PLAN_ORACLE)
+            return [fila[0] for fila in cursor.fetchall()]
+        except Exception as e:
+            return [f"Plan no disponible: {e}"]
+        finally:
+            cursor.close()
+
+
+class CursorInstrumentado:
+    """Cursor que mide execute y fetch y registra la consulta al terminar de leerla."""
+
+    def __init__(self, cursor, conexion: 'ConexionInstrumentada'):
+        self._cursor = cursor
+        self._conexion = conexion
+        self._registro = None
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+    def __setattr__(self, nombre, valor):
+        # arraysize, prefetchrows... van al cursor real
+        if nombre.startswith('_'):
+            object.__setattr__(self, nombre, valor)
+        else:
+            setattr(self._cursor, nombre, valor)
+
+    def __iter__(self):
+        while True:
+            filas = self.fetchmany()
+            if not filas:
+                return
+            yield from filas
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def execute(self, sql, parametros=None, **binds):
+        self._finalizar()
+        registrador = self._conexion._registrador
+        inicio = time.perf_counter()
+        if parametros is not None:
+            resultado = self._cursor.execute(sql, parametros, **binds)
+        else:
+            resultado = self._cursor.execute(sql, **binds)
+        ejecucion = time.perf_counter() - inicio
+
+        self._registro = {
+            'tipo': 'consulta',
+            'operacion': registrador._operacion_actual(),
+            'sql_hash': hash_sql(sql),
+            'sql': sql.strip(),
+            'binds': parametros if parametros is not None else (binds or None),
+            'ejecucion_s': ejecucion,
+            'fetch_s': 0.0,
+            'filas': 0,
+            'bytes': 0,
+            # El execute ya trae las primeras filas (prefetch) en el mismo viaje
+            'viajes_red': 1,
+            'arraysize': getattr(self._cursor, 'arraysize', None)
+        }
+        return self if resultado is self._cursor else resultado
+
+    def _fetch(self, metodo: str, *args):
+        inicio = time.perf_counter()
+        resultado = getattr(self._cursor, metodo)(*args)
+        segundos = time.perf_counter() - inicio
+        if self._registro is None:
+            return resultado
+
+        filas = [resultado] if metodo == 'fetchone' and resultado is not None else (
+            [] if resultado is None else resultado
+        )
+        registro = self._registro
+        registro['fetch_s'] += segundos
+        registro['filas'] += len(filas)
+        registro['bytes'] += _estimar_bytes(filas)
+        arraysize = registro['arraysize']
+        if arraysize:
+            registro['viajes_red'] += -(-len(filas) // arraysize)
+        elif filas:
+            # Motores en proceso sin arraysize: una llamada = un lote
+            registro['viajes_red'] += 1
+
+        # Lectura terminada: cursor agotado
+        if metodo == 'fetchall' or not filas or (
+                metodo == 'fetchmany' and len(filas) < (args[0] if args else (arraysize or 1))):
+            self._finalizar()
+        return resultado
+
+    def fetchone(self):
+        return self._fetch('fetchone')
+
+    def fetchmany(self, *args):
+        return self._fetch('fetchmany', *args)
+
+    def fetchall(self):
+        return self._fetch('fetchall')
+
+    def _finalizar(self):
+        """Escribe el registro de la consulta en curso (con plan si se pidió)."""
+        registro, self._registro = self._registro, None
+        if registro is None:
+            return
+        registrador = self._conexion._registrador
+        if registrador.capturar_plan or registro['sql_hash'] in registrador.planes_pendientes:
+            registrador.planes_pendientes.discard(registro['sql_hash'])
+            registro['plan'] = registrador.plan(self._conexion._conexion, registro['sql'], registro['binds'])
+        registro['ejecucion_s'] = round(registro['ejecucion_s'], 6)
+        registro['fetch_s'] = round(registro['fetch_s'], 6)
+        registrador.escribir(registro)
+
+    def close(self):
+        self._finalizar()
+        self._cursor.close()
+
+
+class ConexionInstrumentada:
+    """Conexión que devuelve cursores instrumentados y delega todo lo demás."""
+
+    def __init__(self, conexion, registrador: RegistradorConsultas):
+        self._conexion = conexion
+        self._registrador = registrador
+
+    def __getattr__(self, nombre):
+        return getattr(self._conexion, nombre)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return self._conexion.__exit__(*args)
+
+    def cursor(self, *args, **kwargs):
+        return CursorInstrumentado(self._conexion.cursor(*args, **kwargs), self)
+
+    def fetch_df_all(self, statement, parameters=None, arraysize=None, **kwargs):
+        """Lectura directa a DataFrame de oracledb (execute y fetch juntos)."""
+        inicio = time.perf_counter()
+        odf = self._conexion.fetch_df_all(
+            statement=statement, parameters=parameters, arraysize=arraysize, **kwargs
+        )
+        filas = odf.num_rows() if callable(getattr(odf, 'num_rows', None)) else 0
+        self._registrador.escribir({
+            'tipo': 'consulta',
+            'operacion': self._registrador._operacion_actual(),
+            'sql_hash': hash_sql(statement),
+            'sql': statement.strip(),
+            'binds': parameters,
+            'ejecucion_s': 0.0,
+            'fetch_s': round(time.perf_counter() - inicio, 6),
+            'filas': filas,
+            'bytes': 0,
+            'viajes_red': 1 + -(-filas // (arraysize or 1)),
+            'arraysize': arraysize
+        })
+        return odf
+
+
+class PoolInstrumentado:
+    """Pool cuyas sesiones se entregan instrumentadas."""
+
+    def __init__(self, pool, registrador: RegistradorConsultas):
+        self._pool = pool
+        self._registrador = registrador
+
+    def __getattr__(self, nombre):
+        return getattr(self._pool, nombre)
+
+    @contextmanager
+    def acquire(self, *args, **kwargs):
+        inicio = time.perf_counter()
+        with self._pool.acquire(*args, **kwargs) as conexion:
+            self._registrador.escribir({
+                'tipo': 'conexion',
+                'operacion': self._registrador._operacion_actual(),
+                'conexion_s': round(time.perf_counter() - inicio, 6),
+                'origen': 'pool'
+            })
+            yield ConexionInstrumentada(conexion, self._registrador)
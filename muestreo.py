@@ -0,0 +1,106 @@
+import numpy as np
+from typing import Dict, Any
+from agregaciones import CuboAgregacion
+from pronostico import cuantil_normal
+
+
+# ============================================================================
+# INTERVALOS DE CONFIANZA PARA MUESTRAS DE ORACLE (SAMPLE / SAMPLE BLOCK)
+# ============================================================================
+
+def ic_total(n: int, fraccion: float, z: float, efecto_diseno: float = 1.0) -> Dict[str, float]:
+    """
+    Total estimado N = n / f con muestreo de Bernoulli.
+
+    Var(N) = n (1 - f) / f^2, inflada por el efecto de diseño (SAMPLE BLOCK
+    agrupa filas del mismo bloque y subestima la varianza si no se corrige).
+    """
+    estimacion = n / fraccion
+    error = z * np.sqrt(efecto_diseno * n * (1 - fraccion)) / fraccion
+    return {
+        'estimacion': round(float(estimacion), 1),
+        'inferior': round(float(max(estimacion - error, n)), 1),
+        'superior': round(float(estimacion + error), 1)
+    }
+
+
+def ic_media(media: float, std: float, n: int, fraccion: float, z: float,
+             efecto_diseno: float = 1.0) -> Dict[str, float]:
+    """Media con corrección por población finita."""
+    if n < 2 or np.isnan(std):
+        return {'estimacion': float(media), 'inferior': float('nan'), 'superior': float('nan')}
+    error = z * std * np.sqrt(efecto_diseno * (1 - fraccion) / n)
+    return {
+        'estimacion': float(media),
+        'inferior': float(media - error),
+        'superior': float(media + error)
+    }
+
+
+def ic_desviacion(std: float, n: int, z: float) -> Dict[str, float]:
+    """Desviación típica (aproximación normal de la chi-cuadrado)."""
+    if n < 3 or np.isnan(std):
+        return {'estimacion': float(std), 'inferior': float('nan'), 'superior': float('nan')}
+    relativo = z / np.sqrt(2 * (n - 1))
+    return {
+        'estimacion': float(std),
+        'inferior': float(std * max(1 - relativo, 0)),
+        'superior': float(std * (1 + relativo))
+    }
+
+
+def ic_proporcion(k: int, n: int, z: float) -> Dict[str, float]:
+    """Porcentaje con intervalo de Wilson."""
+    if n == 0:
+        return {'estimacion': float('nan'), 'inferior': float('nan'), 'superior': float('nan')}
+    p = k / n
+    denominador = 1 + z ** 2 / n
+    centro = (p + z ** 2 / (2 * n)) / denominador
+    error = z * np.sqrt(p * (1 - p) / n + z ** 2 / (4 * n ** 2)) / denominador
+    return {
+        'estimacion': round(100 * p, 2),
+        'inferior': round(100 * max(centro - error, 0), 2),
+        'superior': round(100 * min(centro + error, 1), 2)
+    }
+
+
+def intervalos_confianza(cubo: CuboAgregacion, fraccion: float, nivel: float = 0.95,
+                         efecto_diseno: float = 1.0) -> Dict[str, Any]:
+    """
+    Intervalos de confianza de todas las cifras que muestra el dashboard.
+
+    Args:
+        cubo: Cubo construido sobre la muestra (conteos sin escalar)
+        fraccion: Fracción muestreada (0-1]
+        nivel: Nivel de confianza (default: 0.95)
+        efecto_diseno: Factor de inflado de la varianza (>1 con SAMPLE BLOCK)
+    """
+    z = cuantil_normal(nivel)
+    total = cubo.total()
+    n = total['conteo']
+    edad = total['edad']
+
+    def por_grupo(dimension: str) -> Dict[str, Any]:
+        resultado = {}
+        for fila in cubo.tabla(dimension):
+            resultado[str(fila[dimension])] = {
+                'total': ic_total(fila['conteo'], fraccion, z, efecto_diseno),
+                'porcentaje': ic_proporcion(fila['conteo'], n, z),
+                'edad_media': ic_media(
+                    fila['edad']['media'], fila['edad']['std'], fila['edad']['n'],
+                    fraccion, z, efecto_diseno
+                )
+            }
+        return resultado
+
+    return {
+        'nivel': nivel,
+        'total_pacientes': ic_total(n, fraccion, z, efecto_diseno),
+        'edad_media': ic_media(edad['media'], edad['std'], edad['n'], fraccion, z, efecto_diseno),
+        'edad_std': ic_desviacion(edad['std'], edad['n'], z),
+        # El mínimo y el máximo de una muestra solo acotan los reales
+        'edad_min': {'estimacion': edad['min'], 'nota': 'cota superior del mínimo real'},
+        'edad_max': {'estimacion': edad['max'], 'nota': 'cota inferior del máximo real'},
+        'distribucion_sexo': por_grupo('sexo'),
+        'distribucion_edad': por_grupo('rango_edad')
+    }
@@ -0,0 +1,350 @@
+import pandas as pd
+import numpy as np
+from statistics import NormalDist
+from typing import Dict, List, Any
+
+
+MODELOS = ['naive_estacional', 'suavizado_exponencial', 'poisson_glm']
+
+
+def cuantil_normal(nivel: float) -> float:
+    """z del intervalo bilateral de nivel dado (p.ej. 0.95 -> 1.96)."""
+    if not 0 < nivel < 1:
+        raise ValueError(f"El nivel del intervalo debe estar en (0, 1): {nivel}")
+    return NormalDist().inv_cdf(0.5 + nivel / 2)
+
+
+# ============================================================================
+# SERIES MENSUALES DE INCIDENCIA
+# ============================================================================
+
+def contar_ingresos(df: pd.DataFrame, columna_fecha: str,
+                    columnas_cohorte: List[str] = None):
+    """
+    Cuenta ingresos por subcohorte y mes.
+
+    El resultado es pequeño (subcohortes x meses) y se puede combinar entre
+    lotes con combinar_conteos, así que no hace falta conservar las filas.
+
+    Returns:
+        (conteos, fecha_maxima) con conteos = DataFrame [columnas..., MES, CASOS]
+    """
+    columnas = [col for col in (columnas_cohorte or []) if col in df.columns]
+    fechas = pd.to_datetime(df[columna_fecha], errors='coerce')
+    validas = fechas.notna()
+
+    conteos = df.loc[validas, columnas].copy()
+    conteos['MES'] = (fechas[validas].dt.year * 12 + fechas[validas].dt.month - 1).astype(np.int64)
+    conteos = (
+        conteos.groupby(columnas + ['MES'], dropna=False, sort=False)
+        .size()
+        .rename('CASOS')
+        .reset_index()
+    )
+    return conteos, (fechas.max() if validas.any() else None)
+
+
+def contar_ingresos_diarios(df: pd.DataFrame, columna_fecha: str) -> pd.Series:
+    """Ingresos por día (índice de fechas ordenado; los días sin ingresos no aparecen)."""
+    fechas = pd.to_datetime(df[columna_fecha], errors='coerce').dropna()
+    return fechas.dt.floor('D').value_counts().sort_index()
+
+
+def combinar_conteos(a: pd.DataFrame, b: pd.DataFrame) -> pd.DataFrame:
+    """Suma dos tablas de conteos mensuales con las mismas columnas."""
+    claves = [col for col in a.columns if col != 'CASOS']
+    return (
+        pd.concat([a, b], ignore_index=True)
+        .groupby(claves, dropna=False, sort=False)['CASOS']
+        .sum()
+        .reset_index()
+    )
+
+
+def series_desde_conteos(conteos: pd.DataFrame, fecha_maxima,
+                         excluir_mes_incompleto: bool = True):
+    """
+    Construye la matriz de incidencia mensual (cohortes x meses).
+
+    La primera fila es siempre la serie total de la cohorte completa.
+
+    Args:
+        conteos: Tabla de contar_ingresos / combinar_conteos
+        fecha_maxima: Fecha de ingreso más reciente observada
+        excluir_mes_incompleto: Si True, descarta el último mes si no está cerrado
+
+    Returns:
+        (claves, meses, matriz) con matriz de forma (n_cohortes, n_meses)
+    """
+    if len(conteos) == 0:
+        return [], pd.PeriodIndex([], freq='M'), np.zeros((0, 0))
+
+    columnas = [col for col in conteos.columns if col not in ('MES', 'CASOS')]
+    mes = conteos['MES'].to_numpy(dtype=np.int64)
+    casos = conteos['CASOS'].to_numpy(dtype=float)
+    inicio = mes.min()
+    n_meses = int(mes.max() - inicio + 1)
+    t = mes - inicio
+
+    series = [np.bincount(t, weights=casos, minlength=n_meses)]
+    claves = ['total']
+
+    if columnas:
+        con_cohorte = conteos[columnas].notna().all(axis=1).to_numpy()
+        codigos, unicos = pd.MultiIndex.from_frame(conteos.loc[con_cohorte, columnas]).factorize()
+        matriz = np.bincount(
+            codigos * n_meses + t[con_cohorte],
+            weights=casos[con_cohorte],
+            minlength=len(unicos) * n_meses
+        ).reshape(len(unicos), n_meses)
+        series.extend(matriz)
+        claves.extend(
+            ' | '.join(f"{col}={valor}" for col, valor in zip(columnas, valores))
+            for valores in unicos
+        )
+
+    matriz = np.vstack(series).astype(float)
+    meses = pd.period_range(
+        start=pd.Period(year=int(inicio // 12), month=int(inicio % 12) + 1, freq='M'),
+        periods=n_meses,
+        freq='M'
+    )
+
+    ultima = pd.Timestamp(fecha_maxima)
+    if excluir_mes_incompleto and n_meses > 1 and ultima.day < ultima.days_in_month:
+        matriz, meses = matriz[:, :-1], meses[:-1]
+
+    return claves, meses, matriz
+
+
+def construir_series(df: pd.DataFrame, columna_fecha: str,
+                     columnas_cohorte: List[str] = None,
+                     excluir_mes_incompleto: bool = True):
+    """
+    Construye la matriz de incidencia mensual directamente desde las filas.
+
+    Args:
+        df: DataFrame con una fila por episodio
+        columna_fecha: Columna con la fecha de ingreso
+        columnas_cohorte: (Opcional) Columnas que definen las subcohortes
+        excluir_mes_incompleto: Si True, descarta el último mes si no está cerrado
+    """
+    conteos, fecha_maxima = contar_ingresos(df, columna_fecha, columnas_cohorte)
+    return series_desde_conteos(conteos, fecha_maxima, excluir_mes_incompleto)
+
+
+# ============================================================================
+# MODELOS VECTORIZADOS (todas las series a la vez)
+# ============================================================================
+
+def _naive_estacional(Y: np.ndarray, horizonte: int, periodo: int = 12):
+    """Repite el valor del mismo mes del año anterior (o el último si no hay un año)."""
+    n_series, n_meses = Y.shape
+    h = np.arange(1, horizonte + 1)
+    if n_meses >= periodo:
+        prediccion = Y[:, n_meses - periodo + (h - 1) % periodo]
+        residuos = Y[:, periodo:] - Y[:, :-periodo]
+        # Con horizonte <= periodo cada mes usa una observación distinta
+        # (más allá de un año es una aproximación)
+        factor = horizonte
+    else:
+        prediccion = np.repeat(Y[:, -1:], horizonte, axis=1)
+        residuos = np.diff(Y, axis=1)
+        # Paseo aleatorio: el error del mes h acumula h innovaciones
+        factor = float(np.sum(h[::-1] ** 2))
+
+    if residuos.shape[1] > 0:
+        sigma2 = np.mean(residuos ** 2, axis=1)
+    else:
+        sigma2 = Y.var(axis=1)
+    return prediccion, sigma2 * factor
+
+
+def _suavizado_exponencial(Y: np.ndarray, horizonte: int,
+                           alfas: np.ndarray = np.linspace(0.05, 0.95, 19)):
+    """ETS(A,N,N): elige alfa por serie minimizando el error a un paso."""
+    n_series, n_meses = Y.shape
+    nivel = np.repeat(Y[:, :1], len(alfas), axis=1)
+    sse = np.zeros((n_series, len(alfas)))
+    for t in range(1, n_meses):
+        error = Y[:, t:t + 1] - nivel
+        sse += error ** 2
+        nivel = nivel + alfas * error
+
+    mejor = np.argmin(sse, axis=1)
+    filas = np.arange(n_series)
+    alfa = alfas[mejor]
+    sigma2 = sse[filas, mejor] / max(n_meses - 1, 1)
+    prediccion = np.repeat(nivel[filas, mejor][:, None], horizonte, axis=1)
+
+    # El error de la suma de h pasos pondera la innovación j con 1 + alfa * (H - j)
+    j = np.arange(1, horizonte + 1)
+    coeficientes = 1 + alfa[:, None] * (horizonte - j)
+    return prediccion, sigma2 * np.sum(coeficientes ** 2, axis=1)
+
+
+def _disenio(t: np.ndarray, n_meses: int, mes_inicial: int, estacional: bool) -> np.ndarray:
+    """Matriz de diseño: intercepto, tendencia y (opcional) armónicos anuales."""
+    escala = (t - (n_meses - 1) / 2) / max(n_meses, 1)
+    columnas = [np.ones_like(escala), escala]
+    if estacional:
+        angulo = 2 * np.pi * (mes_inicial + t) / 12
+        columnas += [np.sin(angulo), np.cos(angulo)]
+    return np.column_stack(columnas)
+
+
+def _poisson_glm(Y: np.ndarray, horizonte: int, mes_inicial: int = 0,
+                 iteraciones: int = 25):
+    """GLM de Poisson log-lineal con tendencia, ajustado por IRLS en lote."""
+    n_series, n_meses = Y.shape
+    estacional = n_meses >= 24
+    t = np.arange(n_meses, dtype=float)
+    X = _disenio(t, n_meses, mes_inicial, estacional)
+    p = X.shape[1]
+
+    beta = np.zeros((n_series, p))
+    beta[:, 0] = np.log(Y.mean(axis=1) + 0.5)
+    regularizacion = 1e-6 * np.eye(p)
+
+    for _ in range(iteraciones):
+        eta = np.clip(beta @ X.T, -20, 20)
+        mu = np.exp(eta)
+        z = eta + (Y - mu) / mu
+        XtWX = np.einsum('tp,st,tq->spq', X, mu, X) + regularizacion
+        XtWz = np.einsum('tp,st->sp', X, mu * z)
+        beta = np.linalg.solve(XtWX, XtWz[..., None])[..., 0]
+
+    mu = np.exp(np.clip(beta @ X.T, -20, 20))
+    grados = max(n_meses - p, 1)
+    dispersion = np.maximum(np.sum((Y - mu) ** 2 / mu, axis=1) / grados, 1.0)
+
+    t_futuro = np.arange(n_meses, n_meses + horizonte, dtype=float)
+    X_futuro = _disenio(t_futuro, n_meses, mes_inicial, estacional)
+    prediccion = np.exp(np.clip(beta @ X_futuro.T, -20, 20))
+    return prediccion, dispersion * prediccion.sum(axis=1)
+
+
+def _ajustar(nombre: str, Y: np.ndarray, horizonte: int, mes_inicial: int):
+    if nombre == 'naive_estacional':
+        return _naive_estacional(Y, horizonte)
+    if nombre == 'suavizado_exponencial':
+        return _suavizado_exponencial(Y, horizonte)
+    return _poisson_glm(Y, horizonte, mes_inicial)
+
+
+# ============================================================================
+# PRONÓSTICO
+# ============================================================================
+
+def pronosticar(claves: List[str], meses: pd.PeriodIndex, Y: np.ndarray,
+                horizonte: int = 6, nivel: float = 0.95) -> List[Dict[str, Any]]:
+    """
+    Pronostica los próximos meses de todas las series a la vez.
+
+    Si hay historia suficiente se reserva el último horizonte como validación
+    y cada serie se queda con el modelo de menor error absoluto; si no, se
+    usa el GLM de Poisson.
+
+    Args:
+        claves: Nombre de cada serie
+        meses: Meses observados
+        Y: Matriz de incidencia (series x meses)
+        horizonte: Meses a pronosticar (default: 6)
+        nivel: Nivel del intervalo de predicción (default: 0.95)
+
+    Returns:
+        Lista con el pronóstico de cada serie
+    """
+    n_series, n_meses = Y.shape
+    if n_meses < 3:
+        return []
+
+    mes_inicial = meses[0].month - 1
+    z = cuantil_normal(nivel)
+
+    if n_meses >= horizonte + 12:
+        errores = np.column_stack([
+            np.mean(np.abs(
+                _ajustar(nombre, Y[:, :-horizonte], horizonte, mes_inicial)[0] - Y[:, -horizonte:]
+            ), axis=1)
+            for nombre in MODELOS
+        ])
+        elegido = np.argmin(errores, axis=1)
+    else:
+        elegido = np.full(n_series, MODELOS.index('poisson_glm'))
+
+    ajustes = [_ajustar(nombre, Y, horizonte, mes_inicial) for nombre in MODELOS]
+    predicciones = np.stack([pred for pred, _ in ajustes])
+    varianzas = np.stack([var for _, var in ajustes])
+    filas = np.arange(n_series)
+    prediccion = np.maximum(predicciones[elegido, filas], 0)
+    varianza = varianzas[elegido, filas]
+
+    total = prediccion.sum(axis=1)
+    desviacion = np.sqrt(np.maximum(varianza, 0))
+    inferior = np.maximum(total - z * desviacion, 0)
+    superior = total + z * desviacion
+
+    ventana = min(horizonte, n_meses)
+    observado = Y[:, -ventana:].sum(axis=1) * horizonte / ventana
+    tasa = np.divide(
+        (total - observado) * 100, observado,
+        out=np.zeros(n_series), where=observado > 0
+    )
+
+    amplitud = (superior - inferior) / np.maximum(total, 1)
+    confianza = np.where(amplitud < 0.5, 'alta', np.where(amplitud < 1.0, 'media', 'baja'))
+    if n_meses < 12:
+        confianza[:] = 'baja'
+
+    meses_futuros = [str(meses[-1] + h) for h in range(1, horizonte + 1)]
+    resultados = []
+    for i in range(n_series):
+        resultados.append({
+            'cohorte': claves[i],
+            'modelo': MODELOS[elegido[i]],
+            'meses_observados': int(n_meses),
+            'nuevos_casos_estimados': int(round(total[i])),
+            'tasa_crecimiento': round(float(tasa[i]), 2),
+            'confianza': str(confianza[i]),
+            'intervalo_prediccion': {
+                'nivel': nivel,
+                'inferior': int(np.floor(inferior[i])),
+                'superior': int(np.ceil(superior[i]))
+            },
+            'mensual': [
+                {'mes': mes, 'casos': round(float(valor), 2)}
+                for mes, valor in zip(meses_futuros, prediccion[i])
+            ]
+        })
+    return resultados
+
+
+def pronosticar_conteos(conteos: pd.DataFrame, fecha_maxima,
+                        horizonte: int = 6, nivel: float = 0.95) -> Dict[str, Any]:
+    """
+    Pronostica la cohorte total y sus subcohortes desde los conteos mensuales.
+
+    Returns:
+        Diccionario con el pronóstico total y la lista por subcohorte
+        (vacío si no hay historia suficiente)
+    """
+    claves, meses, Y = series_desde_conteos(conteos, fecha_maxima)
+    resultados = pronosticar(claves, meses, Y, horizonte, nivel) if len(claves) else []
+    if not resultados:
+        return {}
+
+    return {
+        'horizonte_meses': horizonte,
+        'ultimo_mes_observado': str(meses[-1]),
+        'total': resultados[0],
+        'por_cohorte': resultados[1:]
+    }
+
+
+def pronosticar_cohortes(df: pd.DataFrame, columna_fecha: str,
+                         columnas_cohorte: List[str] = None,
+                         horizonte: int = 6, nivel: float = 0.95) -> Dict[str, Any]:
+    """Pronostica la cohorte total y sus subcohortes desde las filas de episodios."""
+    conteos, fecha_maxima = contar_ingresos(df, columna_fecha, columnas_cohorte)
+    return pronosticar_conteos(conteos, fecha_maxima, horizonte, nivel)
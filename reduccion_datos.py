@@ -0,0 +1,266 @@
+import re
+import numpy as np
+from typing import Dict, List, Any
+
+
+# Puntos máximos por gráfica. Por encima de estos tamaños Chart.js se vuelve
+# lento y las etiquetas ilegibles, así que las series se reducen en el
+# servidor antes de llegar al dashboard.
+PRESUPUESTO_PUNTOS = {
+    'distribucion_edad': 40,   # Histograma: bins adaptativos
+    'distribucion_sexo': 12,   # Categorías: top-N + "Otros"
+    'serie_ingresos': 365      # Serie temporal: LTTB
+}
+
+ETIQUETA_OTROS = 'Otros'
+
+
+# ============================================================================
+# HISTOGRAMAS: BINS ADAPTATIVOS
+# ============================================================================
+
+def _tramos(solos: np.ndarray) -> List[tuple]:
+    """(inicio, fin) de cada racha de bins consecutivos que no van solos."""
+    tramos, inicio = [], None
+    for i, solo in enumerate(solos):
+        if not solo and inicio is None:
+            inicio = i
+        elif solo and inicio is not None:
+            tramos.append((inicio, i))
+            inicio = None
+    if inicio is not None:
+        tramos.append((inicio, len(solos)))
+    return tramos
+
+
+def _cortes_igual_frecuencia(totales: np.ndarray, bins: int) -> np.ndarray:
+    """Cortes en los cuantiles del acumulado de un tramo (relativos a su inicio)."""
+    n = len(totales)
+    if n <= bins:
+        return np.arange(n)
+    acumulado = np.cumsum(totales, dtype=float)
+    if acumulado[-1] <= 0:
+        return np.linspace(0, n, bins, endpoint=False).astype(int)
+    objetivos = acumulado[-1] * np.arange(1, bins) / bins
+    cortes = np.searchsorted(acumulado, objetivos, side='left') + 1
+    return np.unique(np.concatenate([[0], cortes[cortes < n]]))
+
+
+def cortes_adaptativos(totales: np.ndarray, max_bins: int) -> np.ndarray:
+    """
+    Inicio de cada grupo de bins consecutivos (igual frecuencia).
+
+    Los cortes se ponen en los cuantiles del acumulado: las zonas densas
+    conservan la resolución y las colas poco pobladas se agrupan. Un bin
+    con más casos que el objetivo queda solo (nunca se parte) y el
+    presupuesto que queda se reparte entre las colas según sus casos, así
+    un bin dominante no deja el histograma en dos o tres barras.
+    """
+    n = len(totales)
+    if n <= max_bins:
+        return np.arange(n)
+    totales = np.asarray(totales, dtype=float)
+    if totales.sum() <= 0:
+        return np.linspace(0, n, max_bins, endpoint=False).astype(int)
+
+    # Bins que superan el objetivo del resto: van solos, de mayor a menor
+    solos = np.zeros(n, dtype=bool)
+    while True:
+        objetivo = totales[~solos].sum() / (max_bins - solos.sum())
+        candidatos = np.where(solos, -1.0, totales)
+        i = int(np.argmax(candidatos))
+        if candidatos[i] <= objetivo:
+            break
+        solos[i] = True
+        if solos.sum() + len(_tramos(solos)) > max_bins:
+            solos[i] = False
+            break
+
+    # Reparto del presupuesto entre los tramos (al menos un bin cada uno):
+    # cada bin extra va al tramo con más casos por bin que aún se puede partir
+    tramos = _tramos(solos)
+    masas = np.array([totales[a:b].sum() for a, b in tramos])
+    longitudes = np.array([b - a for a, b in tramos])
+    reparto = np.ones(len(tramos), dtype=int)
+    for _ in range(max_bins - int(solos.sum()) - len(tramos)):
+        margen = np.where(reparto < longitudes, masas / reparto, -1.0)
+        j = int(np.argmax(margen))
+        if margen[j] < 0:
+            break
+        reparto[j] += 1
+
+    cortes = [np.flatnonzero(solos)]
+    cortes += [a + _cortes_igual_frecuencia(totales[a:b], k) for (a, b), k in zip(tramos, reparto)]
+    return np.unique(np.concatenate(cortes)).astype(int)
+
+
+def _unir_etiquetas(primera: str, ultima: str) -> str:
+    """'11-15 años' + '16-19 años' -> '11-19 años' (o 'a – b' si no son rangos)."""
+    if primera == ultima:
+        return primera
+    inicio = re.match(r'^\s*([\d.]+)\s*-', str(primera))
+    fin = re.match(r'^\s*[\d.]+\s*-\s*([\d.]+)(.*)$', str(ultima))
+    if inicio and fin:
+        return f"{inicio.group(1)}-{fin.group(1)}{fin.group(2)}"
+    return f"{primera} – {ultima}"
+
+
+def reducir_histograma(filas: List[Dict[str, Any]], max_bins: int,
+                       etiqueta: str = 'rango') -> List[Dict[str, Any]]:
+    """
+    Agrupa bins consecutivos de un histograma hasta max_bins.
+
+    Args:
+        filas: Bins ordenados con etiqueta, 'total' y 'casos' (p.ej. distribucion_edad)
+        max_bins: Número máximo de bins del resultado
+        etiqueta: Clave con el nombre de cada bin
+    """
+    if len(filas) <= max_bins:
+        return filas
+    totales = np.array([fila.get('total', 0) for fila in filas], dtype=np.int64)
+    casos = np.array([fila.get('casos', fila.get('total', 0)) for fila in filas], dtype=np.int64)
+    cortes = cortes_adaptativos(totales, max_bins)
+    finales = np.append(cortes[1:], len(filas)) - 1
+
+    suma_totales = np.add.reduceat(totales, cortes)
+    suma_casos = np.add.reduceat(casos, cortes)
+    tasas = np.divide(suma_casos * 100.0, suma_totales,
+                      out=np.zeros(len(cortes)), where=suma_totales > 0)
+    return [
+        {
+            etiqueta: _unir_etiquetas(filas[i][etiqueta], filas[j][etiqueta]),
+            'total': int(total),
+            'casos': int(caso),
+            'tasa': round(float(tasa), 2)
+        }
+        for i, j, total, caso, tasa in zip(cortes, finales, suma_totales, suma_casos, tasas)
+    ]
+
+
+# ============================================================================
+# SERIES TEMPORALES: LTTB
+# ============================================================================
+
+def lttb(x: np.ndarray, y: np.ndarray, umbral: int) -> np.ndarray:
+    """
+    Índices de los puntos elegidos por Largest-Triangle-Three-Buckets.
+
+    Conserva el primer y el último punto y, de cada bucket intermedio, el
+    que forma el triángulo de mayor área con el punto elegido en el bucket
+    anterior y la media del siguiente: mantiene picos y valles, que es lo
+    que se pierde con un muestreo regular.
+    """
+    n = len(x)
+    if umbral >= n or umbral < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    # Límites de los umbral-2 buckets intermedios (sin el primer y último punto)
+    limites = np.linspace(1, n - 1, umbral - 1).astype(int)
+    elegidos = np.empty(umbral, dtype=np.int64)
+    elegidos[0], elegidos[-1] = 0, n - 1
+
+    a = 0
+    for k in range(umbral - 2):
+        inicio, fin = limites[k], limites[k + 1]
+        siguiente_inicio = fin
+        siguiente_fin = limites[k + 2] if k + 2 < len(limites) else n
+        media_x = x[siguiente_inicio:siguiente_fin].mean()
+        media_y = y[siguiente_inicio:siguiente_fin].mean()
+
+        areas = np.abs(
+            (x[a] - media_x) * (y[inicio:fin] - y[a]) - (x[a] - x[inicio:fin]) * (media_y - y[a])
+        )
+        a = inicio + int(np.argmax(areas))
+        elegidos[k + 1] = a
+    return elegidos
+
+
+def reducir_serie(filas: List[Dict[str, Any]], max_puntos: int,
+                  clave_x: str = 'fecha', clave_y: str = 'casos') -> List[Dict[str, Any]]:
+    """
+    Reduce una serie temporal ordenada a max_puntos con LTTB.
+
+    Las fechas (texto ISO) se convierten a días para medir las áreas.
+    """
+    if len(filas) <= max_puntos:
+        return filas
+    x = np.array([fila[clave_x] for fila in filas], dtype='datetime64[D]').astype(np.int64)
+    y = np.array([fila[clave_y] for fila in filas], dtype=float)
+    return [filas[i] for i in lttb(x, y, max_puntos)]
+
+
+# ============================================================================
+# CATEGORÍAS: TOP-N + OTROS
+# ============================================================================
+
+def top_n(filas: List[Dict[str, Any]], n: int, etiqueta: str,
+          valor: str = 'total', otros: str = ETIQUETA_OTROS) -> List[Dict[str, Any]]:
+    """
+    Deja las n-1 categorías mayores y suma el resto en una fila "Otros".
+
+    Las columnas numéricas se suman en "Otros"; la tasa se recalcula si
+    hay casos y total, y la edad media se pondera por el total.
+    """
+    if len(filas) <= n:
+        return filas
+    valores = np.array([fila.get(valor, 0) for fila in filas], dtype=float)
+    orden = np.argsort(-valores, kind='stable')
+    mayores = [filas[i] for i in orden[:n - 1]]
+    resto = [filas[i] for i in orden[n - 1:]]
+
+    agregado = {etiqueta: otros, 'agrupadas': len(resto)}
+    for clave in ('total', 'casos'):
+        if clave in filas[0]:
+            agregado[clave] = int(sum(fila.get(clave, 0) for fila in resto))
+    if 'tasa' in filas[0] and agregado.get('total'):
+        agregado['tasa'] = round(100.0 * agregado.get('casos', 0) / agregado['total'], 2)
+    if 'edad_media' in filas[0] and agregado.get('total'):
+        agregado['edad_media'] = round(
+            sum(fila.get('edad_media', 0) * fila.get('total', 0) for fila in resto) / agregado['total'], 1
+        )
+    return mayores + [agregado]
+
+
+# ============================================================================
+# REDUCCIÓN DE LOS DATOS DE VISUALIZACIÓN DEL INFORME
+# ============================================================================
+
+# Serie de datos_visualizacion -> (método, función que la reduce)
+REDUCTORES = {
+    'distribucion_edad': ('bins_adaptativos', lambda filas, p: reducir_histograma(filas, p, 'rango')),
+    'distribucion_sexo': ('top_n', lambda filas, p: top_n(filas, p, 'sexo')),
+    'serie_ingresos': ('lttb', lambda filas, p: reducir_serie(filas, p))
+}
+
+
+def reducir_visualizacion(viz_data: Dict[str, Any],
+                          presupuestos: Dict[str, int] = None) -> Dict[str, Any]:
+    """
+    Reduce las series de datos_visualizacion a su presupuesto de puntos.
+
+    Devuelve una copia con las series reducidas y, en 'reduccion', el
+    tamaño original, el reducido, el método y el presupuesto de cada una.
+    Las series sin reductor (p.ej. tasas_prevalencia) se copian tal cual.
+
+    Args:
+        viz_data: Sección datos_visualizacion del informe
+        presupuestos: (Opcional) Puntos máximos por serie; default: PRESUPUESTO_PUNTOS
+    """
+    presupuestos = {**PRESUPUESTO_PUNTOS, **(presupuestos or {})}
+    reducido = dict(viz_data)
+    resumen = {}
+    for serie, (metodo, reducir) in REDUCTORES.items():
+        filas = viz_data.get(serie)
+        if not isinstance(filas, list):
+            continue
+        reducido[serie] = reducir(filas, presupuestos[serie])
+        resumen[serie] = {
+            'metodo': metodo,
+            'presupuesto': presupuestos[serie],
+            'original': len(filas),
+            'reducido': len(reducido[serie])
+        }
+    reducido['reduccion'] = resumen
+    return reducido
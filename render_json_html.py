@@ -1,64 +1,58 @@
+import argparse
+import gzip
 import json
-from datetime import datetime
+import os
+import re
+import time
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
 from pathlib import Path
+from ejecucion_reanudable import hash_contenido, hash_parametros
+from reduccion_datos import ETIQUETA_OTROS, reducir_visualizacion
+
+# brotli es opcional: sin él solo se escriben las variantes .gz
+# pip install brotli
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 # === CONFIGURACIÓN ===
 INPUT_JSON_FILE = "informe_completo.json"
 OUTPUT_HTML_FILE = "dashboard_profesional.html"
 
-# === CARGAR EL JSON ===
-with open(INPUT_JSON_FILE, "r", encoding="utf-8") as f:
-    data = json.load(f)
+# Segundos entre recargas del dashboard parcial mientras la IA responde
+RECARGA_PARCIAL = 5
 
-# === EXTRAER DATOS ===
-metadata = data.get("metadata", {})
-empiricos = data.get("datos_empiricos", {}).get("estadisticas", {})
-insights = data.get("insights_ia", {}).get("contenido", {})
-viz_data = data.get("datos_visualizacion", {})
-
-# === CALCULAR ESTADÍSTICAS ADICIONALES ===
-total_pacientes = empiricos.get("total_pacientes", 0)
-edad_media = empiricos.get("edad_media", 0)
-edad_std = empiricos.get("edad_std", 0)
-edad_min = empiricos.get("edad_min", 0)
-edad_max = empiricos.get("edad_max", 0)
-
-# Coeficiente de variación
-cv = (edad_std / edad_media * 100) if edad_media > 0 else 0
-
-# Distribución por sexo
-dist_sexo = empiricos.get("distribucion_sexo", {})
-sexo_labels = list(dist_sexo.keys())
-sexo_values = list(dist_sexo.values())
-
-# Distribución por edad
-dist_edad = viz_data.get("distribucion_edad", [])
-edad_rangos = [d.get("rango", "") for d in dist_edad]
-edad_totales = [d.get("total", 0) for d in dist_edad]
-
-# Proyección
-proyeccion = insights.get("proyeccion_6_meses", {})
-casos_estimados = proyeccion.get("nuevos_casos_estimados", 0)
-tasa_crecimiento = proyeccion.get("tasa_crecimiento", 0)
+# Celdas máximas del cubo del filtro cruzado en línea en la página completa
+# (~30 bytes por celda); con más, el filtro solo va en la página ligera
+MAX_CELDAS_EN_LINEA = 2000
 
 # === PLANTILLA HTML PROFESIONAL ===
-html_template = f"""
+# Piezas estáticas de la página. La plantilla une las piezas con huecos
+# {{nombre}} y se compila una sola vez al importar: render solo rellena
+# los huecos con las secciones del informe.
+INICIO_DOCUMENTO = """
 <!DOCTYPE html>
 <html lang="es">
 <head>
   <meta charset="UTF-8" />
   <meta name="viewport" content="width=device-width, initial-scale=1.0" />
   <title>🏥 Dashboard Clínico Profesional - Análisis IA</title>
-  <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
+"""
+
+LIBRERIAS_CDN = """  <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
   <script src="https://cdn.jsdelivr.net/npm/chartjs-plugin-datalabels@2"></script>
-  <style>
-    * {{
+"""
+
+ESTILOS = """    * {
       margin: 0;
       padding: 0;
       box-sizing: border-box;
-    }}
+    }
 
-    :root {{
+    :root {
       --color-primary: #2E86AB;
       --color-secondary: #A23B72;
       --color-accent: #F18F01;
@@ -70,18 +64,18 @@ html_template = f"""
       --color-text-light: #718096;
       --shadow: 0 4px 6px rgba(0, 0, 0, 0.07);
       --shadow-lg: 0 10px 25px rgba(0, 0, 0, 0.1);
-    }}
+    }
 
-    body {{
+    body {
       font-family: 'Inter', 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
       background: var(--color-bg);
       color: var(--color-text);
       line-height: 1.6;
       padding-bottom: 3rem;
-    }}
+    }
 
     /* HEADER */
-    header {{
+    header {
       background: linear-gradient(135deg, var(--color-primary) 0%, #1a5276 100%);
       color: white;
       padding: 2.5rem 2rem;
@@ -89,89 +83,89 @@ html_template = f"""
       position: sticky;
       top: 0;
       z-index: 100;
-    }}
+    }
 
-    .header-content {{
+    .header-content {
       max-width: 1400px;
       margin: 0 auto;
-    }}
+    }
 
-    header h1 {{
+    header h1 {
       font-size: 2.2rem;
       font-weight: 700;
       margin-bottom: 0.5rem;
       display: flex;
       align-items: center;
       gap: 1rem;
-    }}
+    }
 
-    .header-meta {{
+    .header-meta {
       display: flex;
       flex-wrap: wrap;
       gap: 2rem;
       margin-top: 1rem;
       font-size: 0.95rem;
       opacity: 0.95;
-    }}
+    }
 
-    .header-meta span {{
+    .header-meta span {
       display: flex;
       align-items: center;
       gap: 0.5rem;
-    }}
+    }
 
     /* CONTAINER */
-    .container {{
+    .container {
       max-width: 1400px;
       margin: 2rem auto;
       padding: 0 2rem;
-    }}
+    }
 
     /* GRID LAYOUT */
-    .grid {{
+    .grid {
       display: grid;
       grid-template-columns: repeat(auto-fit, minmax(300px, 1fr));
       gap: 1.5rem;
       margin-bottom: 2rem;
-    }}
+    }
 
-    .grid-2 {{
+    .grid-2 {
       grid-template-columns: repeat(auto-fit, minmax(450px, 1fr));
-    }}
+    }
 
     /* CARDS */
-    .card {{
+    .card {
       background: var(--color-card);
       border-radius: 16px;
       padding: 1.75rem;
       box-shadow: var(--shadow);
       transition: transform 0.2s ease, box-shadow 0.2s ease;
-    }}
+    }
 
-    .card:hover {{
+    .card:hover {
       transform: translateY(-4px);
       box-shadow: var(--shadow-lg);
-    }}
+    }
 
-    .card-header {{
+    .card-header {
       display: flex;
       justify-content: space-between;
       align-items: center;
       margin-bottom: 1.5rem;
       padding-bottom: 1rem;
       border-bottom: 2px solid #E2E8F0;
-    }}
+    }
 
-    .card-title {{
+    .card-title {
       font-size: 1.3rem;
       font-weight: 700;
       color: var(--color-primary);
       display: flex;
       align-items: center;
       gap: 0.75rem;
-    }}
+    }
 
-    .card-icon {{
+    .card-icon {
       width: 40px;
       height: 40px;
       border-radius: 10px;
@@ -179,52 +173,52 @@ html_template = f"""
       align-items: center;
       justify-content: center;
       font-size: 1.4rem;
-    }}
+    }
 
-    .icon-empirico {{
+    .icon-empirico {
       background: linear-gradient(135deg, #2E86AB 0%, #45a3c9 100%);
       color: white;
-    }}
+    }
 
-    .icon-ia {{
+    .icon-ia {
       background: linear-gradient(135deg, #A23B72 0%, #c94d8a 100%);
       color: white;
-    }}
+    }
 
-    .icon-chart {{
+    .icon-chart {
       background: linear-gradient(135deg, #F18F01 0%, #ffa726 100%);
       color: white;
-    }}
+    }
 
     /* STATS CARDS */
-    .stat-card {{
+    .stat-card {
       text-align: center;
       padding: 1.5rem;
-    }}
+    }
 
-    .stat-value {{
+    .stat-value {
       font-size: 2.5rem;
       font-weight: 800;
       color: var(--color-primary);
       margin-bottom: 0.5rem;
-    }}
+    }
 
-    .stat-label {{
+    .stat-label {
       font-size: 0.9rem;
       color: var(--color-text-light);
       font-weight: 500;
       text-transform: uppercase;
       letter-spacing: 0.5px;
-    }}
+    }
 
-    .stat-sublabel {{
+    .stat-sublabel {
       font-size: 0.85rem;
       color: var(--color-text-light);
       margin-top: 0.25rem;
-    }}
+    }
 
     /* BADGES */
-    .badge {{
+    .badge {
       display: inline-flex;
       align-items: center;
       gap: 0.5rem;
@@ -232,198 +226,956 @@ html_template = f"""
       border-radius: 20px;
       font-size: 0.85rem;
       font-weight: 600;
-    }}
+    }
 
-    .badge-primary {{
+    .badge-primary {
       background: rgba(46, 134, 171, 0.1);
       color: var(--color-primary);
-    }}
+    }
 
-    .badge-secondary {{
+    .badge-secondary {
       background: rgba(162, 59, 114, 0.1);
       color: var(--color-secondary);
-    }}
+    }
 
-    .badge-success {{
+    .badge-success {
       background: rgba(6, 167, 125, 0.1);
       color: var(--color-success);
-    }}
+    }
 
-    .badge-warning {{
+    .badge-warning {
       background: rgba(247, 127, 0, 0.1);
       color: var(--color-warning);
-    }}
+    }
 
     /* LISTS */
-    .insight-list {{
+    .insight-list {
       list-style: none;
       padding: 0;
-    }}
+    }
 
-    .insight-list li {{
+    .insight-list li {
       padding: 1rem;
       margin-bottom: 0.75rem;
       background: #F7FAFC;
       border-radius: 10px;
       border-left: 4px solid var(--color-primary);
       transition: all 0.2s ease;
-    }}
+    }
 
-    .insight-list li:hover {{
+    .insight-list li:hover {
       background: #EDF2F7;
       transform: translateX(4px);
-    }}
+    }
 
-    .insight-list.ia li {{
+    .insight-list.ia li {
       border-left-color: var(--color-secondary);
-    }}
+    }
 
     /* TABLES */
-    table {{
+    table {
       width: 100%;
       border-collapse: separate;
       border-spacing: 0;
       margin-top: 1rem;
-    }}
+    }
 
-    thead {{
+    thead {
       background: linear-gradient(135deg, var(--color-primary) 0%, #1a5276 100%);
       color: white;
-    }}
+    }
 
-    th {{
+    th {
       padding: 1rem;
       text-align: left;
       font-weight: 600;
       font-size: 0.9rem;
       text-transform: uppercase;
       letter-spacing: 0.5px;
-    }}
+    }
 
-    th:first-child {{
+    th:first-child {
       border-top-left-radius: 10px;
-    }}
+    }
 
-    th:last-child {{
+    th:last-child {
       border-top-right-radius: 10px;
-    }}
+    }
 
-    td {{
+    td {
       padding: 1rem;
       border-bottom: 1px solid #E2E8F0;
-    }}
+    }
 
-    tbody tr:hover {{
+    tbody tr:hover {
       background: #F7FAFC;
-    }}
+    }
 
-    tbody tr:last-child td {{
+    tbody tr:last-child td {
       border-bottom: none;
-    }}
+    }
 
     /* CHARTS */
-    .chart-container {{
+    .chart-container {
       position: relative;
       height: 350px;
       margin-top: 1.5rem;
-    }}
+    }
 
-    .chart-small {{
+    .chart-small {
       height: 280px;
-    }}
+    }
 
     /* PROYECCIÓN CARD */
-    .proyeccion-card {{
+    .proyeccion-card {
       background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
       color: white;
       padding: 2rem;
       border-radius: 16px;
       box-shadow: var(--shadow-lg);
-    }}
+    }
 
-    .proyeccion-grid {{
+    .proyeccion-grid {
       display: grid;
       grid-template-columns: repeat(auto-fit, minmax(150px, 1fr));
       gap: 1.5rem;
       margin-top: 1.5rem;
-    }}
+    }
 
-    .proyeccion-item {{
+    .proyeccion-item {
       text-align: center;
       padding: 1rem;
       background: rgba(255, 255, 255, 0.15);
       border-radius: 12px;
       backdrop-filter: blur(10px);
-    }}
+    }
 
-    .proyeccion-value {{
+    .proyeccion-value {
       font-size: 2rem;
       font-weight: 800;
       margin-bottom: 0.5rem;
-    }}
+    }
 
-    .proyeccion-label {{
+    .proyeccion-label {
       font-size: 0.9rem;
       opacity: 0.9;
-    }}
+    }
 
     /* RESPONSIVE */
-    @media (max-width: 768px) {{
-      .container {{
+    @media (max-width: 768px) {
+      .container {
         padding: 0 1rem;
-      }}
+      }
 
-      .grid, .grid-2 {{
+      .grid, .grid-2 {
         grid-template-columns: 1fr;
-      }}
+      }
 
-      header h1 {{
+      header h1 {
         font-size: 1.5rem;
-      }}
+      }
 
-      .stat-value {{
+      .stat-value {
         font-size: 2rem;
-      }}
-    }}
+      }
+    }
 
     /* ANIMATIONS */
-    @keyframes fadeIn {{
-      from {{
+    @keyframes fadeIn {
+      from {
         opacity: 0;
         transform: translateY(20px);
-      }}
-      to {{
+      }
+      to {
         opacity: 1;
         transform: translateY(0);
-      }}
-    }}
+      }
+    }
 
-    .card {{
+    .card {
       animation: fadeIn 0.5s ease-out;
-    }}
+    }
 
     /* SCROLLBAR */
-    ::-webkit-scrollbar {{
+    ::-webkit-scrollbar {
       width: 10px;
       height: 10px;
-    }}
+    }
 
-    ::-webkit-scrollbar-track {{
+    ::-webkit-scrollbar-track {
       background: #E2E8F0;
-    }}
+    }
 
-    ::-webkit-scrollbar-thumb {{
+    ::-webkit-scrollbar-thumb {
       background: var(--color-primary);
       border-radius: 5px;
-    }}
+    }
 
-    ::-webkit-scrollbar-thumb:hover {{
+    ::-webkit-scrollbar-thumb:hover {
       background: #1a5276;
-    }}
-  </style>
-</head>
+    }
+"""
+
+# Chips del filtro cruzado: solo en las páginas que llevan el cubo
+ESTILOS_FILTRO = """    .filtro-dim {
+      display: flex;
+      flex-wrap: wrap;
+      align-items: center;
+      gap: 0.5rem;
+      margin-bottom: 0.75rem;
+    }
+
+    .filtro-dim strong {
+      min-width: 110px;
+      color: var(--color-primary);
+      text-transform: capitalize;
+    }
+
+    .chip {
+      border: 1px solid #E2E8F0;
+      background: var(--color-bg);
+      border-radius: 999px;
+      padding: 0.25rem 0.75rem;
+      font-size: 0.8rem;
+      cursor: pointer;
+    }
+
+    .chip.activo {
+      background: var(--color-primary);
+      border-color: var(--color-primary);
+      color: white;
+    }
+"""
+
+# Controles de las tablas paginadas (página ligera y comparación)
+ESTILOS_PAGINACION = """    .paginacion {
+      display: flex;
+      justify-content: flex-end;
+      align-items: center;
+      gap: 0.75rem;
+      margin-top: 0.75rem;
+      font-size: 0.85rem;
+      color: var(--color-text-light);
+    }
+
+    .paginacion button {
+      border: 1px solid #E2E8F0;
+      background: var(--color-card);
+      border-radius: 6px;
+      padding: 0.25rem 0.75rem;
+      cursor: pointer;
+    }
+
+    .paginacion button:disabled {
+      opacity: 0.4;
+      cursor: default;
+    }
+"""
+
+CUERPO_DASHBOARD = """</head>
 <body>
+{{cabecera}}
+
+  <div class="container">
+{{kpis}}
+{{tablas}}
+
+    <!-- GRÁFICAS -->
+    <h2 style="margin: 2rem 0 1rem; font-size: 1.8rem; color: var(--color-primary);">
+      📈 Visualizaciones Interactivas
+    </h2>
+    <div class="grid grid-2">
+      <div class="card">
+        <div class="card-header">
+          <div class="card-title">
+            <div class="card-icon icon-chart">📊</div>
+            Distribución por Grupos de Edad
+          </div>
+        </div>
+        <div class="chart-container">
+          <canvas id="chartEdad"></canvas>
+        </div>
+      </div>
+
+      
+
+      <div class="card">
+        <div class="card-header">
+          <div class="card-title">
+            <div class="card-icon icon-chart">📉</div>
+            Distribución por edad Media 
+          </div>
+        </div>
+        <div class="chart-container chart-small">
+          <canvas id="chartEdadMedia"></canvas>
+        </div>
+      </div>
+
+      <div class="card">
+        <div class="card-header">
+          <div class="card-title">
+            <div class="card-icon icon-chart">📊</div>
+            Concentración de Casos
+          </div>
+        </div>
+        <div class="chart-container chart-small">
+          <canvas id="chartConcentracion"></canvas>
+        </div>
+      </div>
+
+      <div class="card" id="card-ingresos">
+        <div class="card-header">
+          <div class="card-title">
+            <div class="card-icon icon-chart">📈</div>
+            Ingresos por Día
+          </div>
+        </div>
+        <div class="chart-container chart-small">
+          <canvas id="chartIngresos"></canvas>
+        </div>
+      </div>
+    </div>
+
+    <!-- FILTRO CRUZADO (solo si el informe trae el cubo) -->
+    <div class="card" id="filtro-cruzado" hidden>
+      <div class="card-header">
+        <div class="card-title">
+          <div class="card-icon icon-chart">🔎</div>
+          Filtro Cruzado
+        </div>
+        <span class="badge badge-primary" id="filtro-tiempo">Clic en una barra o categoría</span>
+      </div>
+      <div id="filtro-dimensiones"></div>
+      <button class="chip" id="quitar-filtros">✖ Quitar filtros</button>
+    </div>
+{{proyeccion}}
+{{insights}}
+
+  </div>
+
+  <!-- SCRIPTS -->
+"""
+
+CONFIGURACION_GRAFICOS = """    // Configuración global de Chart.js
+    Chart.defaults.font.family = "'Inter', 'Segoe UI', sans-serif";
+    Chart.defaults.color = '#2D3748';
+    Chart.defaults.plugins.legend.display = true;
+    Chart.defaults.plugins.legend.position = 'bottom';
+"""
 
+CODIGO_GRAFICOS = """
+    // Cada gráfica se construye con una función: al cargar o al entrar en pantalla
+    const GRAFICOS = {};
+
+    // 1. GRÁFICA DE BARRAS - Distribución por Edad
+    GRAFICOS.chartEdad = (datos) => {
+      const ctxEdad = document.getElementById('chartEdad').getContext('2d');
+      return new Chart(ctxEdad, {
+        type: 'bar',
+        data: {
+          labels: datos.edadRangos,
+          datasets: [{
+            label: 'Número de Pacientes',
+            data: datos.edadTotales,
+            backgroundColor: [
+              'rgba(46, 134, 171, 0.8)',
+              'rgba(162, 59, 114, 0.8)',
+              'rgba(241, 143, 1, 0.8)'
+            ],
+            borderColor: [
+              'rgba(46, 134, 171, 1)',
+              'rgba(162, 59, 114, 1)',
+              'rgba(241, 143, 1, 1)'
+            ],
+            borderWidth: 2,
+            borderRadius: 8
+          }]
+        },
+        options: {
+          responsive: true,
+          maintainAspectRatio: false,
+          plugins: {
+            legend: {
+              display: false
+            },
+            tooltip: {
+              backgroundColor: 'rgba(0, 0, 0, 0.8)',
+              padding: 12,
+              titleFont: { size: 14, weight: 'bold' },
+              bodyFont: { size: 13 },
+              callbacks: {
+                label: function(context) {
+                  const total = datos.totalPacientes;
+                  const value = context.parsed;
+                  const percent = ((value / total) * 100).toFixed(1);
+                  return `${context.label}: ${value} pacientes (${percent}%)`;
+                }
+              }
+            }
+          },
+          cutout: '65%'
+        }
+      });
+    };
+
+    // 3. GRÁFICA DE BARRAS HORIZONTALES - Edad Media por Sexo
+    GRAFICOS.chartEdadMedia = (datos) => {
+      const ctxEdadMedia = document.getElementById('chartEdadMedia').getContext('2d');
+      return new Chart(ctxEdadMedia, {
+        type: 'bar',
+        data: {
+          labels: datos.edadMediaData.map(d => d.sexo),
+          datasets: [{
+            label: 'Edad Media (años)',
+            data: datos.edadMediaData.map(d => d.edad),
+            backgroundColor: [
+              'rgba(162, 59, 114, 0.8)',
+              'rgba(46, 134, 171, 0.8)'
+            ],
+            borderColor: [
+              'rgba(162, 59, 114, 1)',
+              'rgba(46, 134, 171, 1)'
+            ],
+            borderWidth: 2,
+            borderRadius: 8
+          }]
+        },
+        options: {
+          indexAxis: 'y',
+          responsive: true,
+          maintainAspectRatio: false,
+          plugins: {
+            legend: {
+              display: false
+            },
+            tooltip: {
+              backgroundColor: 'rgba(0, 0, 0, 0.8)',
+              padding: 12,
+              callbacks: {
+                label: function(context) {
+                  return `Edad media: ${context.parsed.x.toFixed(2)} años`;
+                }
+              }
+            }
+          },
+          scales: {
+            x: {
+              beginAtZero: false,
+              min: 14,
+              max: 19,
+              ticks: {
+                font: { size: 12 }
+              },
+              grid: {
+                color: 'rgba(0, 0, 0, 0.05)'
+              }
+            },
+            y: {
+              ticks: {
+                font: { size: 13, weight: '500' }
+              },
+              grid: {
+                display: false
+              }
+            }
+          }
+        }
+      });
+    };
+
+    // 4. GRÁFICA DE LÍNEA - Concentración de Casos
+    GRAFICOS.chartConcentracion = (datos) => {
+      const ctxConcentracion = document.getElementById('chartConcentracion').getContext('2d');
+      const porcentajes = datos.edadTotales.map(val => ((val / datos.totalPacientes) * 100).toFixed(1));
+    
+      return new Chart(ctxConcentracion, {
+        type: 'line',
+        data: {
+          labels: datos.edadRangos,
+          datasets: [{
+            label: 'Porcentaje de Casos (%)',
+            data: porcentajes,
+            borderColor: 'rgba(241, 143, 1, 1)',
+            backgroundColor: 'rgba(241, 143, 1, 0.1)',
+            borderWidth: 3,
+            fill: true,
+            tension: 0.4,
+            pointBackgroundColor: 'rgba(241, 143, 1, 1)',
+            pointBorderColor: '#fff',
+            pointBorderWidth: 2,
+            pointRadius: 6,
+            pointHoverRadius: 8
+          }]
+        },
+        options: {
+          responsive: true,
+          maintainAspectRatio: false,
+          plugins: {
+            legend: {
+              display: false
+            },
+            tooltip: {
+              backgroundColor: 'rgba(0, 0, 0, 0.8)',
+              padding: 12,
+              callbacks: {
+                label: function(context) {
+                  return `${context.parsed.y}% de los casos`;
+                }
+              }
+            }
+          },
+          scales: {
+            y: {
+              beginAtZero: true,
+              max: 100,
+              ticks: {
+                callback: function(value) {
+                  return value + '%';
+                },
+                font: { size: 12 }
+              },
+              grid: {
+                color: 'rgba(0, 0, 0, 0.05)'
+              }
+            },
+            x: {
+              ticks: {
+                font: { size: 12, weight: '500' }
+              },
+              grid: {
+                display: false
+              }
+            }
+          }
+        }
+      });
+    };
+
+    // 5. GRÁFICA DE LÍNEA - Ingresos por Día (solo si el informe trae la serie)
+    GRAFICOS.chartIngresos = (datos) => {
+      if (!datos.ingresosDias || !datos.ingresosDias.length) {
+        document.getElementById('card-ingresos').hidden = true;
+        return null;
+      }
+      const inicio = Date.parse(datos.ingresosInicio);
+      const fechas = datos.ingresosDias.map(d => new Date(inicio + d * 86400000).toISOString().slice(0, 10));
+      const ctxIngresos = document.getElementById('chartIngresos').getContext('2d');
+      return new Chart(ctxIngresos, {
+        type: 'line',
+        data: {
+          labels: fechas,
+          datasets: [{
+            label: 'Ingresos',
+            data: datos.ingresosCasos,
+            borderColor: 'rgba(46, 134, 171, 1)',
+            backgroundColor: 'rgba(46, 134, 171, 0.15)',
+            borderWidth: 2,
+            pointRadius: 0,
+            fill: true,
+            tension: 0.2
+          }]
+        },
+        options: {
+          responsive: true,
+          maintainAspectRatio: false,
+          animation: false,
+          plugins: {
+            legend: {
+              display: false
+            }
+          },
+          scales: {
+            y: {
+              beginAtZero: true
+            },
+            x: {
+              ticks: {
+                maxTicksLimit: 12
+              },
+              grid: {
+                display: false
+              }
+            }
+          }
+        }
+      });
+    };
+
+    // Gráficas ya construidas (el filtro cruzado las reconstruye con los datos filtrados)
+    const CREADAS = {};
+
+    function construir(id, datos) {
+      if (CREADAS[id]) CREADAS[id].destroy();
+      CREADAS[id] = GRAFICOS[id](datos);
+      conectarFiltro(id, CREADAS[id]);
+    }
+
+    // Animaciones de entrada
+    const observer = new IntersectionObserver((entries) => {
+      entries.forEach(entry => {
+        if (entry.isIntersecting) {
+          entry.target.style.opacity = '1';
+          entry.target.style.transform = 'translateY(0)';
+        }
+      });
+    }, { threshold: 0.1 });
+
+    document.querySelectorAll('.card').forEach(card => {
+      card.style.opacity = '0';
+      card.style.transform = 'translateY(20px)';
+      card.style.transition = 'all 0.5s ease-out';
+      observer.observe(card);
+    });
+"""
+
+# Filtro cruzado en el navegador sobre el cubo compacto (CuboAgregacion.a_compacto):
+# un clic en una barra o en una categoría filtra el resto de gráficas y los KPIs
+FILTRO_CRUZADO = """
+    const TIPOS_ARRAY = {
+      Int8Array, Int16Array, Int32Array, Uint8Array, Uint16Array, Uint32Array, Float32Array, Float64Array
+    };
+
+    // Dimensión del cubo que filtra cada gráfica al hacer clic en una barra
+    const DIMENSION_GRAFICA = { chartEdad: 'rango_edad', chartConcentracion: 'rango_edad', chartEdadMedia: 'sexo' };
+
+    // Dimensiones con más categorías no se muestran como chips
+    const MAX_CHIPS = 60;
+
+    const FILTRO = { cubo: null, datos: null, original: null, filtros: {} };
+
+    function decodificar(array) {
+      const bytes = Uint8Array.from(atob(array.datos), c => c.charCodeAt(0));
+      return new TIPOS_ARRAY[array.tipo](bytes.buffer);
+    }
+
+    function iniciarFiltro(datos) {
+      const cubo = datos.cubo;
+      if (!cubo || !cubo.medidas.edad) return;
+      FILTRO.datos = datos;
+      FILTRO.original = { ...datos };
+      FILTRO.cubo = {
+        factor: cubo.factor,
+        etiquetas: cubo.etiquetas,
+        dimensiones: cubo.dimensiones,
+        codigos: Object.fromEntries(cubo.dimensiones.map(dim => [dim, decodificar(cubo.codigos[dim])])),
+        conteo: decodificar(cubo.conteo),
+        n: decodificar(cubo.medidas.edad.n),
+        suma: decodificar(cubo.medidas.edad.suma),
+        min: decodificar(cubo.medidas.edad.min),
+        max: decodificar(cubo.medidas.edad.max)
+      };
+      document.getElementById('filtro-cruzado').hidden = false;
+      document.getElementById('quitar-filtros').onclick = () => { FILTRO.filtros = {}; aplicarFiltro(); };
+      pintarChips(agrupaciones(fallosPorCelda()));
+    }
+
+    function conectarFiltro(id, grafica) {
+      const dim = DIMENSION_GRAFICA[id];
+      if (!FILTRO.cubo || !dim || !FILTRO.cubo.codigos[dim]) return;
+      grafica.options.onClick = (evento, elementos) => {
+        if (!elementos.length) return;
+        const etiqueta = String(grafica.data.labels[elementos[0].index]);
+        alternar(dim, dim === 'sexo' ? etiqueta.replace(/^Sexo /, '') : etiqueta);
+      };
+      grafica.update('none');
+    }
+
+    function alternar(dim, etiqueta) {
+      const codigo = FILTRO.cubo.etiquetas[dim].indexOf(etiqueta);
+      if (codigo < 0) return;  // Barra agrupada por la reducción: no es una categoría del cubo
+      const elegidos = FILTRO.filtros[dim] || new Set();
+      elegidos.has(codigo) ? elegidos.delete(codigo) : elegidos.add(codigo);
+      if (elegidos.size) FILTRO.filtros[dim] = elegidos; else delete FILTRO.filtros[dim];
+      aplicarFiltro();
+    }
+
+    // Por celda: cuántos filtros no cumple y cuál falla en cada dimensión filtrada
+    function fallosPorCelda() {
+      const cubo = FILTRO.cubo, celdas = cubo.conteo.length;
+      const fallos = new Uint8Array(celdas), fallaEn = {};
+      for (const [dim, elegidos] of Object.entries(FILTRO.filtros)) {
+        const codigos = cubo.codigos[dim], falla = new Uint8Array(celdas);
+        for (let i = 0; i < celdas; i++) {
+          if (!elegidos.has(codigos[i])) { falla[i] = 1; fallos[i]++; }
+        }
+        fallaEn[dim] = falla;
+      }
+      return { fallos, fallaEn };
+    }
+
+    // Conteo, n y suma de la edad por categoría de cada dimensión, con todos
+    // los filtros menos el de la propia dimensión (como crossfilter)
+    function agrupaciones({ fallos, fallaEn }) {
+      const cubo = FILTRO.cubo, resultado = {};
+      for (const dim of cubo.dimensiones) {
+        const k = cubo.etiquetas[dim].length, codigos = cubo.codigos[dim], propia = fallaEn[dim];
+        const conteo = new Float64Array(k), n = new Float64Array(k), suma = new Float64Array(k);
+        for (let i = 0; i < codigos.length; i++) {
+          const c = codigos[i];
+          if (c < 0 || fallos[i] - (propia ? propia[i] : 0) > 0) continue;
+          conteo[c] += cubo.conteo[i]; n[c] += cubo.n[i]; suma[c] += cubo.suma[i];
+        }
+        resultado[dim] = { conteo, n, suma };
+      }
+      return resultado;
+    }
+
+    function aplicarFiltro() {
+      const inicio = performance.now();
+      const cubo = FILTRO.cubo, datos = FILTRO.datos;
+      const celdas = fallosPorCelda(), grupos = agrupaciones(celdas);
+
+      let total = 0, n = 0, suma = 0, minimo = Infinity, maximo = -Infinity;
+      for (let i = 0; i < cubo.conteo.length; i++) {
+        if (celdas.fallos[i]) continue;
+        total += cubo.conteo[i]; n += cubo.n[i]; suma += cubo.suma[i];
+        minimo = Math.min(minimo, cubo.min[i]); maximo = Math.max(maximo, cubo.max[i]);
+      }
+
+      if (!Object.keys(FILTRO.filtros).length) {
+        Object.assign(datos, FILTRO.original);
+      } else {
+        datos.totalPacientes = Math.round(total * cubo.factor);
+        if (grupos.rango_edad) {
+          datos.edadRangos = cubo.etiquetas.rango_edad;
+          datos.edadTotales = Array.from(grupos.rango_edad.conteo, c => Math.round(c * cubo.factor));
+        }
+        if (grupos.sexo) {
+          datos.edadMediaData = cubo.etiquetas.sexo
+            .map((etiqueta, c) => ({ sexo: 'Sexo ' + etiqueta, edad: grupos.sexo.n[c] ? grupos.sexo.suma[c] / grupos.sexo.n[c] : 0 }))
+            .filter((fila, c) => grupos.sexo.n[c] > 0);
+        }
+      }
+
+      const kpi = (nombre, valor) => document.querySelectorAll(`[data-kpi="${nombre}"]`).forEach(el => { el.textContent = valor; });
+      kpi('total', Math.round(total * cubo.factor));
+      kpi('edad_media', n ? (suma / n).toFixed(1) : '-');
+      kpi('rango', n ? `${minimo} - ${maximo}` : '-');
+
+      Object.keys(CREADAS).forEach(id => construir(id, datos));
+      pintarChips(grupos);
+      document.getElementById('filtro-tiempo').textContent = `Filtrado en ${(performance.now() - inicio).toFixed(1)} ms`;
+    }
+
+    function pintarChips(grupos) {
+      const contenedor = document.getElementById('filtro-dimensiones');
+      const fragmento = document.createDocumentFragment();
+      for (const dim of FILTRO.cubo.dimensiones) {
+        const etiquetas = FILTRO.cubo.etiquetas[dim];
+        if (etiquetas.length > MAX_CHIPS) continue;
+        const fila = document.createElement('div');
+        fila.className = 'filtro-dim';
+        const titulo = document.createElement('strong');
+        titulo.textContent = dim.replace('_', ' ');
+        fila.appendChild(titulo);
+        etiquetas.forEach((etiqueta, c) => {
+          const chip = document.createElement('button');
+          const elegidos = FILTRO.filtros[dim];
+          chip.className = elegidos && elegidos.has(c) ? 'chip activo' : 'chip';
+          chip.textContent = `${etiqueta} (${Math.round(grupos[dim].conteo[c] * FILTRO.cubo.factor)})`;
+          chip.onclick = () => alternar(dim, etiqueta);
+          fila.appendChild(chip);
+        });
+        fragmento.appendChild(fila);
+      }
+      contenedor.replaceChildren(fragmento);
+    }
+"""
+
+# Páginas sin cubo: el arranque y construir() llaman igual al filtro
+SIN_FILTRO_CRUZADO = """
+    function iniciarFiltro() {}
+    function conectarFiltro() {}
+"""
+
+# Arranque con los datos en línea: todas las gráficas al cargar
+ARRANQUE_GRAFICOS = """
+    iniciarFiltro(datosGraficos);
+    Object.keys(GRAFICOS).forEach(id => construir(id, datosGraficos));
+"""
+
+# Tablas paginadas y URL del sidecar: los usan la página ligera y la
+# comparación (van también en el JS del paquete)
+TABLA_PAGINADA = """
+    const TAMANO_PAGINA = 25;
+
+    // El sidecar se llama como la página: informe.html -> informe.datos.json
+    const URL_DATOS = location.pathname.replace(/\\/$/, '/index.html').replace(/\\.html?$/, '') + '.datos.json';
+
+    // Pinta las filas por páginas con controles anterior/siguiente
+    function tablaPaginada(tbody, filas, formato, unidad = 'filas') {
+      const paginas = Math.max(1, Math.ceil(filas.length / TAMANO_PAGINA));
+      let pagina = 0;
+      let controles = null;
+
+      function pintar() {
+        const fragmento = document.createDocumentFragment();
+        filas.slice(pagina * TAMANO_PAGINA, (pagina + 1) * TAMANO_PAGINA).forEach(fila => {
+          const tr = document.createElement('tr');
+          formato(fila).forEach((valor, i) => {
+            const td = document.createElement('td');
+            td.textContent = valor;
+            if (i === 0) td.style.fontWeight = '700';
+            tr.appendChild(td);
+          });
+          fragmento.appendChild(tr);
+        });
+        tbody.replaceChildren(fragmento);
+        if (controles) {
+          controles.querySelector('span').textContent = `Página ${pagina + 1} de ${paginas} (${filas.length} ${unidad})`;
+          controles.querySelector('.anterior').disabled = pagina === 0;
+          controles.querySelector('.siguiente').disabled = pagina === paginas - 1;
+        }
+      }
+
+      if (paginas > 1) {
+        controles = document.createElement('div');
+        controles.className = 'paginacion';
+        controles.innerHTML = '<button class="anterior">◀</button><span></span><button class="siguiente">▶</button>';
+        controles.querySelector('.anterior').onclick = () => { pagina--; pintar(); };
+        controles.querySelector('.siguiente').onclick = () => { pagina++; pintar(); };
+        tbody.closest('table').after(controles);
+      }
+      pintar();
+    }
+"""
+
+# Arranque de la página ligera: los datos llegan del sidecar JSON, cada
+# gráfica se construye al entrar en pantalla y las tablas se paginan
+ARRANQUE_PEREZOSO = """
+    // Celdas de cada tabla a partir de las filas compactas del sidecar
+    const FORMATOS_TABLA = {
+      sexo: fila => ['Sexo ' + fila[0], fila[1], fila[2].toFixed(1) + '%', fila[3].toFixed(1) + ' años'],
+      edad: fila => [fila[0], fila[1], fila[2].toFixed(1) + '%', fila[3]]
+    };
+
+    fetch(URL_DATOS)
+      .then(respuesta => {
+        if (!respuesta.ok) throw new Error(`HTTP ${respuesta.status}`);
+        return respuesta.json();
+      })
+      .then(datos => {
+        iniciarFiltro(datos.graficos);
+        const pendientes = new IntersectionObserver((entries) => {
+          entries.forEach(entry => {
+            if (entry.isIntersecting) {
+              pendientes.unobserve(entry.target);
+              construir(entry.target.id, datos.graficos);
+            }
+          });
+        }, { rootMargin: '200px' });
+        Object.keys(GRAFICOS).forEach(id => pendientes.observe(document.getElementById(id)));
+
+        document.querySelectorAll('tbody[data-tabla]').forEach(tbody => {
+          const tabla = tbody.dataset.tabla;
+          tablaPaginada(tbody, datos.tablas[tabla], FORMATOS_TABLA[tabla]);
+        });
+      })
+      .catch(error => {
+        console.error('No se pudieron cargar los datos del dashboard', error);
+        document.querySelectorAll('tbody[data-tabla] td').forEach(td => {
+          td.textContent = `⚠️ No se pudieron cargar los datos (${URL_DATOS}). Abre el dashboard desde un servidor HTTP.`;
+        });
+      });
+"""
+
+FINAL_DOCUMENTO = """
+{{pie}}
+
+  <!-- FOOTER -->
+  <footer style="text-align: center; padding: 2rem; color: var(--color-text-light); margin-top: 3rem;">
+    <p style="font-size: 0.9rem;">
+      ⚕️ <strong>Dashboard Clínico Profesional</strong> | 
+      Generado automáticamente el {{generado}}
+    </p>
+    <p style="font-size: 0.85rem; margin-top: 0.5rem; opacity: 0.8;">
+      🏆 Premio Indra al uso y la integración de la Inteligencia Artificial
+    </p>
+{{creditos}}
+  </footer>
+
+</body>
+</html>
+"""
+
+
+def componer_plantilla(librerias=LIBRERIAS_CDN, estilos=None, graficos=None, perezoso=False):
+    """
+    Une las piezas estáticas en una plantilla con huecos.
+
+    El paquete offline sustituye las librerías del CDN, los estilos y el
+    código de las gráficas; por defecto todo va en línea como siempre y el
+    filtro cruzado (código y estilos) solo si la página lleva el cubo.
+    Con perezoso=True la página no lleva los datos de las gráficas: los
+    pide al sidecar JSON (ver datos_sidecar).
+    """
+    if estilos is None:
+        estilos = ("  <style>\n" + ESTILOS + (ESTILOS_PAGINACION if perezoso else "") + "  </style>\n" +
+                   "{{estilos_filtro}}")
+    if graficos is None:
+        if perezoso:
+            graficos = ("  <script>\n" + CONFIGURACION_GRAFICOS + CODIGO_GRAFICOS + "{{filtro_cruzado}}" +
+                        TABLA_PAGINADA + ARRANQUE_PEREZOSO + "  </script>\n")
+        else:
+            graficos = ("  <script>\n" + CONFIGURACION_GRAFICOS + "{{datos_graficos}}" + CODIGO_GRAFICOS +
+                        "{{filtro_cruzado}}" + ARRANQUE_GRAFICOS + "  </script>\n")
+    return INICIO_DOCUMENTO + librerias + "{{recarga}}" + estilos + CUERPO_DASHBOARD + graficos + FINAL_DOCUMENTO
+
+
+PLANTILLA_DASHBOARD = componer_plantilla()
+PLANTILLA_PEREZOSA = componer_plantilla(perezoso=True)
+
+
+def compilar_plantilla(plantilla):
+    """
+    Parte la plantilla en trozos estáticos y nombres de hueco.
+
+    Returns:
+        (trozos, huecos) con len(trozos) == len(huecos) + 1
+    """
+    partes = re.split(r'\{\{(\w+)\}\}', plantilla)
+    return partes[0::2], partes[1::2]
+
+
+TROZOS_DASHBOARD, HUECOS_DASHBOARD = compilar_plantilla(PLANTILLA_DASHBOARD)
+PLANTILLA_PEREZOSA_COMPILADA = compilar_plantilla(PLANTILLA_PEREZOSA)
+
+
+# === EXTRAER DATOS ===
+def extraer_datos(data):
+    """Separa el informe en las partes que usa cada sección del dashboard."""
+    metadata = data.get("metadata", {})
+    empiricos = data.get("datos_empiricos", {}).get("estadisticas", {})
+    insights = data.get("insights_ia", {}).get("contenido", {})
+    viz_data = data.get("datos_visualizacion", {})
+    if "reduccion" not in viz_data:
+        # Informes anteriores a la reducción de series: se reducen al vuelo
+        viz_data = reducir_visualizacion(viz_data)
+    return metadata, empiricos, insights, viz_data
+
+
+def insights_pendientes(data):
+    """True si el informe es parcial: la IA todavía no ha respondido."""
+    return data.get("insights_ia", {}).get("tipo") == "PENDIENTE"
+
+
+# === CALCULAR ESTADÍSTICAS ADICIONALES ===
+def estadisticas_edad(empiricos):
+    """Total, media, σ, mínimo, máximo y coeficiente de variación de la edad."""
+    total_pacientes = empiricos.get("total_pacientes", 0)
+    edad_media = empiricos.get("edad_media", 0)
+    edad_std = empiricos.get("edad_std", 0)
+    edad_min = empiricos.get("edad_min", 0)
+    edad_max = empiricos.get("edad_max", 0)
+
+    # Coeficiente de variación
+    cv = (edad_std / edad_media * 100) if edad_media > 0 else 0
+    return total_pacientes, edad_media, edad_std, edad_min, edad_max, cv
+
+
+# === SECCIONES DEL DASHBOARD ===
+def html_cabecera(metadata):
+    return f"""
   <!-- HEADER -->
   <header>
     <div class="header-content">
@@ -437,29 +1189,31 @@ html_template = f"""
         <span>💾 <strong>Fuente:</strong> {metadata.get('fuente_datos', 'Oracle Database')}</span>
       </div>
     </div>
-  </header>
+  </header>"""
 
-  <div class="container">
 
+def html_kpis(empiricos):
+    total_pacientes, edad_media, edad_std, edad_min, edad_max, cv = estadisticas_edad(empiricos)
+    return f"""
     <!-- KPIs PRINCIPALES -->
     <h2 style="margin: 2rem 0 1rem; font-size: 1.8rem; color: var(--color-primary);">
       📊 Indicadores Clave
     </h2>
     <div class="grid">
       <div class="card stat-card">
-        <div class="stat-value">{total_pacientes}</div>
+        <div class="stat-value" data-kpi="total">{total_pacientes}</div>
         <div class="stat-label">Pacientes Total</div>
         <div class="stat-sublabel">Casos diagnosticados</div>
       </div>
 
       <div class="card stat-card">
-        <div class="stat-value">{edad_media:.1f}</div>
+        <div class="stat-value" data-kpi="edad_media">{edad_media:.1f}</div>
         <div class="stat-label">Edad Media</div>
         <div class="stat-sublabel">σ = {edad_std:.2f} años</div>
       </div>
 
       <div class="card stat-card">
-        <div class="stat-value">{edad_min} - {edad_max}</div>
+        <div class="stat-value" data-kpi="rango">{edad_min} - {edad_max}</div>
         <div class="stat-label">Rango Edad</div>
         <div class="stat-sublabel">CV = {cv:.1f}%</div>
       </div>
@@ -469,8 +1223,58 @@ html_template = f"""
         <div class="stat-label">Tasa Diagnóstico</div>
         <div class="stat-sublabel">Prevalencia en muestra</div>
       </div>
-    </div>
-
+    </div>"""
+
+
+def filas_tablas(empiricos):
+    """Filas compactas de las tablas por sexo y por edad: [etiqueta, N, %, edad media | casos]."""
+    total_pacientes = empiricos.get("total_pacientes", 0)
+    return {
+        'sexo': [
+            [str(sexo), datos['total'], round(datos['total'] / total_pacientes * 100, 2), datos['edad_media']]
+            for sexo, datos in empiricos.get('esquizofrenia_por_sexo', {}).items()
+        ],
+        'edad': [
+            [rango, datos['total'], round(datos['total'] / total_pacientes * 100, 2), datos['casos_esquizofrenia']]
+            for rango, datos in empiricos.get('distribucion_edad', {}).items()
+        ]
+    }
+
+
+def _filas_html(empiricos, tabla, perezoso, sangria):
+    """Cuerpo de una tabla larga: filas en línea o celda de espera que rellena el sidecar."""
+    if perezoso:
+        return '<tr><td colspan="4">⏳ Cargando datos...</td></tr>'
+    total_pacientes = empiricos.get("total_pacientes", 0)
+    if tabla == 'sexo':
+        return ''.join(f'''
+{sangria}<tr>
+{sangria}  <td><strong>Sexo {sexo}</strong></td>
+{sangria}  <td>{datos['total']}</td>
+{sangria}  <td>{(datos['total']/total_pacientes*100):.1f}%</td>
+{sangria}  <td>{datos['edad_media']:.1f} años</td>
+{sangria}</tr>
+{sangria}''' for sexo, datos in empiricos.get('esquizofrenia_por_sexo', {}).items())
+    return ''.join(f'''
+{sangria}<tr>
+{sangria}  <td><strong>{rango}</strong></td>
+{sangria}  <td>{datos['total']}</td>
+{sangria}  <td>{(datos['total']/total_pacientes*100):.1f}%</td>
+{sangria}  <td>{datos['casos_esquizofrenia']}</td>
+{sangria}</tr>
+{sangria}''' for rango, datos in empiricos.get('distribucion_edad', {}).items())
+
+
+def html_tablas(empiricos, perezoso=False):
+    """
+    Tablas de datos empíricos.
+
+    Con perezoso=True las tablas por sexo y por edad (las que crecen con
+    los datos) salen vacías y la página las rellena, paginadas, desde el
+    sidecar JSON.
+    """
+    total_pacientes, edad_media, edad_std, edad_min, edad_max, cv = estadisticas_edad(empiricos)
+    return f"""
     <!-- DATOS EMPÍRICOS -->
     <div class="card">
       <div class="card-header">
@@ -512,15 +1316,8 @@ html_template = f"""
                 <th>Edad Media</th>
               </tr>
             </thead>
-            <tbody>
-              {''.join(f'''
-              <tr>
-                <td><strong>Sexo {sexo}</strong></td>
-                <td>{datos['total']}</td>
-                <td>{(datos['total']/total_pacientes*100):.1f}%</td>
-                <td>{datos['edad_media']:.1f} años</td>
-              </tr>
-              ''' for sexo, datos in empiricos.get('esquizofrenia_por_sexo', {}).items())}
+            <tbody data-tabla="sexo">
+              {_filas_html(empiricos, 'sexo', perezoso, '              ')}
             </tbody>
           </table>
         </div>
@@ -537,69 +1334,42 @@ html_template = f"""
               <th>Casos Esquizofrenia</th>
             </tr>
           </thead>
-          <tbody>
-            {''.join(f'''
-            <tr>
-              <td><strong>{rango}</strong></td>
-              <td>{datos['total']}</td>
-              <td>{(datos['total']/total_pacientes*100):.1f}%</td>
-              <td>{datos['casos_esquizofrenia']}</td>
-            </tr>
-            ''' for rango, datos in empiricos.get('distribucion_edad', {}).items())}
+          <tbody data-tabla="edad">
+            {_filas_html(empiricos, 'edad', perezoso, '            ')}
           </tbody>
         </table>
       </div>
-    </div>
-
-    <!-- GRÁFICAS -->
-    <h2 style="margin: 2rem 0 1rem; font-size: 1.8rem; color: var(--color-primary);">
-      📈 Visualizaciones Interactivas
-    </h2>
-    <div class="grid grid-2">
-      <div class="card">
-        <div class="card-header">
-          <div class="card-title">
-            <div class="card-icon icon-chart">📊</div>
-            Distribución por Grupos de Edad
-          </div>
-        </div>
-        <div class="chart-container">
-          <canvas id="chartEdad"></canvas>
-        </div>
-      </div>
+    </div>"""
 
-      
-
-      <div class="card">
-        <div class="card-header">
-          <div class="card-title">
-            <div class="card-icon icon-chart">📉</div>
-            Distribución por edad Media 
-          </div>
-        </div>
-        <div class="chart-container chart-small">
-          <canvas id="chartEdadMedia"></canvas>
-        </div>
-      </div>
-
-      <div class="card">
-        <div class="card-header">
-          <div class="card-title">
-            <div class="card-icon icon-chart">📊</div>
-            Concentración de Casos
-          </div>
-        </div>
-        <div class="chart-container chart-small">
-          <canvas id="chartConcentracion"></canvas>
-        </div>
-      </div>
-    </div>
 
+def html_proyeccion(metadata, insights, pendiente=False, tipo=None):
+    if pendiente:
+        return """
     <!-- PROYECCIÓN IA -->
     <div class="proyeccion-card">
       <h2 style="font-size: 1.6rem; margin-bottom: 0.5rem;">🔮 Proyección a 6 Meses (IA)</h2>
       <p style="opacity: 0.9; font-size: 0.95rem;">
-        Estimación basada en análisis predictivo con {metadata.get('modelo_ia', 'GPT-4o')}
+        ⏳ La IA está generando la proyección; esta página se actualizará sola
+      </p>
+    </div>"""
+
+    total_pacientes = metadata.get('total_registros', 0)
+    proyeccion = insights.get("proyeccion_6_meses", {})
+    casos_estimados = proyeccion.get("nuevos_casos_estimados", 0)
+    tasa_crecimiento = proyeccion.get("tasa_crecimiento", 0)
+    if tipo == 'PLANTILLA':
+        # Sin respuesta de la IA: la proyección sale de los datos empíricos
+        titulo = "🔮 Proyección a 6 Meses (sin IA)"
+        origen = "Estimación de plantilla a partir de los datos empíricos (la IA no respondió)"
+    else:
+        titulo = "🔮 Proyección a 6 Meses (IA)"
+        origen = f"Estimación basada en análisis predictivo con {metadata.get('modelo_ia', 'GPT-4o')}"
+    return f"""
+    <!-- PROYECCIÓN IA -->
+    <div class="proyeccion-card">
+      <h2 style="font-size: 1.6rem; margin-bottom: 0.5rem;">{titulo}</h2>
+      <p style="opacity: 0.9; font-size: 0.95rem;">
+        {origen}
       </p>
       <div class="proyeccion-grid">
         <div class="proyeccion-item">
@@ -622,8 +1392,12 @@ html_template = f"""
       <p style="margin-top: 1.5rem; font-size: 0.9rem; opacity: 0.85; font-style: italic;">
         📝 {proyeccion.get('justificacion', 'Sin justificación disponible')}
       </p>
-    </div>
+    </div>"""
+
 
+def html_insights(insights, pendiente=False, tipo=None):
+    if pendiente:
+        return """
     <!-- INSIGHTS IA -->
     <div class="card">
       <div class="card-header">
@@ -631,7 +1405,26 @@ html_template = f"""
           <div class="card-icon icon-ia">🧠</div>
           Insights Generados por Inteligencia Artificial
         </div>
-        <span class="badge badge-secondary">GENERADO POR IA</span>
+        <span class="badge badge-secondary">PENDIENTE</span>
+      </div>
+      <p style="color: var(--color-text-light);">
+        ⏳ Consultando a la IA. Los datos empíricos de arriba ya son definitivos.
+      </p>
+    </div>"""
+
+    if tipo == 'PLANTILLA':
+        titulo, distintivo = "Insights de Plantilla (Datos Empíricos)", "PLANTILLA · SIN IA"
+    else:
+        titulo, distintivo = "Insights Generados por Inteligencia Artificial", "GENERADO POR IA"
+    return f"""
+    <!-- INSIGHTS IA -->
+    <div class="card">
+      <div class="card-header">
+        <div class="card-title">
+          <div class="card-icon icon-ia">🧠</div>
+          {titulo}
+        </div>
+        <span class="badge badge-secondary">{distintivo}</span>
       </div>
 
       <div class="grid-2" style="display: grid; grid-template-columns: 1fr 1fr; gap: 2rem;">
@@ -682,265 +1475,616 @@ html_template = f"""
           {''.join(f'<li>{insight}</li>' for insight in insights.get('insights_adicionales', []))}
         </ul>
       </div>
-    </div>
+    </div>"""
+
+
+def valores_graficos(empiricos, viz_data):
+    """Datos que reciben las funciones de GRAFICOS (el código de las gráficas es estático)."""
+    # Distribución por edad
+    dist_edad = viz_data.get("distribucion_edad", [])
+
+    # Edad media por sexo: de la serie ya reducida (top-N + "Otros"); los
+    # informes antiguos no la traen y se leen de los datos empíricos
+    dist_sexo = viz_data.get("distribucion_sexo", [])
+    if dist_sexo and all('edad_media' in d for d in dist_sexo):
+        edad_media = [
+            {'sexo': d['sexo'] if d['sexo'] == ETIQUETA_OTROS else 'Sexo ' + str(d['sexo']), 'edad': d['edad_media']}
+            for d in dist_sexo
+        ]
+    else:
+        edad_media = [
+            {'sexo': 'Sexo ' + str(s), 'edad': datos['edad_media']}
+            for s, datos in empiricos.get('esquizofrenia_por_sexo', {}).items()
+        ]
+
+    # Ingresos por día (reducidos con LTTB): días desde el primero, no fechas en texto
+    serie = viz_data.get("serie_ingresos", [])
+    inicio = serie[0]['fecha'] if serie else None
+    dias = [(date.fromisoformat(d['fecha']) - date.fromisoformat(inicio)).days for d in serie]
+
+    return {
+        'totalPacientes': empiricos.get("total_pacientes", 0),
+        'edadRangos': [d.get("rango", "") for d in dist_edad],
+        'edadTotales': [d.get("total", 0) for d in dist_edad],
+        'edadMediaData': edad_media,
+        'ingresosInicio': inicio,
+        'ingresosDias': dias,
+        'ingresosCasos': [d['casos'] for d in serie],
+        # Cubo compacto para el filtro cruzado (None en informes sin cubo)
+        'cubo': viz_data.get("cubo")
+    }
+
+
+def datos_graficos(empiricos, viz_data):
+    """Constante JS con los datos de las gráficas en línea."""
+    valores = json.dumps(valores_graficos(empiricos, viz_data), ensure_ascii=False).replace("</", "<\\/")
+    return f"""
+    // Datos
+    const datosGraficos = {valores};
+"""
 
-  </div>
 
-  <!-- SCRIPTS -->
-  <script>
-    // Configuración global de Chart.js
-    Chart.defaults.font.family = "'Inter', 'Segoe UI', sans-serif";
-    Chart.defaults.color = '#2D3748';
-    Chart.defaults.plugins.legend.display = true;
-    Chart.defaults.plugins.legend.position = 'bottom';
+def datos_sidecar(data):
+    """
+    Sidecar JSON de la página ligera: datos de las gráficas y filas de las tablas largas.
 
-    // Datos
-    const edadRangos = {json.dumps(edad_rangos)};
-    const edadTotales = {json.dumps(edad_totales)};
-    const sexoLabels = {json.dumps(['Sexo ' + str(s) for s in sexo_labels])};
-    const sexoValues = {json.dumps(sexo_values)};
-    
-    // Preparar datos para edad media por sexo
-    const edadMediaData = {json.dumps([
-      {'sexo': 'Sexo ' + str(s), 'edad': datos['edad_media']} 
-      for s, datos in empiricos.get('esquizofrenia_por_sexo', {}).items()
-    ])};
+    Va compacto (sin espacios) y las filas como listas en vez de objetos:
+    es lo único que crece con el número de rangos, categorías o regiones.
+    """
+    _, empiricos, _, viz_data = extraer_datos(data)
+    sidecar = {
+        'graficos': valores_graficos(empiricos, viz_data),
+        'tablas': filas_tablas(empiricos)
+    }
+    return json.dumps(sidecar, ensure_ascii=False, separators=(",", ":"))
 
-    // 1. GRÁFICA DE BARRAS - Distribución por Edad
-    const ctxEdad = document.getElementById('chartEdad').getContext('2d');
-    new Chart(ctxEdad, {{
-      type: 'bar',
-      data: {{
-        labels: edadRangos,
-        datasets: [{{
-          label: 'Número de Pacientes',
-          data: edadTotales,
-          backgroundColor: [
-            'rgba(46, 134, 171, 0.8)',
-            'rgba(162, 59, 114, 0.8)',
-            'rgba(241, 143, 1, 0.8)'
-          ],
-          borderColor: [
-            'rgba(46, 134, 171, 1)',
-            'rgba(162, 59, 114, 1)',
-            'rgba(241, 143, 1, 1)'
-          ],
-          borderWidth: 2,
-          borderRadius: 8
-        }}]
-      }},
-      options: {{
-        responsive: true,
-        maintainAspectRatio: false,
-        plugins: {{
-          legend: {{
-            display: false
-          }},
-          tooltip: {{
-            backgroundColor: 'rgba(0, 0, 0, 0.8)',
-            padding: 12,
-            titleFont: {{ size: 14, weight: 'bold' }},
-            bodyFont: {{ size: 13 }},
-            callbacks: {{
-              label: function(context) {{
-                const total = {total_pacientes};
-                const value = context.parsed;
-                const percent = ((value / total) * 100).toFixed(1);
-                return `${{context.label}}: ${{value}} pacientes (${{percent}}%)`;
-              }}
-            }}
-          }}
-        }},
-        cutout: '65%'
-      }}
-    }});
 
-    // 3. GRÁFICA DE BARRAS HORIZONTALES - Edad Media por Sexo
-    const ctxEdadMedia = document.getElementById('chartEdadMedia').getContext('2d');
-    new Chart(ctxEdadMedia, {{
-      type: 'bar',
-      data: {{
-        labels: edadMediaData.map(d => d.sexo),
-        datasets: [{{
-          label: 'Edad Media (años)',
-          data: edadMediaData.map(d => d.edad),
-          backgroundColor: [
-            'rgba(162, 59, 114, 0.8)',
-            'rgba(46, 134, 171, 0.8)'
-          ],
-          borderColor: [
-            'rgba(162, 59, 114, 1)',
-            'rgba(46, 134, 171, 1)'
-          ],
-          borderWidth: 2,
-          borderRadius: 8
-        }}]
-      }},
-      options: {{
-        indexAxis: 'y',
-        responsive: true,
-        maintainAspectRatio: false,
-        plugins: {{
-          legend: {{
-            display: false
-          }},
-          tooltip: {{
-            backgroundColor: 'rgba(0, 0, 0, 0.8)',
-            padding: 12,
-            callbacks: {{
-              label: function(context) {{
-                return `Edad media: ${{context.parsed.x.toFixed(2)}} años`;
-              }}
-            }}
-          }}
-        }},
-        scales: {{
-          x: {{
-            beginAtZero: false,
-            min: 14,
-            max: 19,
-            ticks: {{
-              font: {{ size: 12 }}
-            }},
-            grid: {{
-              color: 'rgba(0, 0, 0, 0.05)'
-            }}
-          }},
-          y: {{
-            ticks: {{
-              font: {{ size: 13, weight: '500' }}
-            }},
-            grid: {{
-              display: false
-            }}
-          }}
-        }}
-      }}
-    }});
+def ruta_sidecar(ruta_html):
+    """informe.html -> informe.datos.json (la página lo pide con el mismo nombre)."""
+    ruta_html = Path(ruta_html)
+    return ruta_html.with_name(ruta_html.stem + ".datos.json")
 
-    // 4. GRÁFICA DE LÍNEA - Concentración de Casos
-    const ctxConcentracion = document.getElementById('chartConcentracion').getContext('2d');
-    const porcentajes = edadTotales.map(val => ((val / {total_pacientes}) * 100).toFixed(1));
-    
-    new Chart(ctxConcentracion, {{
-      type: 'line',
-      data: {{
-        labels: edadRangos,
-        datasets: [{{
-          label: 'Porcentaje de Casos (%)',
-          data: porcentajes,
-          borderColor: 'rgba(241, 143, 1, 1)',
-          backgroundColor: 'rgba(241, 143, 1, 0.1)',
-          borderWidth: 3,
-          fill: true,
-          tension: 0.4,
-          pointBackgroundColor: 'rgba(241, 143, 1, 1)',
-          pointBorderColor: '#fff',
-          pointBorderWidth: 2,
-          pointRadius: 6,
-          pointHoverRadius: 8
-        }}]
-      }},
-      options: {{
-        responsive: true,
-        maintainAspectRatio: false,
-        plugins: {{
-          legend: {{
-            display: false
-          }},
-          tooltip: {{
-            backgroundColor: 'rgba(0, 0, 0, 0.8)',
-            padding: 12,
-            callbacks: {{
-              label: function(context) {{
-                return `${{context.parsed.y}}% de los casos`;
-              }}
-            }}
-          }}
-        }},
-        scales: {{
-          y: {{
-            beginAtZero: true,
-            max: 100,
-            ticks: {{
-              callback: function(value) {{
-                return value + '%';
-              }},
-              font: {{ size: 12 }}
-            }},
-            grid: {{
-              color: 'rgba(0, 0, 0, 0.05)'
-            }}
-          }},
-          x: {{
-            ticks: {{
-              font: {{ size: 12, weight: '500' }}
-            }},
-            grid: {{
-              display: false
-            }}
-          }}
-        }}
-      }}
-    }});
 
-    // Animaciones de entrada
-    const observer = new IntersectionObserver((entries) => {{
-      entries.forEach(entry => {{
-        if (entry.isIntersecting) {{
-          entry.target.style.opacity = '1';
-          entry.target.style.transform = 'translateY(0)';
-        }}
-      }});
-    }}, {{ threshold: 0.1 }});
+def escribir_sidecar(data, ruta_html, comprimir=False):
+    """Escribe el sidecar junto al HTML de forma atómica; devuelve sus bytes."""
+    ruta = ruta_sidecar(ruta_html)
+    contenido = datos_sidecar(data).encode("utf-8")
+    temporal = ruta.with_suffix(f".{os.getpid()}.tmp")
+    temporal.write_bytes(contenido)
+    temporal.replace(ruta)
+    if comprimir:
+        escribir_comprimidos(ruta)
+    return len(contenido)
 
-    document.querySelectorAll('.card').forEach(card => {{
-      card.style.opacity = '0';
-      card.style.transform = 'translateY(20px)';
-      card.style.transition = 'all 0.5s ease-out';
-      observer.observe(card);
-    }});
 
+def html_pie(metadata, empiricos):
+    total_pacientes = empiricos.get("total_pacientes", 0)
+    return f"""
+  <script>
     // Mensaje en consola
     console.log('%c📊 Dashboard Clínico Profesional', 'font-size: 20px; color: #2E86AB; font-weight: bold;');
     console.log('%c🤖 Análisis generado con IA: {metadata.get("modelo_ia", "GPT-4o")}', 'font-size: 14px; color: #A23B72;');
     console.log('%c📅 Fecha: {metadata.get("fecha_analisis", "N/A")}', 'font-size: 12px; color: #718096;');
     console.log('%c👥 Total pacientes analizados: {total_pacientes}', 'font-size: 12px; color: #718096;');
-  </script>
+  </script>"""
 
-  <!-- FOOTER -->
-  <footer style="text-align: center; padding: 2rem; color: var(--color-text-light); margin-top: 3rem;">
-    <p style="font-size: 0.9rem;">
-      ⚕️ <strong>Dashboard Clínico Profesional</strong> | 
-      Generado automáticamente el {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-    </p>
-    <p style="font-size: 0.85rem; margin-top: 0.5rem; opacity: 0.8;">
-      🏆 Premio Indra al uso y la integración de la Inteligencia Artificial
-    </p>
-    <p style="font-size: 0.8rem; margin-top: 1rem; opacity: 0.7;">
+
+def html_creditos(metadata):
+    return f"""    <p style="font-size: 0.8rem; margin-top: 1rem; opacity: 0.7;">
       Los datos empíricos provienen de {metadata.get('fuente_datos', 'Oracle Database')} | 
       Los insights son generados por {metadata.get('modelo_ia', 'GPT-4o')}
-    </p>
-  </footer>
+    </p>"""
+
+
+# === RENDER ===
+def cubo_en_pagina(cubo, perezoso=False):
+    """
+    Cubo del filtro cruzado que usa la página (None si no lleva filtro).
+
+    La página ligera lo pide al sidecar con el resto de datos; la completa
+    solo lo lleva en línea si tiene hasta MAX_CELDAS_EN_LINEA celdas.
+    """
+    if not cubo or (not perezoso and cubo.get('celdas', 0) > MAX_CELDAS_EN_LINEA):
+        return None
+    return cubo
+
+
+def partes_informe(data, perezoso=False):
+    """Partes del informe (y modo de la página) de las que dependen las secciones."""
+    metadata, empiricos, insights, viz_data = extraer_datos(data)
+    return {
+        'perezoso': perezoso,
+        'metadata': metadata,
+        'estadisticas': empiricos,
+        'contenido': insights,
+        # Las gráficas no usan las tasas (incluyen la proyección de la IA)
+        'distribucion_edad': viz_data.get("distribucion_edad", []),
+        'distribucion_sexo': viz_data.get("distribucion_sexo", []),
+        'serie_ingresos': viz_data.get("serie_ingresos", []),
+        'cubo': cubo_en_pagina(viz_data.get("cubo"), perezoso),
+        'pendiente': insights_pendientes(data),
+        # PLANTILLA si la IA no respondió: la página no lo presenta como salida de la IA
+        'tipo_insights': data.get("insights_ia", {}).get("tipo")
+    }
+
+
+# Cada hueco de la plantilla: partes del informe que usa y cómo se genera.
+# Las secciones sin dependencias (None) cambian en cada render y nunca se cachean.
+SECCIONES = {
+    'recarga': (
+        ('pendiente',),
+        lambda p: f'  <meta http-equiv="refresh" content="{RECARGA_PARCIAL}" />\n' if p['pendiente'] else ''
+    ),
+    'cabecera': (('metadata',), lambda p: html_cabecera(p['metadata'])),
+    'kpis': (('estadisticas',), lambda p: html_kpis(p['estadisticas'])),
+    'tablas': (('estadisticas', 'perezoso'), lambda p: html_tablas(p['estadisticas'], p['perezoso'])),
+    'proyeccion': (
+        ('metadata', 'contenido', 'pendiente', 'tipo_insights'),
+        lambda p: html_proyeccion(p['metadata'], p['contenido'], p['pendiente'], p['tipo_insights'])
+    ),
+    'insights': (
+        ('contenido', 'pendiente', 'tipo_insights'),
+        lambda p: html_insights(p['contenido'], p['pendiente'], p['tipo_insights'])
+    ),
+    'datos_graficos': (
+        ('estadisticas', 'distribucion_edad', 'distribucion_sexo', 'serie_ingresos', 'cubo'),
+        lambda p: datos_graficos(p['estadisticas'], {
+            serie: p[serie] for serie in ('distribucion_edad', 'distribucion_sexo', 'serie_ingresos', 'cubo')
+        })
+    ),
+    'filtro_cruzado': (('cubo',), lambda p: FILTRO_CRUZADO if p['cubo'] else SIN_FILTRO_CRUZADO),
+    'estilos_filtro': (('cubo',), lambda p: "  <style>\n" + ESTILOS_FILTRO + "  </style>\n" if p['cubo'] else ""),
+    'pie': (('metadata', 'estadisticas'), lambda p: html_pie(p['metadata'], p['estadisticas'])),
+    'creditos': (('metadata',), lambda p: html_creditos(p['metadata'])),
+    'generado': (None, lambda p: datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+}
+
+
+def plantilla_render(paquete=None, perezoso=False):
+    """Plantilla compilada y modo perezoso efectivos (el paquete fija su propio modo)."""
+    if paquete is not None:
+        return paquete.plantilla, paquete.perezoso
+    if perezoso:
+        return PLANTILLA_PEREZOSA_COMPILADA, True
+    return (TROZOS_DASHBOARD, HUECOS_DASHBOARD), False
+
+
+def secciones(data, perezoso=False, huecos=None):
+    """
+    Contenido de cada hueco de la plantilla para un informe.
+
+    Args:
+        huecos: (Opcional) Solo estos huecos (la página ligera no tiene datos_graficos)
+    """
+    partes = partes_informe(data, perezoso)
+    return {nombre: generar(partes) for nombre, (_, generar) in SECCIONES.items()
+            if huecos is None or nombre in huecos}
+
+
+def ensamblar(valores, plantilla=None):
+    """
+    Intercala el contenido de los huecos con los trozos estáticos de la plantilla.
+
+    Args:
+        plantilla: (Opcional) (trozos, huecos) compilados; default: la del dashboard
+    """
+    trozos, huecos = plantilla or (TROZOS_DASHBOARD, HUECOS_DASHBOARD)
+    partes = [trozos[0]]
+    for hueco, trozo in zip(huecos, trozos[1:]):
+        partes.append(valores[hueco])
+        partes.append(trozo)
+    return ''.join(partes)
+
+
+def render(data, paquete=None, perezoso=False):
+    """
+    Construye el dashboard completo a partir de un informe (dict).
+
+    Si los insights están pendientes (informe parcial) se muestran los
+    datos empíricos y las gráficas, y la página se recarga cada
+    RECARGA_PARCIAL segundos hasta que llegue la versión final.
+
+    Args:
+        paquete: (Opcional) PaqueteDashboard para una página sin CDN
+        perezoso: Si True genera la página ligera; los datos van en el
+            sidecar (datos_sidecar), que hay que escribir junto al HTML
+    """
+    plantilla, perezoso = plantilla_render(paquete, perezoso)
+    return ensamblar(secciones(data, perezoso, plantilla[1]), plantilla)
+
+
+# === RENDER INCREMENTAL ===
+# Cambia con cualquier cambio de este módulo (plantillas y generadores de las
+# secciones): invalida la caché de fragmentos y el manifiesto del sitio
+VERSION_SECCIONES = hash_contenido(Path(__file__).read_bytes())[:12]
+
+# Fragmentos que se guardan en memoria (los usados más recientemente): un
+# servidor que vigila muchos informes durante horas no crece sin límite
+MAX_FRAGMENTOS = 256
+
+
+class RenderIncremental:
+    """
+    Render que solo regenera las secciones cuyas entradas han cambiado.
+
+    Cada sección se identifica por el hash de las partes del informe que
+    usa (metadata, estadísticas, insights, datos de las gráficas). Los
+    fragmentos ya generados se guardan en memoria y, si se indica
+    directorio, en disco, así que un refresco que solo cambia los insights
+    reutiliza KPIs, tablas y datos de las gráficas y solo regenera las
+    secciones de la IA antes de volver a ensamblar la página. En memoria
+    solo se guardan los MAX_FRAGMENTOS usados más recientemente.
+    """
+
+    def __init__(self, directorio=None, paquete=None, perezoso=False):
+        """
+        Args:
+            directorio: (Opcional) Carpeta de la caché de fragmentos en disco
+            paquete: (Opcional) PaqueteDashboard para una página sin CDN
+            perezoso: Si True genera la página ligera (datos en el sidecar)
+        """
+        self.directorio = Path(directorio) if directorio else None
+        self.paquete = paquete
+        self.plantilla, self.perezoso = plantilla_render(paquete, perezoso)
+        self.fragmentos = {}
+        self.ultimo = {'reutilizadas': [], 'generadas': []}
+        if self.directorio is not None:
+            self.directorio.mkdir(parents=True, exist_ok=True)
+
+    def _recordar(self, clave, fragmento):
+        """Guarda el fragmento en memoria como el más reciente y descarta los más antiguos."""
+        self.fragmentos.pop(clave, None)
+        self.fragmentos[clave] = fragmento
+        while len(self.fragmentos) > MAX_FRAGMENTOS:
+            del self.fragmentos[next(iter(self.fragmentos))]
+
+    def _leer(self, clave):
+        if clave in self.fragmentos:
+            self._recordar(clave, self.fragmentos[clave])
+            return self.fragmentos[clave]
+        if self.directorio is not None:
+            ruta = self.directorio / f"{clave}.html"
+            if ruta.exists():
+                self._recordar(clave, ruta.read_text(encoding="utf-8"))
+                return self.fragmentos[clave]
+        return None
+
+    def _guardar(self, clave, fragmento):
+        self._recordar(clave, fragmento)
+        if self.directorio is not None:
+            ruta = self.directorio / f"{clave}.html"
+            temporal = ruta.with_suffix(f".{os.getpid()}.tmp")
+            temporal.write_text(fragmento, encoding="utf-8")
+            temporal.replace(ruta)
+
+    def render(self, data):
+        """Como render(data), regenerando solo las secciones con entradas nuevas."""
+        partes = partes_informe(data, self.perezoso)
+        hashes = {nombre: hash_parametros({'valor': valor}) for nombre, valor in partes.items()}
+        self.ultimo = {'reutilizadas': [], 'generadas': []}
+
+        valores = {}
+        for nombre, (dependencias, generar) in SECCIONES.items():
+            if nombre not in self.plantilla[1]:
+                continue
+            if dependencias is None:
+                valores[nombre] = generar(partes)
+                continue
+            clave = hash_parametros({
+                'seccion': nombre,
+                'version': VERSION_SECCIONES,
+                'entradas': [hashes[dependencia] for dependencia in dependencias]
+            })[:32]
+            fragmento = self._leer(clave)
+            if fragmento is None:
+                fragmento = generar(partes)
+                self._guardar(clave, fragmento)
+                self.ultimo['generadas'].append(nombre)
+            else:
+                self.ultimo['reutilizadas'].append(nombre)
+            valores[nombre] = fragmento
+        return ensamblar(valores, self.plantilla)
+
+
+# === PAQUETE OFFLINE ===
+# Librerías que se vendorizan: se descargan una sola vez a DIRECTORIO_VENDOR
+# (o se copian ahí a mano en una máquina sin red)
+LIBRERIAS_VENDOR = {
+    "chart.umd.js": "https://cdn.jsdelivr.net/npm/chart.js@4/dist/chart.umd.js",
+    "chartjs-plugin-datalabels.min.js":
+        "https://cdn.jsdelivr.net/npm/chartjs-plugin-datalabels@2/dist/chartjs-plugin-datalabels.min.js"
+}
+DIRECTORIO_VENDOR = "vendor"
+
+# Carpeta de los activos compartidos, relativa a los HTML
+DIRECTORIO_ACTIVOS = "activos"
+
+
+def vendorizar(directorio=DIRECTORIO_VENDOR):
+    """Código de las librerías de LIBRERIAS_VENDOR, descargándolas solo si faltan."""
+    directorio = Path(directorio)
+    directorio.mkdir(parents=True, exist_ok=True)
+    codigo = []
+    for nombre, url in LIBRERIAS_VENDOR.items():
+        ruta = directorio / nombre
+        if not ruta.exists():
+            print(f"⬇️ Descargando {url}")
+            try:
+                with urllib.request.urlopen(url, timeout=30) as respuesta:
+                    ruta.write_bytes(respuesta.read())
+            except OSError as e:
+                raise RuntimeError(f"No se pudo descargar {url} ({e}); cópialo a mano en {ruta}") from e
+        codigo.append(ruta.read_text(encoding="utf-8"))
+    return codigo
+
+
+def minificar_css(css):
+    """Quita comentarios y espacios sobrantes del CSS."""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.DOTALL)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    css = re.sub(r":\s+", ":", css)
+    return css.replace(";}", "}").strip()
+
+
+def minificar_js(js):
+    """
+    Minificado conservador del código propio de las gráficas.
+
+    Solo quita sangría, líneas vacías y comentarios de línea completa; no
+    toca el interior de las líneas (cadenas y plantillas quedan intactas).
+    """
+    lineas = (linea.strip() for linea in js.splitlines())
+    return "\n".join(linea for linea in lineas if linea and not linea.startswith("//"))
+
+
+def fijar_hueco(plantilla, nombre, valor):
+    """Sustituye un hueco de una plantilla compilada por un texto fijo (sin volver a partirla)."""
+    trozos, huecos = list(plantilla[0]), list(plantilla[1])
+    k = huecos.index(nombre)
+    trozos[k:k + 2] = [trozos[k] + valor + trozos[k + 1]]
+    del huecos[k]
+    return trozos, huecos
+
+
+def escribir_comprimidos(ruta):
+    """Escribe las variantes .gz (y .br si hay brotli) junto al archivo."""
+    ruta = Path(ruta)
+    datos = ruta.read_bytes()
+    Path(f"{ruta}.gz").write_bytes(gzip.compress(datos, compresslevel=9, mtime=0))
+    if brotli is not None:
+        Path(f"{ruta}.br").write_bytes(brotli.compress(datos, quality=11))
+
+
+class PaqueteDashboard:
+    """
+    Dashboard sin dependencias de red.
+
+    Chart.js y chartjs-plugin-datalabels se vendorizan una vez y se unen
+    con el código de las gráficas en un JS minificado; el CSS se minifica.
+    En modo 'compartido' ambos se escriben como activos con hash de
+    contenido (cacheables indefinidamente y compartidos por todos los
+    HTML); en modo 'inline' van dentro de cada HTML (un único archivo).
+    """
+
+    def __init__(self, modo="compartido", directorio_vendor=DIRECTORIO_VENDOR, perezoso=False):
+        """
+        Args:
+            modo: 'compartido' (activos con hash) o 'inline' (un solo archivo)
+            directorio_vendor: Carpeta con las librerías vendorizadas
+            perezoso: Si True la página no lleva datos y los pide al sidecar
+        """
+        if modo not in ("compartido", "inline"):
+            raise ValueError(f"Modo de paquete desconocido: {modo}")
+        self.modo = modo
+        self.perezoso = perezoso
+        # Las constantes de datos van en un <script> propio antes del paquete
+        # y el arranque de las gráficas en otro después
+        codigo = vendorizar(directorio_vendor) + [minificar_js(
+            CONFIGURACION_GRAFICOS + CODIGO_GRAFICOS + FILTRO_CRUZADO + TABLA_PAGINADA)]
+        self.js = "\n;".join(codigo).replace("</script", "<\\/script")
+        self.css = minificar_css(ESTILOS + ESTILOS_FILTRO + ESTILOS_PAGINACION)
+        self.hash = hash_contenido((self.js + self.css).encode("utf-8"))[:12]
+        self.nombre_js = f"dashboard.{self.hash}.js"
+        self.nombre_css = f"dashboard.{self.hash}.css"
+
+        datos = "" if perezoso else "  <script>{{datos_graficos}}  </script>\n"
+        arranque = "  <script>{{__arranque__}}  </script>\n"
+        if modo == "inline":
+            plantilla = compilar_plantilla(componer_plantilla(
+                "", "  <style>{{__css__}}</style>\n", datos + "  <script>{{__js__}}</script>\n" + arranque
+            ))
+            # El código se fija después de compilar: nunca se interpreta como huecos
+            plantilla = fijar_hueco(fijar_hueco(plantilla, "__css__", self.css), "__js__", self.js)
+        else:
+            plantilla = compilar_plantilla(componer_plantilla(
+                "",
+                f'  <link rel="stylesheet" href="{DIRECTORIO_ACTIVOS}/{self.nombre_css}" />\n',
+                datos + f'  <script src="{DIRECTORIO_ACTIVOS}/{self.nombre_js}"></script>\n' + arranque
+            ))
+        self.plantilla = fijar_hueco(plantilla, "__arranque__",
+                                     ARRANQUE_PEREZOSO if perezoso else ARRANQUE_GRAFICOS)
+
+    def escribir_activos(self, directorio, comprimir=False):
+        """Escribe los activos compartidos junto a los HTML (solo si no existen ya)."""
+        if self.modo != "compartido":
+            return
+        carpeta = Path(directorio) / DIRECTORIO_ACTIVOS
+        carpeta.mkdir(parents=True, exist_ok=True)
+        for nombre, contenido in ((self.nombre_js, self.js), (self.nombre_css, self.css)):
+            ruta = carpeta / nombre
+            if not ruta.exists():
+                ruta.write_text(contenido, encoding="utf-8")
+            if comprimir and not Path(f"{ruta}.gz").exists():
+                escribir_comprimidos(ruta)
 
-</body>
-</html>
-"""
 
 # === GUARDAR EL HTML ===
-Path(OUTPUT_HTML_FILE).write_text(html_template, encoding="utf-8")
-print(f"✅ Dashboard profesional generado: {OUTPUT_HTML_FILE}")
-print(f"📊 Estadísticas incluidas:")
-print(f"   - Total pacientes: {total_pacientes}")
-print(f"   - Edad media: {edad_media:.2f} ± {edad_std:.2f} años")
-print(f"   - Coeficiente de variación: {cv:.2f}%")
-print(f"   - 4 gráficas interactivas generadas")
-print(f"   - Proyección IA a 6 meses incluida")
-print(f"\n🎨 Características del dashboard:")
-print(f"   ✓ Diseño profesional y moderno")
-print(f"   ✓ Gráficas interactivas con Chart.js")
-print(f"   ✓ Diferenciación clara datos empíricos vs IA")
-print(f"   ✓ KPIs destacados")
-print(f"   ✓ Responsive design")
-print(f"   ✓ Animaciones suaves")
-print(f"\n🚀 Abre el archivo '{OUTPUT_HTML_FILE}' en tu navegador")
+def guardar_dashboard(data, ruta=OUTPUT_HTML_FILE, renderizador=None, paquete=None, comprimir=False,
+                      perezoso=False):
+    """
+    Genera el dashboard y lo escribe de forma atómica (el navegador nunca ve una página a medias).
+
+    Args:
+        renderizador: (Opcional) RenderIncremental para reutilizar secciones
+        paquete: (Opcional) PaqueteDashboard para una página sin CDN
+        comprimir: Si True escribe también las variantes .gz/.br
+        perezoso: Si True escribe la página ligera y su sidecar de datos
+    """
+    ruta = Path(ruta)
+    if renderizador is not None:
+        html = renderizador.render(data)
+        perezoso = renderizador.perezoso
+    else:
+        html = render(data, paquete, perezoso)
+        perezoso = plantilla_render(paquete, perezoso)[1]
+    if paquete is not None:
+        paquete.escribir_activos(ruta.parent, comprimir)
+    # El sidecar se escribe antes que la página que lo pide
+    if perezoso:
+        escribir_sidecar(data, ruta, comprimir)
+    temporal = ruta.with_suffix(ruta.suffix + '.tmp')
+    temporal.write_text(html, encoding="utf-8")
+    temporal.replace(ruta)
+    if comprimir:
+        escribir_comprimidos(ruta)
+    return html
+
+
+# === RENDER POR LOTES ===
+# Estado de cada proceso del pool (se fija una vez en _iniciar_proceso)
+_RENDER_PROCESO = {'renderizador': None, 'paquete': None, 'comprimir': False, 'perezoso': False}
+
+
+def _iniciar_proceso(cache, paquete, comprimir, perezoso=False):
+    """Prepara el proceso: un RenderIncremental por proceso (comparten la caché en disco)."""
+    _RENDER_PROCESO['renderizador'] = RenderIncremental(cache, paquete, perezoso) if cache else None
+    _RENDER_PROCESO['paquete'] = paquete
+    _RENDER_PROCESO['comprimir'] = comprimir
+    _RENDER_PROCESO['perezoso'] = plantilla_render(paquete, perezoso)[1]
+
+
+def _renderizar_archivo(tarea):
+    """Renderiza un informe JSON a HTML (se ejecuta en los procesos del pool)."""
+    entrada, salida = tarea
+    with open(entrada, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    renderizador = _RENDER_PROCESO['renderizador']
+    if renderizador is not None:
+        html = renderizador.render(data)
+    else:
+        html = render(data, _RENDER_PROCESO['paquete'], _RENDER_PROCESO['perezoso'])
+    tamano = 0
+    if _RENDER_PROCESO['perezoso']:
+        tamano = escribir_sidecar(data, salida, _RENDER_PROCESO['comprimir'])
+    Path(salida).write_text(html, encoding="utf-8")
+    if _RENDER_PROCESO['comprimir']:
+        escribir_comprimidos(salida)
+    return tamano + len(html.encode("utf-8"))
+
+
+def renderizar_lote(entradas, directorio_salida, procesos=None, bloque=32, cache=None,
+                    paquete=None, comprimir=False, perezoso=False):
+    """
+    Renderiza muchos informes en un pool de procesos.
+
+    Args:
+        entradas: Rutas de informes JSON o carpetas con informes
+        directorio_salida: Carpeta de los HTML (mismo nombre que cada JSON)
+        procesos: Procesos del pool (default: núcleos disponibles)
+        bloque: Informes que recibe cada proceso por envío
+        cache: (Opcional) Carpeta de la caché de secciones (RenderIncremental)
+        paquete: (Opcional) PaqueteDashboard; los activos se escriben una vez
+        comprimir: Si True escribe también las variantes .gz/.br
+        perezoso: Si True páginas ligeras con su sidecar de datos
+
+    Returns:
+        Lista de (ruta HTML, bytes del HTML y su sidecar)
+    """
+    rutas = []
+    for entrada in map(Path, entradas):
+        if entrada.is_dir():
+            # Los sidecars .datos.json de --perezoso no son informes
+            rutas.extend(ruta for ruta in sorted(entrada.glob("*.json"))
+                         if not ruta.name.endswith(".datos.json"))
+        else:
+            rutas.append(entrada)
+
+    directorio = Path(directorio_salida)
+    directorio.mkdir(parents=True, exist_ok=True)
+    if paquete is not None:
+        paquete.escribir_activos(directorio, comprimir)
+    tareas = [(str(ruta), str(directorio / f"{ruta.stem}.html")) for ruta in rutas]
+
+    inicio = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar_proceso,
+                             initargs=(cache, paquete, comprimir, perezoso)) as pool:
+        tamanos = list(pool.map(_renderizar_archivo, tareas, chunksize=bloque))
+    segundos = time.perf_counter() - inicio
+
+    print(f"✅ {len(tareas)} dashboards en {directorio} ({segundos:.2f} s, "
+          f"{segundos / max(len(tareas), 1) * 1000:.2f} ms por informe, {sum(tamanos) / 1e6:.1f} MB)")
+    return [(salida, tamano) for (_, salida), tamano in zip(tareas, tamanos)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera el dashboard HTML de uno o muchos informes")
+    parser.add_argument("entradas", nargs="*", default=[INPUT_JSON_FILE],
+                        help="Informes JSON o carpetas con informes (default: %(default)s)")
+    parser.add_argument("--salida", help="Carpeta de salida: activa el render por lotes")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos del pool (default: núcleos)")
+    parser.add_argument("--cache", help="Carpeta de la caché de secciones (solo regenera lo que cambia)")
+    parser.add_argument("--paquete", choices=["compartido", "inline"],
+                        help="Sin CDN: activos compartidos con hash o todo en un único HTML")
+    parser.add_argument("--vendor", default=DIRECTORIO_VENDOR,
+                        help="Carpeta de las librerías vendorizadas (default: %(default)s)")
+    parser.add_argument("--comprimir", action="store_true", help="Escribe también las variantes .gz/.br")
+    parser.add_argument("--perezoso", action="store_true",
+                        help="Página ligera: datos en un sidecar JSON, gráficas al entrar en pantalla")
+    parser.add_argument("--servir", type=int, nargs="?", const=8000, metavar="PUERTO",
+                        help="Servidor local en vivo: vigila los informes y recarga los navegadores")
+    parser.add_argument("--comparar", metavar="HTML",
+                        help="Página de comparación de todos los informes (datos en sidecar con --perezoso)")
+    parser.add_argument("--sitio", metavar="CARPETA",
+                        help="Sitio estático: un dashboard por informe, activos compartidos e índice con búsqueda")
+    parser.add_argument("--forzar", action="store_true", help="Con --sitio, renderiza aunque esté al día")
+    args = parser.parse_args()
+
+    paquete = PaqueteDashboard(args.paquete, args.vendor, args.perezoso) if args.paquete else None
+    if args.servir is not None:
+        from servidor_dashboard import ServidorDashboard
+        ServidorDashboard(args.entradas, paquete, args.perezoso).servir(args.servir)
+    elif args.comparar:
+        from comparacion_informes import guardar_comparacion
+        guardar_comparacion(args.entradas, args.comparar, paquete, args.perezoso, args.comprimir)
+    elif args.sitio:
+        from sitio_estatico import construir_sitio
+        construir_sitio(args.entradas, args.sitio, args.procesos, paquete, args.perezoso, args.comprimir,
+                        args.forzar, args.vendor)
+    elif args.salida or len(args.entradas) > 1:
+        renderizar_lote(args.entradas, args.salida or ".", args.procesos, cache=args.cache,
+                        paquete=paquete, comprimir=args.comprimir, perezoso=args.perezoso)
+    else:
+        # === CARGAR EL JSON ===
+        with open(args.entradas[0], "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        renderizador = RenderIncremental(args.cache, paquete, args.perezoso) if args.cache else None
+        guardar_dashboard(data, OUTPUT_HTML_FILE, renderizador, paquete, args.comprimir, args.perezoso)
+        empiricos = extraer_datos(data)[1]
+        total_pacientes, edad_media, edad_std, _, _, cv = estadisticas_edad(empiricos)
+        print(f"✅ Dashboard profesional generado: {OUTPUT_HTML_FILE}")
+        print(f"📊 Estadísticas incluidas:")
+        print(f"   - Total pacientes: {total_pacientes}")
+        print(f"   - Edad media: {edad_media:.2f} ± {edad_std:.2f} años")
+        print(f"   - Coeficiente de variación: {cv:.2f}%")
+        print(f"   - 4 gráficas interactivas generadas")
+        print(f"   - Proyección IA a 6 meses incluida")
+        print(f"\n🎨 Características del dashboard:")
+        print(f"   ✓ Diseño profesional y moderno")
+        print(f"   ✓ Gráficas interactivas con Chart.js")
+        print(f"   ✓ Diferenciación clara datos empíricos vs IA")
+        print(f"   ✓ KPIs destacados")
+        print(f"   ✓ Responsive design")
+        print(f"   ✓ Animaciones suaves")
+        print(f"\n🚀 Abre el archivo '{OUTPUT_HTML_FILE}' en tu navegador")
@@ -0,0 +1,168 @@
+import pandas as pd
+import time
+from typing import Dict, Any
+from dimension_categoria import ejecutar_ddl
+
+# oracledb solo hace falta con el backend de Oracle
+# pip install oracledb
+try:
+    import oracledb
+except ImportError:
+    oracledb = None
+
+
+# ============================================================================
+# VISTA MATERIALIZADA RESUMEN (EDAD x SEXO x CATEGORÍA x MES)
+# ============================================================================
+#
+# El grano guarda la edad exacta, así que cualquier filtro EDAD < X, los
+# rangos de edad del cubo y la media/desviación/mín/máx de la edad se
+# calculan exactamente desde el resumen. Solo usa COUNT(*), por lo que la
+# vista admite refresco rápido (incremental) con inserciones, borrados y
+# actualizaciones.
+
+VISTA_RESUMEN = 'MV_RESUMEN_COHORTE'
+
+DDL_LOG = """
+CREATE MATERIALIZED VIEW LOG ON {tabla}
+WITH ROWID, SEQUENCE ({columnas})
+INCLUDING NEW VALUES
+"""
+
+DDL_VISTA = """
+CREATE MATERIALIZED VIEW {vista}
+BUILD IMMEDIATE
+REFRESH FAST ON DEMAND
+ENABLE QUERY REWRITE
+AS
+SELECT {select},
+       COUNT(*) AS CASOS
+FROM {tabla}
+GROUP BY {grupo}
+"""
+
+DDL_INDICE = """
+CREATE INDEX IX_{vista} ON {vista} (EDAD, SEXO)
+"""
+
+QUERY_RESUMEN = """
+SELECT {columnas}
+FROM {vista}
+WHERE EDAD < :filtro_edad
+  AND "Categoría" LIKE :patron
+  AND SEXO IS NOT NULL
+"""
+
+
+def crear_resumen(conexion, tabla: str = "SALUDMENTAL", columna_fecha: str = None,
+                  vista: str = VISTA_RESUMEN):
+    """
+    Crea el log de la tabla y la vista materializada resumen (idempotente).
+
+    Args:
+        conexion: Conexión de Oracle
+        tabla: Tabla de hechos (default: SALUDMENTAL)
+        columna_fecha: (Opcional) Columna de fecha de ingreso para el grano mensual
+        vista: Nombre de la vista materializada
+    """
+    print(f"🏗️ Creando resumen {vista} sobre {tabla}...")
+    grano = ['EDAD', 'SEXO', '"Categoría"']
+    columnas_log = grano + ([columna_fecha] if columna_fecha else [])
+    select = grano + ([f"TRUNC({columna_fecha}, 'MM') AS MES"] if columna_fecha else [])
+    # En el GROUP BY va la expresión, no el alias
+    grupo = grano + ([f"TRUNC({columna_fecha}, 'MM')"] if columna_fecha else [])
+
+    cursor = conexion.cursor()
+    try:
+        ejecutar_ddl(
+            cursor,
+            DDL_LOG.format(tabla=tabla, columnas=', '.join(columnas_log)),
+            f"Log de vista materializada en {tabla}"
+        )
+        ejecutar_ddl(
+            cursor,
+            DDL_VISTA.format(
+                vista=vista, tabla=tabla, select=', '.join(select), grupo=', '.join(grupo)
+            ),
+            f"Vista materializada {vista}"
+        )
+        ejecutar_ddl(cursor, DDL_INDICE.format(vista=vista), f"Índice IX_{vista}")
+    finally:
+        cursor.close()
+
+
+def refrescar_resumen(conexion, vista: str = VISTA_RESUMEN):
+    """
+    Refresca el resumen tras una carga de datos.
+
+    Usa el refresco rápido (solo aplica los cambios del log); si Oracle no
+    puede hacerlo (p.ej. tras una carga directa sin log) hace uno completo.
+    """
+    inicio = time.perf_counter()
+    cursor = conexion.cursor()
+    try:
+        try:
+            cursor.callproc('DBMS_MVIEW.REFRESH', [vista, 'F'])
+            metodo = 'rápido'
+        except oracledb.DatabaseError as e:
+            print(f"⚠️ Refresco rápido no disponible ({e}), se hace completo")
+            cursor.callproc('DBMS_MVIEW.REFRESH', [vista, 'C'])
+            metodo = 'completo'
+    finally:
+        cursor.close()
+    print(f"🔄 Resumen {vista} refrescado ({metodo}) en {time.perf_counter() - inicio:.2f} s")
+
+
+def fecha_refresco(conexion, vista: str = VISTA_RESUMEN):
+    """Fecha del último refresco del resumen (None si la vista no existe)."""
+    cursor = conexion.cursor()
+    try:
+        cursor.execute(
+            "SELECT LAST_REFRESH_DATE FROM USER_MVIEWS WHERE MVIEW_NAME = :vista",
+            vista=vista.upper()
+        )
+        fila = cursor.fetchone()
+    finally:
+        cursor.close()
+    return fila[0] if fila else None
+
+
+def leer_resumen(conexion, filtro_edad: int, patron_categoria: str,
+                 con_mes: bool = False, vista: str = VISTA_RESUMEN) -> pd.DataFrame:
+    """
+    Lee las filas del resumen que cubren la cohorte (unos cientos de filas).
+
+    Returns:
+        DataFrame [EDAD, SEXO, Categoría, (MES), CASOS]
+    """
+    columnas = ['EDAD', 'SEXO', '"Categoría"'] + (['MES'] if con_mes else []) + ['CASOS']
+    query = QUERY_RESUMEN.format(columnas=', '.join(columnas), vista=vista)
+    return pd.read_sql(
+        query, conexion, params={'filtro_edad': filtro_edad, 'patron': patron_categoria}
+    )
+
+
+def conteos_mensuales(resumen: pd.DataFrame, columnas_cohorte: list) -> pd.DataFrame:
+    """Convierte el resumen a la tabla de conteos que espera pronostico.pronosticar_conteos."""
+    fechas = pd.to_datetime(resumen['MES'], errors='coerce')
+    validas = fechas.notna()
+    conteos = resumen.loc[validas, list(columnas_cohorte)].copy()
+    conteos['MES'] = fechas[validas].dt.year * 12 + fechas[validas].dt.month - 1
+    conteos['CASOS'] = resumen.loc[validas, 'CASOS']
+    return (
+        conteos.groupby(list(columnas_cohorte) + ['MES'], dropna=False, sort=False)['CASOS']
+        .sum()
+        .reset_index()
+    )
+
+
+def cohorte_resumible(columnas_extra: list = None, condiciones_extra: list = None,
+                      muestra: Dict[str, Any] = None) -> bool:
+    """
+    Indica si la cohorte pedida se puede responder desde el grano del resumen.
+
+    La consulta de la cohorte solo trae EDAD, SEXO, "Categoría" y la fecha,
+    así que sin columnas ni condiciones extra y sin muestreo el resumen da
+    exactamente el mismo cubo y los mismos conteos mensuales.
+    """
+    return not (columnas_extra or condiciones_extra or muestra)
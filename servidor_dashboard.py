@@ -0,0 +1,260 @@
+import gzip
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from urllib.parse import urlsplit, unquote
+from ejecucion_reanudable import hash_contenido
+from render_json_html import RenderIncremental, datos_sidecar, DIRECTORIO_ACTIVOS
+
+
+# Segundos entre comprobaciones de los informes vigilados
+INTERVALO_VIGILANCIA = 0.5
+
+# Segundos entre latidos de las conexiones SSE (evitan que un proxy las corte)
+LATIDO_SSE = 15
+
+# Script que se añade a cada página servida: recarga al llegar una versión nueva
+SCRIPT_EN_VIVO = """  <script>
+    new EventSource('/eventos').addEventListener('actualizado', (evento) => {
+      if (JSON.parse(evento.data).informe === %s) location.reload();
+    });
+  </script>
+"""
+
+
+class Recurso:
+    """Respuesta ya preparada en memoria: cuerpo, variante gzip y ETag."""
+
+    def __init__(self, cuerpo: bytes, tipo: str, inmutable: bool = False):
+        self.cuerpo = cuerpo
+        self.gzip = gzip.compress(cuerpo, compresslevel=6, mtime=0)
+        self.tipo = tipo
+        self.etag = f'"{hash_contenido(cuerpo)[:16]}"'
+        self.inmutable = inmutable
+
+
+class ServidorDashboard:
+    """
+    Servidor local del dashboard con recarga en vivo.
+
+    Mantiene la plantilla, el paquete de activos y los fragmentos de las
+    secciones en memoria (RenderIncremental), vigila los informes JSON por
+    fecha de modificación y, cuando uno cambia, regenera solo las secciones
+    afectadas y avisa a los navegadores abiertos por Server-Sent Events.
+    Cada respuesta lleva ETag: una recarga de algo que no ha cambiado
+    contesta 304 sin cuerpo.
+    """
+
+    def __init__(self, entradas, paquete=None, perezoso=False, intervalo: float = INTERVALO_VIGILANCIA):
+        """
+        Args:
+            entradas: Rutas de informes JSON o carpetas con informes
+            paquete: (Opcional) PaqueteDashboard; sus activos se sirven desde memoria
+            perezoso: Si True sirve la página ligera y su sidecar de datos
+            intervalo: Segundos entre comprobaciones de los informes
+        """
+        self.entradas = [Path(entrada) for entrada in entradas]
+        self.paquete = paquete
+        self.intervalo = intervalo
+        self.renderizador = RenderIncremental(paquete=paquete, perezoso=perezoso)
+        self.recursos = {}  # ruta URL -> Recurso
+        self.firmas = {}  # nombre del informe -> (mtime_ns, tamaño)
+        self.versiones = {}  # nombre del informe -> versión servida
+        self.cambio = threading.Condition()
+        self.eventos = []  # (secuencia, nombre, versión), solo los últimos
+        self.secuencia = 0
+        self.activo = True
+
+        if paquete is not None and paquete.modo == "compartido":
+            self.recursos[f"/{DIRECTORIO_ACTIVOS}/{paquete.nombre_js}"] = Recurso(
+                paquete.js.encode("utf-8"), "application/javascript; charset=utf-8", inmutable=True)
+            self.recursos[f"/{DIRECTORIO_ACTIVOS}/{paquete.nombre_css}"] = Recurso(
+                paquete.css.encode("utf-8"), "text/css; charset=utf-8", inmutable=True)
+
+    # ------------------------------------------------------------------
+    # Vigilancia de los informes
+    # ------------------------------------------------------------------
+
+    def informes(self):
+        """
+        Informes vigilados (las carpetas se vuelven a listar en cada pasada).
+
+        Cada informe se sirve por su nombre de archivo: dos con el mismo
+        nombre en carpetas distintas se pisarían, así que es un error.
+        """
+        rutas = {}
+        for entrada in self.entradas:
+            for ruta in (sorted(entrada.glob("*.json")) if entrada.is_dir() else [entrada]):
+                if ruta.name.endswith(".datos.json"):
+                    continue
+                if ruta.stem in rutas:
+                    raise ValueError(f"Dos informes se servirían como /{ruta.stem}.html: {rutas[ruta.stem]} y {ruta}")
+                rutas[ruta.stem] = ruta
+        return list(rutas.values())
+
+    def comprobar(self):
+        """Regenera los informes cuya firma (mtime, tamaño) ha cambiado."""
+        for ruta in self.informes():
+            try:
+                estado = ruta.stat()
+            except FileNotFoundError:
+                continue
+            firma = (estado.st_mtime_ns, estado.st_size)
+            if self.firmas.get(ruta.stem) == firma:
+                continue
+            try:
+                with open(ruta, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                continue  # Escritura a medias: se reintenta en la siguiente pasada
+            self.firmas[ruta.stem] = firma
+            self.publicar(ruta.stem, data)
+
+    def publicar(self, nombre: str, data):
+        """Renderiza un informe, sustituye sus recursos y avisa a los navegadores."""
+        inicio = time.perf_counter()
+        html = self.renderizador.render(data)
+        milisegundos = (time.perf_counter() - inicio) * 1000
+        script = SCRIPT_EN_VIVO % json.dumps(nombre)
+        corte = html.rfind("</body>")
+        html = html[:corte] + script + html[corte:] if corte >= 0 else html + script
+
+        # El sidecar antes que la página que lo pide
+        if self.renderizador.perezoso:
+            self.recursos[f"/{nombre}.datos.json"] = Recurso(
+                datos_sidecar(data).encode("utf-8"), "application/json; charset=utf-8")
+        self.recursos[f"/{nombre}.html"] = Recurso(html.encode("utf-8"), "text/html; charset=utf-8")
+
+        with self.cambio:
+            self.versiones[nombre] = self.versiones.get(nombre, 0) + 1
+            self.secuencia += 1
+            self.eventos = self.eventos[-99:] + [(self.secuencia, nombre, self.versiones[nombre])]
+            self.cambio.notify_all()
+        generadas = ", ".join(self.renderizador.ultimo['generadas']) or "ninguna"
+        print(f"🔄 {nombre} v{self.versiones[nombre]} en {milisegundos:.1f} ms (secciones: {generadas})")
+
+    def vigilar(self):
+        """Bucle de vigilancia (hilo en segundo plano)."""
+        while self.activo:
+            try:
+                self.comprobar()
+            except Exception as e:
+                print(f"⚠️ Error al regenerar el dashboard: {e}")
+            time.sleep(self.intervalo)
+
+    def esperar_evento(self, ultimo: int, plazo: float):
+        """Eventos posteriores a la secuencia 'ultimo' (espera hasta 'plazo' segundos)."""
+        with self.cambio:
+            self.cambio.wait_for(lambda: self.secuencia > ultimo or not self.activo, timeout=plazo)
+            return [evento for evento in self.eventos if evento[0] > ultimo]
+
+    # ------------------------------------------------------------------
+    # Servidor HTTP
+    # ------------------------------------------------------------------
+
+    def indice(self) -> Recurso:
+        """Página con un enlace por informe (la raíz cuando hay varios)."""
+        nombres = sorted(nombre for nombre in self.versiones)
+        enlaces = "\n".join(f'    <li><a href="/{nombre}.html">{nombre}</a></li>' for nombre in nombres)
+        html = ("<!DOCTYPE html>\n<html lang=\"es\">\n<head><meta charset=\"UTF-8\" />"
+                "<title>Dashboards</title></head>\n<body>\n  <h1>🏥 Dashboards</h1>\n"
+                f"  <ul>\n{enlaces}\n  </ul>\n</body>\n</html>\n")
+        return Recurso(html.encode("utf-8"), "text/html; charset=utf-8")
+
+    def recurso(self, ruta: str):
+        return self.indice() if ruta == "/" else self.recursos.get(ruta)
+
+    def servir(self, puerto: int = 8000, host: str = "127.0.0.1"):
+        """Arranca la vigilancia y el servidor HTTP (bloquea hasta Ctrl+C)."""
+        self.comprobar()
+        hilo = threading.Thread(target=self.vigilar, name='vigilancia-informes', daemon=True)
+        hilo.start()
+
+        servidor = ThreadingHTTPServer((host, puerto), crear_manejador(self))
+        servidor.daemon_threads = True
+        print(f"🌐 Dashboard en vivo en http://{host}:{puerto}/ ({len(self.versiones)} informes, Ctrl+C para salir)")
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            print("\n👋 Servidor detenido")
+        finally:
+            self.activo = False
+            with self.cambio:
+                self.cambio.notify_all()
+            servidor.server_close()
+
+
+def crear_manejador(dashboard: ServidorDashboard):
+    """Clase de manejador HTTP ligada a un ServidorDashboard."""
+
+    class Manejador(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, formato, *args):
+            pass  # Sin una línea por petición: las recargas se anuncian al regenerar
+
+        def do_GET(self):
+            ruta = unquote(urlsplit(self.path).path)
+            if ruta == "/eventos":
+                return self.eventos()
+            if ruta == "/" and len(dashboard.versiones) == 1:
+                # Con un solo informe la raíz lleva a su página (y su sidecar se pide con el mismo nombre)
+                self.send_response(302)
+                self.send_header("Location", f"/{next(iter(dashboard.versiones))}.html")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            recurso = dashboard.recurso(ruta)
+            if recurso is None:
+                self.send_error(404, "Informe o activo no encontrado")
+                return
+
+            sin_cambios = self.headers.get("If-None-Match") == recurso.etag
+            self.send_response(304 if sin_cambios else 200)
+            self.send_header("ETag", recurso.etag)
+            self.send_header("Cache-Control",
+                             "public, max-age=31536000, immutable" if recurso.inmutable else "no-cache")
+            if sin_cambios:
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            cuerpo = recurso.cuerpo
+            if "gzip" in self.headers.get("Accept-Encoding", ""):
+                cuerpo = recurso.gzip
+                self.send_header("Content-Encoding", "gzip")
+            self.send_header("Vary", "Accept-Encoding")
+            self.send_header("Content-Type", recurso.tipo)
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def eventos(self):
+            """Flujo SSE: un evento 'actualizado' por informe regenerado."""
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+
+            ultimo = dashboard.secuencia
+            try:
+                self.wfile.write(b"retry: 1000\n\n")
+                self.wfile.flush()
+                while dashboard.activo:
+                    eventos = dashboard.esperar_evento(ultimo, LATIDO_SSE)
+                    if not eventos:
+                        self.wfile.write(b": latido\n\n")
+                    for secuencia, nombre, version in eventos:
+                        datos = json.dumps({'informe': nombre, 'version': version})
+                        self.wfile.write(f"id: {secuencia}\nevent: actualizado\ndata: {datos}\n\n".encode("utf-8"))
+                        ultimo = secuencia
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # El navegador cerró la pestaña
+
+    return Manejador
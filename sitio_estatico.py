@@ -0,0 +1,229 @@
+import html
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Any
+from ejecucion_reanudable import hash_contenido, hash_parametros
+from render_json_html import (
+    ESTILOS, DIRECTORIO_ACTIVOS, DIRECTORIO_VENDOR, VERSION_SECCIONES, PaqueteDashboard,
+    compilar_plantilla, ensamblar, renderizar_lote, ruta_sidecar, escribir_comprimidos
+)
+
+
+# Manifiesto del sitio (en la carpeta de salida)
+MANIFIESTO_SITIO = "sitio.json"
+
+INDICE_SITIO = "index.html"
+
+PLANTILLA_INDICE = """<!DOCTYPE html>
+<html lang="es">
+<head>
+  <meta charset="UTF-8" />
+  <meta name="viewport" content="width=device-width, initial-scale=1.0" />
+  <title>🏥 Dashboards por Cohorte</title>
+{{estilos}}
+</head>
+<body>
+  <header>
+    <div class="header-content">
+      <h1>🏥 Dashboards por Cohorte</h1>
+      <div class="header-meta">
+        <span>📚 <strong>Informes:</strong> {{num_informes}}</span>
+        <span>🕒 <strong>Actualizado:</strong> {{fecha}}</span>
+      </div>
+    </div>
+  </header>
+
+  <div class="container">
+    <div class="card">
+      <input id="buscar" type="search" placeholder="🔎 Buscar por informe, cohorte o fecha..."
+             style="width: 100%; padding: 0.75rem 1rem; font-size: 1rem; border: 1px solid #E2E8F0; border-radius: 8px;" />
+      <p id="contador" style="margin-top: 0.5rem; font-size: 0.85rem; color: var(--color-text-light);"></p>
+      <table>
+        <thead>
+          <tr>
+            <th>Informe</th>
+            <th>Cohorte</th>
+            <th>Fecha de análisis</th>
+            <th>Registros</th>
+            <th>Modelo</th>
+          </tr>
+        </thead>
+        <tbody id="informes">
+{{filas}}
+        </tbody>
+      </table>
+    </div>
+  </div>
+
+  <script>
+    const filas = Array.from(document.querySelectorAll('#informes tr'));
+    const contador = document.getElementById('contador');
+    const textos = filas.map(fila => fila.textContent.toLowerCase());
+
+    function filtrar() {
+      const terminos = document.getElementById('buscar').value.toLowerCase().split(/\\s+/).filter(Boolean);
+      let visibles = 0;
+      filas.forEach((fila, i) => {
+        const visible = terminos.every(termino => textos[i].includes(termino));
+        fila.hidden = !visible;
+        visibles += visible;
+      });
+      contador.textContent = `${visibles} de ${filas.length} informes`;
+    }
+
+    document.getElementById('buscar').addEventListener('input', filtrar);
+    filtrar();
+  </script>
+</body>
+</html>
+"""
+
+TROZOS_INDICE = compilar_plantilla(PLANTILLA_INDICE)
+
+
+def resumen_informe(nombre: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """Campos del informe que aparecen en el índice."""
+    metadata = data.get('metadata', {})
+    estadisticas = data.get('datos_empiricos', {}).get('estadisticas', {})
+    return {
+        'nombre': nombre,
+        'cohorte': metadata.get('cohorte') or estadisticas.get('categoria_diagnostico', '-'),
+        'fecha_analisis': metadata.get('fecha_analisis', ''),
+        'total_registros': metadata.get('total_registros', 0),
+        'modelo_ia': metadata.get('modelo_ia', '')
+    }
+
+
+def html_indice(resumenes: List[Dict[str, Any]], paquete: PaqueteDashboard = None) -> str:
+    """Página índice con un enlace por dashboard y búsqueda en el navegador."""
+    if paquete is not None and paquete.modo == "compartido":
+        estilos = f'  <link rel="stylesheet" href="{DIRECTORIO_ACTIVOS}/{paquete.nombre_css}" />'
+    else:
+        estilos = "  <style>\n" + ESTILOS + "  </style>"
+    filas = "\n".join(
+        f'          <tr><td><a href="{html.escape(r["nombre"])}.html"><strong>{html.escape(r["nombre"])}</strong></a></td>'
+        f'<td>{html.escape(str(r["cohorte"]))}</td><td>{html.escape(str(r["fecha_analisis"]))}</td>'
+        f'<td>{r["total_registros"]}</td><td>{html.escape(str(r["modelo_ia"]))}</td></tr>'
+        for r in sorted(resumenes, key=lambda r: (str(r['cohorte']), str(r['fecha_analisis']), r['nombre']))
+    )
+    return ensamblar({
+        'estilos': estilos,
+        'num_informes': str(len(resumenes)),
+        'fecha': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'filas': filas
+    }, TROZOS_INDICE)
+
+
+def _escribir_atomico(ruta: Path, contenido: str):
+    temporal = ruta.with_suffix(f".{os.getpid()}.tmp")
+    temporal.write_text(contenido, encoding="utf-8")
+    temporal.replace(ruta)
+
+
+def construir_sitio(entradas, directorio: str, procesos: int = None, paquete: PaqueteDashboard = None,
+                    perezoso: bool = False, comprimir: bool = False, forzar: bool = False,
+                    directorio_vendor: str = DIRECTORIO_VENDOR) -> Dict[str, Any]:
+    """
+    Genera el sitio estático: un dashboard por informe, activos compartidos e índice.
+
+    Solo se renderizan los informes nuevos o modificados. El manifiesto
+    guarda por informe la firma del archivo (mtime, tamaño), el hash de su
+    contenido y los campos del índice; si la firma no cambia no se lee ni
+    se hashea el JSON, y si cambia pero el hash es el mismo (p.ej. un
+    touch) tampoco se renderiza. Cambiar la plantilla, el paquete o las
+    opciones invalida todo el sitio.
+
+    Args:
+        entradas: Informes JSON o carpetas con informes
+        directorio: Carpeta del sitio
+        procesos: Procesos del pool (default: núcleos disponibles)
+        paquete: PaqueteDashboard compartido (default: uno nuevo en modo 'compartido')
+        perezoso: Si True páginas ligeras con sidecar de datos
+        comprimir: Si True escribe también las variantes .gz/.br
+        forzar: Si True renderiza todos los informes aunque estén al día
+        directorio_vendor: Carpeta de las librerías vendorizadas (solo sin paquete)
+
+    Returns:
+        Manifiesto del sitio
+    """
+    inicio = time.perf_counter()
+    paquete = paquete if paquete is not None else PaqueteDashboard("compartido", directorio_vendor, perezoso)
+    directorio = Path(directorio)
+    directorio.mkdir(parents=True, exist_ok=True)
+    ruta_manifiesto = directorio / MANIFIESTO_SITIO
+
+    configuracion = hash_parametros({
+        'version': VERSION_SECCIONES,
+        'paquete': [paquete.modo, paquete.hash, paquete.perezoso],
+        'perezoso': perezoso,
+        'comprimir': comprimir
+    })
+    manifiesto = {'configuracion': configuracion, 'informes': {}}
+    if ruta_manifiesto.exists() and not forzar:
+        with open(ruta_manifiesto, "r", encoding="utf-8") as f:
+            anterior = json.load(f)
+        if anterior.get('configuracion') == configuracion:
+            manifiesto['informes'] = anterior.get('informes', {})
+
+    rutas = {}
+    for entrada in map(Path, entradas):
+        for ruta in (sorted(entrada.glob("*.json")) if entrada.is_dir() else [entrada]):
+            if ruta.name.endswith(".datos.json"):
+                continue
+            if ruta.stem in rutas:
+                raise ValueError(f"Dos informes generarían {ruta.stem}.html: {rutas[ruta.stem]} y {ruta}")
+            rutas[ruta.stem] = ruta
+
+    pendientes = []
+    informes = {}
+    for nombre, ruta in rutas.items():
+        estado = ruta.stat()
+        firma = [estado.st_mtime_ns, estado.st_size]
+        entrada = manifiesto['informes'].get(nombre)
+        salida = directorio / f"{nombre}.html"
+        if entrada is not None and entrada['firma'] == firma and salida.exists():
+            informes[nombre] = entrada
+            continue
+
+        contenido = ruta.read_bytes()
+        hash_informe = hash_contenido(contenido)
+        if entrada is not None and entrada['hash'] == hash_informe and salida.exists():
+            informes[nombre] = {**entrada, 'firma': firma}
+            continue
+
+        data = json.loads(contenido)
+        informes[nombre] = {
+            'origen': str(ruta),
+            'firma': firma,
+            'hash': hash_informe,
+            'resumen': resumen_informe(nombre, data)
+        }
+        pendientes.append(ruta)
+
+    # Dashboards de informes que ya no existen
+    for nombre in set(manifiesto['informes']) - set(informes):
+        for ruta in (directorio / f"{nombre}.html", ruta_sidecar(directorio / f"{nombre}.html")):
+            for variante in (ruta, Path(f"{ruta}.gz"), Path(f"{ruta}.br")):
+                if variante.exists():
+                    variante.unlink()
+
+    if pendientes:
+        renderizar_lote(pendientes, directorio, procesos, paquete=paquete, comprimir=comprimir, perezoso=perezoso)
+    paquete.escribir_activos(directorio, comprimir)
+
+    cambios = bool(pendientes) or set(informes) != set(manifiesto['informes'])
+    ruta_indice = directorio / INDICE_SITIO
+    if cambios or not ruta_indice.exists():
+        _escribir_atomico(ruta_indice, html_indice([e['resumen'] for e in informes.values()], paquete))
+        if comprimir:
+            escribir_comprimidos(ruta_indice)
+
+    manifiesto['informes'] = informes
+    _escribir_atomico(ruta_manifiesto, json.dumps(manifiesto, indent=2, ensure_ascii=False))
+
+    segundos = time.perf_counter() - inicio
+    print(f"🌍 Sitio en {directorio}: {len(pendientes)} renderizados, "
+          f"{len(informes) - len(pendientes)} al día ({segundos:.2f} s)")
+    return manifiesto
@@ -0,0 +1,192 @@
+import json
+import threading
+from datetime import datetime, date
+from pathlib import Path
+from typing import Dict, Any
+
+
+class PresupuestoExcedido(Exception):
+    """Se lanza antes de una llamada al modelo que superaría el presupuesto de tokens."""
+
+
+def estimar_tokens(texto: str) -> int:
+    """Estimación rápida de tokens (~4 caracteres por token)."""
+    return len(texto) // 4 + 1
+
+
+class TelemetriaIA:
+    """
+    Telemetría de las llamadas a los modelos y control de presupuesto.
+
+    Cada llamada se registra en un log JSONL (modelo, etapa, tokens de
+    prompt y de respuesta, latencia, reintento, resultado) y actualiza
+    contadores acumulados que se exportan en formato de texto de
+    Prometheus (para el textfile collector de node_exporter). Los
+    contadores y el consumo diario se persisten entre ejecuciones.
+
+    Antes de cada llamada se comprueba que la estimación de tokens cabe en
+    el presupuesto de la ejecución y en el del día; si no cabe se lanza
+    PresupuestoExcedido y el llamador degrada a caché o plantilla.
+    """
+
+    def __init__(self, ruta_log: str = 'llamadas_ia.jsonl', ruta_metricas: str = 'metricas_ia.prom',
+                 ruta_estado: str = 'consumo_ia.json', tokens_ejecucion: int = None,
+                 tokens_diarios: int = None):
+        """
+        Inicializa la telemetría.
+
+        Args:
+            ruta_log: JSONL con una línea por llamada o evento de caché
+            ruta_metricas: Archivo de métricas en formato Prometheus
+            ruta_estado: JSON con los contadores acumulados y el consumo por día
+            tokens_ejecucion: (Opcional) Tokens máximos en esta ejecución
+            tokens_diarios: (Opcional) Tokens máximos por día natural
+        """
+        self.ruta_log = Path(ruta_log)
+        self.ruta_metricas = Path(ruta_metricas)
+        self.ruta_estado = Path(ruta_estado) if ruta_estado else None
+        self.tokens_ejecucion = tokens_ejecucion
+        self.tokens_diarios = tokens_diarios
+        self.consumo_ejecucion = 0
+        self.estado = {'modelos': {}, 'cache': {'hit': 0, 'miss': 0}, 'presupuesto_excedido': 0,
+                       'tokens_por_dia': {}}
+        self._bloqueo = threading.Lock()
+
+        if self.ruta_estado is not None and self.ruta_estado.exists():
+            with open(self.ruta_estado, 'r', encoding='utf-8') as f:
+                self.estado.update(json.load(f))
+
+    # ------------------------------------------------------------------
+    # Presupuesto
+    # ------------------------------------------------------------------
+
+    def consumo_hoy(self) -> int:
+        return self.estado['tokens_por_dia'].get(date.today().isoformat(), 0)
+
+    def comprobar(self, tokens_estimados: int):
+        """Lanza PresupuestoExcedido si la llamada no cabe en algún presupuesto."""
+        with self._bloqueo:
+            motivo = None
+            if self.tokens_ejecucion is not None and \
+                    self.consumo_ejecucion + tokens_estimados > self.tokens_ejecucion:
+                motivo = f"ejecución ({self.consumo_ejecucion}/{self.tokens_ejecucion} tokens)"
+            elif self.tokens_diarios is not None and \
+                    self.consumo_hoy() + tokens_estimados > self.tokens_diarios:
+                motivo = f"diario ({self.consumo_hoy()}/{self.tokens_diarios} tokens)"
+            if motivo is None:
+                return
+            self.estado['presupuesto_excedido'] += 1
+        self._escribir({'evento': 'presupuesto_excedido', 'motivo': motivo,
+                        'tokens_estimados': tokens_estimados})
+        raise PresupuestoExcedido(f"Presupuesto {motivo} insuficiente para ~{tokens_estimados} tokens")
+
+    def dentro_presupuesto(self, tokens_estimados: int) -> bool:
+        try:
+            self.comprobar(tokens_estimados)
+        except PresupuestoExcedido as e:
+            print(f"💸 {e}")
+            return False
+        return True
+
+    # ------------------------------------------------------------------
+    # Registro
+    # ------------------------------------------------------------------
+
+    def registrar_llamada(self, modelo: str, etapa: str, latencia: float,
+                          tokens_prompt: int = 0, tokens_respuesta: int = 0,
+                          reintento: int = 0, error: str = None):
+        """Registra una llamada al modelo (con error si falló)."""
+        tokens = tokens_prompt + tokens_respuesta
+        with self._bloqueo:
+            contadores = self.estado['modelos'].setdefault(modelo, {
+                'llamadas': 0, 'errores': 0, 'reintentos': 0, 'tokens_prompt': 0,
+                'tokens_respuesta': 0, 'latencia_suma': 0.0
+            })
+            contadores['llamadas'] += 1
+            contadores['errores'] += error is not None
+            contadores['reintentos'] += reintento > 0
+            contadores['tokens_prompt'] += tokens_prompt
+            contadores['tokens_respuesta'] += tokens_respuesta
+            contadores['latencia_suma'] += latencia
+            self.consumo_ejecucion += tokens
+            hoy = date.today().isoformat()
+            self.estado['tokens_por_dia'][hoy] = self.estado['tokens_por_dia'].get(hoy, 0) + tokens
+
+        self._escribir({
+            'evento': 'llamada', 'modelo': modelo, 'etapa': etapa,
+            'tokens_prompt': tokens_prompt, 'tokens_respuesta': tokens_respuesta,
+            'latencia_s': round(latencia, 3), 'reintento': reintento, 'error': error
+        })
+
+    def registrar_cache(self, acierto: bool, etapa: str, modelo: str = None):
+        """Registra un acierto o fallo de la caché de respuestas."""
+        with self._bloqueo:
+            self.estado['cache']['hit' if acierto else 'miss'] += 1
+        self._escribir({'evento': 'cache', 'resultado': 'hit' if acierto else 'miss',
+                        'etapa': etapa, 'modelo': modelo})
+
+    def _escribir(self, registro: Dict[str, Any]):
+        registro = {'fecha': datetime.now().isoformat(timespec='milliseconds'), **registro}
+        with self._bloqueo:
+            with open(self.ruta_log, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(registro, ensure_ascii=False) + '\n')
+            self._guardar()
+
+    # ------------------------------------------------------------------
+    # Exportación
+    # ------------------------------------------------------------------
+
+    def metricas(self) -> str:
+        """Contadores acumulados en formato de texto de Prometheus."""
+        modelos = self.estado['modelos']
+        lineas = []
+
+        def metrica(nombre, tipo, ayuda, muestras):
+            lineas.append(f"# HELP {nombre} {ayuda}")
+            lineas.append(f"# TYPE {nombre} {tipo}")
+            for etiquetas, valor in muestras:
+                texto = ','.join(f'{clave}="{v}"' for clave, v in etiquetas.items())
+                lineas.append(f"{nombre}{{{texto}}} {valor}" if texto else f"{nombre} {valor}")
+
+        metrica('ia_llamadas_total', 'counter', 'Llamadas a modelos',
+                [({'modelo': m}, c['llamadas']) for m, c in modelos.items()])
+        metrica('ia_errores_total', 'counter', 'Llamadas a modelos fallidas',
+                [({'modelo': m}, c['errores']) for m, c in modelos.items()])
+        metrica('ia_reintentos_total', 'counter', 'Llamadas de cobertura o de campos pendientes',
+                [({'modelo': m}, c['reintentos']) for m, c in modelos.items()])
+        metrica('ia_tokens_total', 'counter', 'Tokens consumidos',
+                [({'modelo': m, 'tipo': 'prompt'}, c['tokens_prompt']) for m, c in modelos.items()] +
+                [({'modelo': m, 'tipo': 'respuesta'}, c['tokens_respuesta']) for m, c in modelos.items()])
+        metrica('ia_latencia_segundos_sum', 'counter', 'Suma de latencias de las llamadas',
+                [({'modelo': m}, round(c['latencia_suma'], 3)) for m, c in modelos.items()])
+        metrica('ia_latencia_segundos_count', 'counter', 'Número de latencias sumadas',
+                [({'modelo': m}, c['llamadas']) for m, c in modelos.items()])
+        metrica('ia_cache_total', 'counter', 'Aciertos y fallos de la caché de respuestas',
+                [({'resultado': r}, n) for r, n in self.estado['cache'].items()])
+        metrica('ia_presupuesto_excedido_total', 'counter', 'Llamadas evitadas por presupuesto',
+                [({}, self.estado['presupuesto_excedido'])])
+        metrica('ia_tokens_hoy', 'gauge', 'Tokens consumidos hoy', [({}, self.consumo_hoy())])
+        metrica('ia_tokens_ejecucion', 'gauge', 'Tokens consumidos en la ejecución actual',
+                [({}, self.consumo_ejecucion)])
+        return '\n'.join(lineas) + '\n'
+
+    def _guardar(self):
+        """Persiste el estado y reescribe el archivo de métricas (escrituras atómicas)."""
+        for ruta, contenido in ((self.ruta_estado, json.dumps(self.estado, indent=2)),
+                                (self.ruta_metricas, self.metricas())):
+            if ruta is None:
+                continue
+            temporal = ruta.with_suffix(ruta.suffix + '.tmp')
+            temporal.write_text(contenido, encoding='utf-8')
+            temporal.replace(ruta)
+
+    def resumen(self) -> Dict[str, Any]:
+        """Consumo de la ejecución y del día, con los presupuestos."""
+        return {
+            'tokens_ejecucion': self.consumo_ejecucion,
+            'presupuesto_ejecucion': self.tokens_ejecucion,
+            'tokens_hoy': self.consumo_hoy(),
+            'presupuesto_diario': self.tokens_diarios,
+            'modelos': self.estado['modelos'],
+            'cache': self.estado['cache']
+        }
@@ -0,0 +1,72 @@
+import json
+import pandas as pd
+from backends import BackendLocal
+from instrumentacion import RegistradorConsultas, ConexionInstrumentada, hash_sql
+
+
+QUERY_COHORTE = "SELECT EDAD, SEXO FROM SALUDMENTAL WHERE EDAD < :filtro_edad"
+
+
+def _backend_sqlite(tmp_path):
+    """Base de datos local de pruebas: un extracto CSV cargado en sqlite."""
+    extracto = tmp_path / "extracto.csv"
+    pd.DataFrame({
+        'Edad': [12, 15, 17, 19, 25, 40],
+        'Sexo': [1, 2, 1, 1, 2, 1]
+    }).to_csv(extracto, index=False)
+    return BackendLocal(extracto, motor='sqlite')
+
+
+def _leer_log(ruta):
+    with open(ruta, 'r', encoding='utf-8') as f:
+        return [json.loads(linea) for linea in f]
+
+
+def test_conexion_instrumentada_sqlite(tmp_path):
+    backend = _backend_sqlite(tmp_path)
+    registrador = RegistradorConsultas(tmp_path / "logs" / "consultas.jsonl", capturar_plan=True)
+    conexion = registrador.conectar(backend.conectar, backend=backend.nombre)
+    assert isinstance(conexion, ConexionInstrumentada)
+    assert registrador.envolver(conexion) is conexion
+
+    with registrador.operacion('carga', filtro_edad=20):
+        df = backend.leer(conexion, QUERY_COHORTE, {'filtro_edad': 20})
+    registrador.cerrar()
+
+    assert len(df) == 4
+    registros = _leer_log(registrador.ruta_log)
+    assert [r['tipo'] for r in registros] == ['conexion', 'consulta', 'operacion']
+
+    consulta = registros[1]
+    assert consulta['operacion'] == 'carga'
+    assert consulta['sql_hash'] == hash_sql(QUERY_COHORTE)
+    assert consulta['binds'] == {'filtro_edad': 20}
+    assert consulta['filas'] == 4
+    assert consulta['bytes'] == 4 * 2 * 8
+    assert consulta['plan'] and 'SALUDMENTAL' in ' '.join(consulta['plan'])
+
+    operacion = registros[2]
+    assert operacion['consultas'] == 1
+    assert operacion['filas'] == 4
+    assert operacion['filtro_edad'] == 20
+    assert abs(operacion['total_s'] - operacion['base_datos_s'] - operacion['cliente_s']) < 1e-5
+
+
+def test_lectura_por_lotes_y_plan_a_demanda(tmp_path):
+    backend = _backend_sqlite(tmp_path)
+    registrador = RegistradorConsultas(tmp_path / "consultas.jsonl")
+    conexion = registrador.envolver(backend.conectar())
+    registrador.pedir_plan(QUERY_COHORTE)
+
+    lotes = list(backend.leer_por_lotes(conexion, QUERY_COHORTE, {'filtro_edad': 30}, tamano_lote=2))
+    # Sin plan a demanda pendiente, la segunda ejecución no lo lleva
+    backend.leer(conexion, QUERY_COHORTE, {'filtro_edad': 30})
+    registrador.cerrar()
+
+    assert sum(len(lote) for lote in lotes) == 5
+    primera, segunda = [r for r in _leer_log(registrador.ruta_log) if r['tipo'] == 'consulta']
+    assert primera['filas'] == 5
+    assert primera['viajes_red'] >= 3
+    assert 'plan' in primera and 'plan' not in segunda
+    assert len(registrador.resumen()) == 1
+    assert registrador.resumen()[0]['ejecuciones'] == 2